@@ -0,0 +1,259 @@
+"""
+Buyurtmalar statistikasi va savdo analitikasi (incremental)
+- OrderStats: har bir holat (OrderStatus) bo'yicha buyurtmalar soni va summasi
+  jarayon ichidagi hisoblagichlarda. create_order, create_one_click_order va
+  update_order_status ularni yangilaydi - /statistics O(1).
+- SalesRollups: soat/kun/hafta bucket'lari bo'yicha daromad, buyurtmalar va
+  sotilgan donalar (jami, kategoriya va mahsulot kesimida), storage jadvalida.
+
+Rollup'larni mavjud buyurtmalardan qayta qurish: python analytics.py rebuild
+"""
+from datetime import datetime, timedelta
+from typing import Callable, ContextManager, Dict, Iterable, List, Optional, Tuple
+import threading
+
+from models import OrderStatus
+from storage import Table
+
+
+class OrderStats:
+    """OrderStatus -> (soni, summasi) hisoblagichlari"""
+
+    def __init__(self):
+        self._count: Dict[OrderStatus, int] = {status: 0 for status in OrderStatus}
+        self._value: Dict[OrderStatus, float] = {status: 0.0 for status in OrderStatus}
+        self.total_orders = 0
+        self.total_value = 0.0
+        self._lock = threading.Lock()
+
+    def clear(self) -> None:
+        with self._lock:
+            for status in OrderStatus:
+                self._count[status] = 0
+                self._value[status] = 0.0
+            self.total_orders = 0
+            self.total_value = 0.0
+
+    def add(self, status, total_price: float) -> None:
+        """Yangi buyurtma"""
+        status = OrderStatus(status)
+        with self._lock:
+            self._count[status] += 1
+            self._value[status] += total_price
+            self.total_orders += 1
+            self.total_value += total_price
+
+    def transition(self, old_status, new_status, total_price: float) -> None:
+        """Buyurtma holati o'zgardi (masalan DELIVERED -> CANCELLED: daromaddan ayiriladi)"""
+        old_status, new_status = OrderStatus(old_status), OrderStatus(new_status)
+        if old_status == new_status:
+            return
+        with self._lock:
+            self._count[old_status] -= 1
+            self._value[old_status] -= total_price
+            self._count[new_status] += 1
+            self._value[new_status] += total_price
+
+    def count(self, status: OrderStatus) -> int:
+        return self._count[status]
+
+    def value(self, status: OrderStatus) -> float:
+        return self._value[status]
+
+    @property
+    def average_order_value(self) -> Optional[float]:
+        return self.total_value / self.total_orders if self.total_orders else None
+
+
+# ============ SALES ROLLUPS ============
+# Savdo ko'rsatkichlari vaqt oraliqlari (soat/kun/hafta) bo'yicha oldindan
+# yig'ilgan holda saqlanadi. Har bir katak:
+#   (granularity, bucket, dimension, key, status) -> orders, units, revenue
+# dimension: "total" (butun do'kon), "category" (category_id), "product" (product_id).
+# Buyurtma yaratilganda uning ulushi barcha kataklarga qo'shiladi, holati
+# o'zgarganda eski holat katagidan yangisiga ko'chiriladi. Hisobot faqat
+# so'ralgan oraliqdagi bucket'larni o'qiydi - orders_db qayta aylanmaydi.
+GRANULARITIES = {
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+}
+DIMENSIONS = ("total", "category", "product")
+MAX_QUERY_BUCKETS = 2000  # Bitta so'rovda o'qiladigan bucket'lar chegarasi
+
+
+def bucket_start(moment: datetime, granularity: str) -> datetime:
+    """Vaqt qaysi bucket ga tushadi (hafta dushanbadan boshlanadi)"""
+    if granularity == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def _item_field(item, name: str):
+    """Buyurtma qatori dict yoki CartItemResponse bo'lishi mumkin"""
+    return item[name] if isinstance(item, dict) else getattr(item, name)
+
+
+def _parse_key(key: str) -> Optional[int]:
+    return None if key in ("all", "none") else int(key)
+
+
+class SalesRollups:
+    """
+    Vaqt bucket'lari bo'yicha savdo rollup'lari.
+    cells - rollup kataklari, facts - har bir buyurtmaning rollup'ga kirgan ulushi
+    (holat o'zgarganda aynan shu ulush ko'chiriladi, mahsulot kategoriyasi
+    keyinchalik o'zgargan bo'lsa ham).
+    Har bir buyurtmaning kataklari transaction() ichida o'qib-yoziladi (SQLite da
+    BEGIN IMMEDIATE): boshqa worker'lar bir xil katakni bir vaqtda yangilay olmaydi,
+    yarim yozilgan buyurtma ham qolmaydi.
+    """
+
+    def __init__(self, cells: Table, facts: Table, transaction: Callable[[], ContextManager]):
+        self.cells = cells
+        self.facts = facts
+        self.transaction = transaction
+
+    def clear(self) -> None:
+        with self.transaction():
+            self.cells.clear()
+            self.facts.clear()
+
+    def add_order(self, order: dict, category_of: Callable[[int], Optional[int]]) -> None:
+        """Yangi buyurtmani rollup'larga qo'shish"""
+        lines = []
+        for item in order["items"]:
+            product_id = _item_field(item, "product_id")
+            lines.append([
+                product_id,
+                category_of(product_id),
+                _item_field(item, "quantity"),
+                _item_field(item, "total_price"),
+            ])
+        fact = {
+            "id": order["id"],
+            "created_at": order["created_at"],
+            "status": OrderStatus(order["status"]).value,
+            "total": order["total_price"],
+            "lines": lines,
+        }
+        with self.transaction():
+            self.facts[order["id"]] = fact
+            self._apply(fact, fact["status"], 1)
+
+    def change_status(self, order_id: int, new_status) -> None:
+        """Buyurtma ulushini eski holat katagidan yangisiga ko'chirish"""
+        new_status = OrderStatus(new_status).value
+        with self.transaction():
+            fact = self.facts.get(order_id)
+            if fact is None or fact["status"] == new_status:
+                return
+            self._apply(fact, fact["status"], -1)
+            self._apply(fact, new_status, 1)
+            fact["status"] = new_status
+            self.facts[order_id] = fact
+
+    @staticmethod
+    def _contributions(fact: dict) -> Dict[Tuple[str, str], List[float]]:
+        """(dimension, key) -> [orders, units, revenue]"""
+        units = sum(line[2] for line in fact["lines"])
+        result = {("total", "all"): [1, units, fact["total"]]}
+        for product_id, category_id, quantity, line_total in fact["lines"]:
+            for dimension, key in (("category", "none" if category_id is None else str(category_id)),
+                                   ("product", str(product_id))):
+                cell = result.setdefault((dimension, key), [0, 0, 0.0])
+                cell[0] = 1  # Buyurtma shu kategoriya/mahsulot uchun bir marta sanaladi
+                cell[1] += quantity
+                cell[2] += line_total
+        return result
+
+    def _apply(self, fact: dict, status: str, sign: int) -> None:
+        created_at = fact["created_at"]
+        contributions = self._contributions(fact)
+        for granularity in GRANULARITIES:
+            bucket = bucket_start(created_at, granularity).isoformat()
+            for (dimension, key), (orders, units, revenue) in contributions.items():
+                cell_key = f"{granularity}|{bucket}|{dimension}|{key}|{status}"
+                cell = self.cells.get(cell_key) or {
+                    "slot": f"{granularity}|{bucket}|{dimension}",
+                    "key": key,
+                    "status": status,
+                    "orders": 0,
+                    "units": 0,
+                    "revenue": 0.0,
+                }
+                cell["orders"] += sign * orders
+                cell["units"] += sign * units
+                cell["revenue"] += sign * revenue
+                if cell["orders"] <= 0:
+                    self.cells.pop(cell_key, None)
+                else:
+                    self.cells[cell_key] = cell
+
+    def query(
+        self,
+        granularity: str,
+        start: datetime,
+        end: datetime,
+        dimension: str = "total",
+        key: Optional[int] = None,
+        statuses: Optional[Iterable[OrderStatus]] = None
+    ) -> List[dict]:
+        """
+        [start, end) oralig'idagi bucket'lar: {"bucket", "key", "orders", "units", "revenue"}
+        statuses berilsa faqat shu holatdagi buyurtmalar hisobga olinadi.
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"granularity noto'g'ri: {granularity} ({', '.join(GRANULARITIES)})")
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"dimension noto'g'ri: {dimension} ({', '.join(DIMENSIONS)})")
+        if end <= start:
+            raise ValueError("end start dan keyin bo'lishi kerak")
+
+        step = GRANULARITIES[granularity]
+        first = bucket_start(start, granularity)
+        if (end - first) / step > MAX_QUERY_BUCKETS:
+            raise ValueError(f"Oraliq juda katta: {MAX_QUERY_BUCKETS} tadan ko'p bucket")
+
+        allowed = None if statuses is None else {OrderStatus(status).value for status in statuses}
+        wanted_key = None if key is None else str(key)
+        result = []
+        bucket = first
+        while bucket < end:
+            totals: Dict[str, List[float]] = {}
+            for cell in self.cells.find("slot", f"{granularity}|{bucket.isoformat()}|{dimension}"):
+                if allowed is not None and cell["status"] not in allowed:
+                    continue
+                if wanted_key is not None and cell["key"] != wanted_key:
+                    continue
+                row = totals.setdefault(cell["key"], [0, 0, 0.0])
+                row[0] += cell["orders"]
+                row[1] += cell["units"]
+                row[2] += cell["revenue"]
+            for cell_key in sorted(totals, key=lambda k: (k == "none", _parse_key(k) or 0)):
+                orders, units, revenue = totals[cell_key]
+                result.append({
+                    "bucket": bucket,
+                    "key": _parse_key(cell_key),
+                    "orders": orders,
+                    "units": units,
+                    "revenue": revenue,
+                })
+            bucket += step
+        return result
+
+
+if __name__ == "__main__":
+    # Rollup'larni mavjud buyurtmalardan qayta qurish: python analytics.py rebuild
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Savdo analitikasi rollup'lari")
+    parser.add_argument("command", choices=["rebuild"], help="rebuild - orders_db dan qayta qurish")
+    args = parser.parse_args()
+
+    from database import rebuild_sales_rollups
+    count = rebuild_sales_rollups()
+    print(f"✅ {count} ta buyurtmadan rollup'lar qayta qurildi")
@@ -9,6 +9,7 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from models import UserResponse, UserRole
 from database import get_user_by_id
+from token_cache import token_cache
 
 # JWT sozlamalari
 SECRET_KEY = "your-secret-key-change-in-production-very-important"  # Production da o'zgartirish kerak!
@@ -17,11 +18,14 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30 * 24 * 60  # 30 kun
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """JWT access token yaratish"""
     to_encode = data.copy()
+    if "sub" in to_encode:
+        to_encode["sub"] = str(to_encode["sub"])  # JWT standarti: sub satr bo'lishi kerak
     
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -42,6 +46,30 @@ def verify_token(token: str) -> Optional[dict]:
         return None
 
 
+def _user_from_token(token: str) -> Optional[UserResponse]:
+    """
+    Token egasi (yaroqsiz bo'lsa None).
+    Avval token_cache: topilsa jwt.decode va users_db o'qilmaydi.
+    """
+    user = token_cache.get(token)
+    if user is not None:
+        return user
+
+    payload = verify_token(token)
+    if payload is None or payload.get("sub") is None:
+        return None
+    try:
+        user_id = int(payload["sub"])
+    except (TypeError, ValueError):
+        return None
+
+    generation = token_cache.generation
+    user = get_user_by_id(user_id)
+    if user is not None and payload.get("exp") is not None:
+        token_cache.put(token, user_id, user, float(payload["exp"]), generation)
+    return user
+
+
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserResponse:
     """
     Joriy foydalanuvchini olish (token dan)
@@ -53,21 +81,24 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserResponse:
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    payload = verify_token(token)
-    if payload is None:
-        raise credentials_exception
-    
-    user_id: int = payload.get("sub")
-    if user_id is None:
-        raise credentials_exception
-    
-    user = get_user_by_id(user_id)
+    user = _user_from_token(token)
     if user is None:
         raise credentials_exception
     
     return user
 
 
+async def get_optional_user(token: Optional[str] = Depends(optional_oauth2_scheme)) -> Optional[UserResponse]:
+    """
+    Token bo'lsa joriy foydalanuvchi, bo'lmasa (yoki yaroqsiz bo'lsa) None
+    Mehmonlar ham ishlata oladigan endpoint'lar uchun (masalan, savatcha)
+    """
+    if not token:
+        return None
+
+    return _user_from_token(token)
+
+
 async def get_current_active_user(current_user: UserResponse = Depends(get_current_user)) -> UserResponse:
     """Faol foydalanuvchini olish"""
     if not current_user.is_verified:
@@ -358,10 +358,10 @@ def get_active_reset_tokens():
     """
     Faol parolni tiklash tokenlarini ko'rish (faqat test uchun)
     """
-    from database import password_reset_tokens_db
+    from database import password_reset_tokens
     
     tokens_info = []
-    for email, token_data in password_reset_tokens_db.items():
+    for email, token_data in password_reset_tokens.items():
         tokens_info.append({
             "email": email,
             "token": token_data["token"],
@@ -0,0 +1,107 @@
+"""
+Savatchalar ombori (har bir foydalanuvchi yoki sessiya uchun alohida savatcha)
+Savatcha bitta yozuv sifatida saqlanadi:
+    {"id": kalit, "items": {item_id: qator}, "products": {product_id: item_id},
+     "next_item_id": n, "updated_at": unix vaqt}
+products xaritasi tufayli qo'shish/yangilash/o'chirish O(1).
+Uzoq vaqt o'zgarmagan savatchalar TTL bo'yicha o'chiriladi: jarayon ichida
+savatchalar oxirgi o'zgarish tartibida (OrderedDict) turadi, eskilari boshidan
+olinadi - har bir yozishda amortizatsiyalangan O(1). Savatchalar soni
+max_carts bilan ham cheklangan.
+"""
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator, Optional
+import os
+import threading
+import time
+
+from storage import Table
+
+CART_TTL_SECONDS = int(os.getenv("CART_TTL_SECONDS", str(3 * 24 * 3600)))  # 3 kun
+MAX_CARTS = int(os.getenv("MAX_CARTS", "100000"))
+
+
+def new_cart(cart_key: str) -> dict:
+    """Bo'sh savatcha yozuvi"""
+    return {"id": cart_key, "items": {}, "products": {}, "next_item_id": 1}
+
+
+class CartStore:
+    """Table ustida TTL va hajm chegarasi bilan savatchalar"""
+
+    def __init__(self, table: Table, ttl_seconds: int = CART_TTL_SECONDS, max_carts: int = MAX_CARTS):
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self.max_carts = max_carts
+        self._touched: "OrderedDict[str, float]" = OrderedDict()  # kalit -> oxirgi o'zgarish vaqti
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def load(self) -> None:
+        """Mavjud savatchalar tartibini jadvaldan tiklash (ishga tushganda)"""
+        with self._lock:
+            carts = sorted(self.table.values(), key=lambda cart: cart.get("updated_at", 0))
+            self._touched = OrderedDict((cart["id"], cart.get("updated_at", 0)) for cart in carts)
+            self._sweep(time.time())
+
+    def _expired(self, cart: dict, now: float) -> bool:
+        return cart.get("updated_at", 0) + self.ttl_seconds <= now
+
+    def get(self, cart_key: str) -> Optional[dict]:
+        """Savatcha yozuvi (yo'q yoki muddati o'tgan bo'lsa None)"""
+        cart = self.table.get(cart_key)
+        if cart is None or not self._expired(cart, time.time()):
+            return cart
+        with self._lock:
+            self._delete(cart_key)
+        return None
+
+    @contextmanager
+    def edit(self, cart_key: str) -> Iterator[dict]:
+        """
+        Savatchani o'zgartirish: with carts.edit(key) as cart: ...
+        Blokdan chiqishda savatcha saqlanadi (bo'sh bo'lib qolsa o'chiriladi).
+        """
+        with self._lock:
+            cart = self.get(cart_key) or new_cart(cart_key)
+            yield cart
+            if cart["items"]:
+                self._save(cart)
+            else:
+                self._delete(cart_key)
+
+    def delete(self, cart_key: str) -> None:
+        with self._lock:
+            self._delete(cart_key)
+
+    def _save(self, cart: dict) -> None:
+        now = time.time()
+        cart["updated_at"] = now
+        self.table[cart["id"]] = cart
+        self._touched[cart["id"]] = now
+        self._touched.move_to_end(cart["id"])
+        self._sweep(now)
+
+    def _delete(self, cart_key: str) -> None:
+        self._touched.pop(cart_key, None)
+        self.table.pop(cart_key, None)
+
+    def _sweep(self, now: float) -> None:
+        """Eng eski savatchalardan boshlab muddati o'tganlarini (yoki ortiqchasini) o'chirish"""
+        while self._touched:
+            cart_key, touched_at = next(iter(self._touched.items()))
+            over_limit = len(self._touched) > self.max_carts
+            if not over_limit and touched_at + self.ttl_seconds > now:
+                break
+            self._touched.popitem(last=False)
+            cart = self.table.get(cart_key)
+            if cart is None:
+                continue
+            if not over_limit and not self._expired(cart, now):
+                # Boshqa worker yangilagan - haqiqiy vaqti bilan navbat oxiriga
+                self._touched[cart_key] = cart["updated_at"]
+                continue
+            del self.table[cart_key]
@@ -0,0 +1,216 @@
+"""
+Katalog so'rovlari uchun NumPy ustunlari (ixtiyoriy)
+products_db ning nusxasi ustunlar ko'rinishida: id, narx, kategoriya va
+omborda borligi. Filtrlar (narx oralig'i, kategoriya,
+in_stock) bitta boolean mask bilan, tartiblash esa argpartition (faqat
+sahifagacha bo'lgan top-k) + lexsort bilan bajariladi; natija - faqat ID lar.
+
+catalog_index.ProductSortIndex narx oralig'i va tartibni bisect bilan
+topadi, lekin xotira/in_stock filtrida va ID/nom tartibidagi keng narx
+oralig'ida tartib bo'ylab Python da yuradi: chuqur sahifada bu O(offset).
+in_stock filtrli chuqur sahifalarda (eng ko'p ishlatiladigani) database.get_products_paginated
+shu ustunlardan foydalanadi (mask butun katalog bo'yicha, lekin C da).
+
+NumPy o'rnatilmagan bo'lsa yoki CATALOG_NUMPY=0 bo'lsa product_columns = None
+va hamma so'rovlar ProductSortIndex orqali ketadi.
+
+Benchmark (ProductSortIndex bilan solishtirish):
+    python catalog_columns.py bench --sizes 10000 100000 1000000
+"""
+from typing import Dict, List, Optional, Tuple
+import os
+import threading
+
+try:
+    import numpy as np
+except ImportError:  # NumPy ixtiyoriy
+    np = None
+
+CATALOG_NUMPY = os.getenv("CATALOG_NUMPY", "1") == "1"
+CATALOG_NUMPY_MIN_OFFSET = int(os.getenv("CATALOG_NUMPY_MIN_OFFSET", "200"))  # bundan chuqur sahifalar ustunlardan
+NO_CATEGORY = -1
+_INITIAL_CAPACITY = 1024
+
+
+class ProductColumns:
+    """product_id -> ustunlardagi qator; o'chirilgan qatorlar alive=False bo'lib qayta ishlatiladi"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._rows: Dict[int, int] = {}  # product_id -> qator
+        self._free: List[int] = []
+        self._size = 0                   # ishlatilgan qatorlar (alive yoki bo'sh)
+        self._allocate(_INITIAL_CAPACITY)
+
+    def _allocate(self, capacity: int) -> None:
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.prices = np.zeros(capacity, dtype=np.float64)
+        self.categories = np.full(capacity, NO_CATEGORY, dtype=np.int64)
+        self.in_stock = np.zeros(capacity, dtype=np.bool_)
+        self.alive = np.zeros(capacity, dtype=np.bool_)
+
+    def _grow(self) -> None:
+        """Sig'im ikki barobar (amortizatsiyalangan O(1) qo'shish)"""
+        old = (self.ids, self.prices, self.categories, self.in_stock, self.alive)
+        self._allocate(len(self.ids) * 2)
+        for new, column in zip((self.ids, self.prices, self.categories, self.in_stock, self.alive), old):
+            new[:len(column)] = column
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add(self, product_id: int, price: float, category_id: Optional[int], in_stock: bool) -> None:
+        """Mahsulotni qo'shish yoki yangilash"""
+        with self._lock:
+            row = self._rows.get(product_id)
+            if row is None:
+                if self._free:
+                    row = self._free.pop()
+                else:
+                    if self._size == len(self.ids):
+                        self._grow()
+                    row = self._size
+                    self._size += 1
+                self._rows[product_id] = row
+            self.ids[row] = product_id
+            self.prices[row] = price
+            self.categories[row] = NO_CATEGORY if category_id is None else category_id
+            self.in_stock[row] = bool(in_stock)
+            self.alive[row] = True
+
+    def remove(self, product_id: int) -> None:
+        with self._lock:
+            row = self._rows.pop(product_id, None)
+            if row is not None:
+                self.alive[row] = False
+                self._free.append(row)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._rows.clear()
+            self._free.clear()
+            self._size = 0
+            self._allocate(_INITIAL_CAPACITY)
+
+    def _mask(
+        self,
+        category_id: Optional[int],
+        min_price: Optional[float],
+        max_price: Optional[float],
+        in_stock: Optional[bool]
+    ):
+        n = self._size
+        mask = self.alive[:n].copy()
+        if category_id:
+            mask &= self.categories[:n] == category_id
+        if min_price is not None:
+            mask &= self.prices[:n] >= min_price
+        if max_price is not None:
+            mask &= self.prices[:n] <= max_price
+        if in_stock is not None:
+            mask &= self.in_stock[:n] == in_stock
+        return mask
+
+    def query(
+        self,
+        offset: int,
+        limit: int,
+        category_id: Optional[int] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        in_stock: Optional[bool] = None,
+        sort_by: Optional[str] = None
+    ) -> Tuple[List[int], int, Optional[tuple]]:
+        """
+        Filtrga mos sahifa ID lari, jami soni va oxirgi ID ning tartiblash kaliti
+        (cursor uchun, ProductSortIndex.sort_key bilan bir xil). Tartib ProductSortIndex.page
+        bilan bir xil: price_asc - (narx, id), price_desc - teskarisi, aks holda
+        id tartibida (database.get_products_paginated faqat shularni yuboradi).
+        """
+        with self._lock:
+            rows = np.flatnonzero(self._mask(category_id, min_price, max_price, in_stock))
+            total = len(rows)
+            k = min(offset + limit, total)
+            if offset >= k:
+                return [], total, None
+
+            ids = self.ids[rows]
+            if sort_by == "price_asc":
+                primary, secondary = self.prices[rows], ids
+            elif sort_by == "price_desc":
+                primary, secondary = -self.prices[rows], -ids
+            else:
+                primary = secondary = ids
+
+            if k < total:
+                # Top-k: faqat k-chi elementgacha bo'lganlar (chegaradagi tenglar bilan) saralanadi
+                kth = primary[np.argpartition(primary, k - 1)[k - 1]]
+                candidates = np.flatnonzero(primary <= kth)
+            else:
+                candidates = np.arange(total)
+            order = candidates[np.lexsort((secondary[candidates], primary[candidates]))]
+            page = order[offset:k]
+            last = page[-1]
+            if sort_by in ("price_asc", "price_desc"):
+                last_key = (float(self.prices[rows[last]]), int(ids[last]))
+            else:
+                last_key = (int(ids[last]),)
+            return ids[page].tolist(), total, last_key
+
+
+product_columns: Optional[ProductColumns] = ProductColumns() if np is not None and CATALOG_NUMPY else None
+
+
+# ============ BENCHMARK ============
+def _bench(sizes: List[int], repeat: int) -> None:
+    """Har bir katalog hajmida ProductSortIndex va ProductColumns so'rov vaqtlari (ms)"""
+    import random
+    import time
+    from catalog_index import ProductSortIndex
+
+    queries = [
+        ("in_stock, narx ↑, 1-sahifa", dict(in_stock=True, sort_by="price_asc"), 0),
+        ("in_stock, narx ↓, o'rta sahifa", dict(in_stock=True, sort_by="price_desc"), None),
+        ("kategoriya+narx+in_stock, id", dict(category_id=3, min_price=1_200_000, max_price=1_800_000, in_stock=True), None),
+        ("narx oralig'i, narx ↑ (bisect)", dict(min_price=1_200_000, max_price=1_800_000, sort_by="price_asc"), None),
+    ]
+    print(f"{'mahsulotlar':>11}  {'so`rov':<32} {'ProductSortIndex':>17} {'NumPy':>9}")
+    for size in sizes:
+        random.seed(size)
+        # ProductSortIndex insort bilan quriladi: narx va nom id bilan birga o'ssa
+        # ro'yxat oxiriga qo'shiladi (1M da ham tez quriladi)
+        prices = sorted(random.uniform(500_000, 2_500_000) for _ in range(size))
+        index = ProductSortIndex()
+        columns = ProductColumns()
+        for product_id, price in enumerate(prices, start=1):
+            category_id = random.randint(1, 20)
+            in_stock = random.random() < 0.85
+            index.add(product_id, category_id, price, f"Phone {product_id:08d}", storage="128 GB", in_stock=in_stock)
+            columns.add(product_id, price, category_id, in_stock)
+
+        for label, filters, offset in queries:
+            total = columns.query(0, 1, **filters)[1]
+            page_offset = total // 2 if offset is None else offset
+            expected = index.page(offset=page_offset, limit=20, **filters)
+            assert columns.query(page_offset, 20, **filters) == expected, label
+            timings = []
+            for run in (lambda: index.page(offset=page_offset, limit=20, **filters),
+                        lambda: columns.query(page_offset, 20, **filters)):
+                started = time.perf_counter()
+                for _ in range(repeat):
+                    run()
+                timings.append((time.perf_counter() - started) / repeat * 1000)
+            print(f"{size:>11}  {label:<32} {timings[0]:>14.2f} ms {timings[1]:>6.2f} ms")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    if np is None:
+        raise SystemExit("NumPy o'rnatilmagan: pip install numpy")
+    parser = argparse.ArgumentParser(description="NumPy katalog ustunlari benchmarki")
+    parser.add_argument("command", choices=["bench"])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    _bench(args.sizes, args.repeat)
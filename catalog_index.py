@@ -0,0 +1,469 @@
+"""
+Katalog uchun tartiblangan indekslar (pagination, filtrlash)
+Har bir kategoriya (va butun katalog) uchun ID, narx va nom bo'yicha
+tartiblangan ro'yxatlar saqlanadi. Narx oralig'i binary search (bisect)
+bilan topiladi, sahifa uchun esa faqat kerakli ID lar olinadi. Xotira yoki
+in_stock filtrida, shuningdek ID/nom tartibida keng narx oralig'ida tartib
+bo'ylab yurib sahifa to'lguncha filtrlanadi: O(offset + limit).
+Facet sonlari (kategoriya, xotira, omborda bor/yo'q, narx oraliqlari) uchun
+mahsulotlar (category_id, storage, in_stock) kataklariga bo'linadi, har bir
+katakda narxlar tartiblangan ro'yxat (posting list) sifatida turadi: istalgan
+filtr kombinatsiyasi uchun son O(kataklar * log N) - katalogni aylanmasdan.
+Cursor (keyset) rejimida keyingi sahifa oxirgi elementning (kalit, id)
+juftidan boshlanadi: O(log N + page_size), yangi mahsulotlar qo'shilsa ham
+sahifalar siljimaydi.
+"""
+from bisect import bisect_left, bisect_right, insort
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import base64
+import json
+import threading
+
+
+# ============ CURSOR ============
+def encode_cursor(sort_by: Optional[str], key: tuple) -> str:
+    """(tartib, kalit) -> URL uchun xavfsiz shaffof bo'lmagan token"""
+    payload = json.dumps([sort_by or "", list(key)], separators=(",", ":"), ensure_ascii=False)
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, sort_by: Optional[str]) -> tuple:
+    """Tokenni kalitga qaytarish; noto'g'ri yoki boshqa tartib uchun bo'lsa ValueError"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        cursor_sort, key = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+    except (ValueError, TypeError, UnicodeError):
+        raise ValueError("Cursor noto'g'ri")
+    if cursor_sort != (sort_by or ""):
+        raise ValueError("Cursor boshqa tartiblash uchun yaratilgan")
+
+    # Token foydalanuvchidan keladi: kalit turlari aniq tekshiriladi (bool ham int emas)
+    if type(key) is not list or not key or type(key[-1]) is not int:
+        raise ValueError("Cursor noto'g'ri")
+    if sort_by in ("price_asc", "price_desc"):
+        if len(key) == 2 and type(key[0]) in (int, float) and key[0] == key[0]:  # NaN emas
+            return float(key[0]), key[1]
+    elif sort_by in ("name_asc", "name_desc"):
+        if len(key) == 2 and type(key[0]) is str:
+            return key[0], key[1]
+    elif len(key) == 1:
+        return (key[0],)
+    raise ValueError("Cursor noto'g'ri")
+
+
+# ============ FACETS ============
+# Narx oraliqlari chegaralari (so'm): [0, 500000), [500000, 1000000), ..., [2000000, ...)
+PRICE_BUCKETS = (500_000, 1_000_000, 1_500_000, 2_000_000)
+
+
+def _count_between(prices: List[float], low: float, high: float, high_inclusive: bool = True) -> int:
+    """Tartiblangan narxlar ichida [low, high] (yoki [low, high)) oralig'idagilar soni"""
+    end = bisect_right(prices, high) if high_inclusive else bisect_left(prices, high)
+    return max(0, end - bisect_left(prices, low))
+
+
+class FacetIndex:
+    """(category_id, storage, in_stock) katagi -> tartiblangan narxlar"""
+
+    def __init__(self, price_buckets: Tuple[float, ...] = PRICE_BUCKETS):
+        self.price_buckets = tuple(price_buckets)
+        self._cells: Dict[tuple, List[float]] = {}
+        self._rows: Dict[int, Tuple[tuple, float]] = {}  # product_id -> (katak, narx)
+
+    def add(self, product_id: int, category_id: Optional[int], storage: Optional[str], in_stock: bool, price: float) -> None:
+        self.remove(product_id)
+        cell = (category_id, storage, bool(in_stock))
+        insort(self._cells.setdefault(cell, []), price)
+        self._rows[product_id] = (cell, price)
+
+    def remove(self, product_id: int) -> None:
+        row = self._rows.pop(product_id, None)
+        if row is None:
+            return
+        cell, price = row
+        prices = self._cells[cell]
+        del prices[bisect_left(prices, price)]
+        if not prices:
+            del self._cells[cell]
+
+    def clear(self) -> None:
+        self._cells.clear()
+        self._rows.clear()
+
+    @staticmethod
+    def _matches(cell: tuple, category_id: Optional[int], storage: Optional[str], in_stock: Optional[bool]) -> Tuple[bool, bool, bool]:
+        return (
+            not category_id or cell[0] == category_id,
+            storage is None or cell[1] == storage,
+            in_stock is None or cell[2] == in_stock,
+        )
+
+    def count(
+        self,
+        category_id: Optional[int] = None,
+        storage: Optional[str] = None,
+        in_stock: Optional[bool] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None
+    ) -> int:
+        """Filtrga mos mahsulotlar soni"""
+        low = float("-inf") if min_price is None else min_price
+        high = float("inf") if max_price is None else max_price
+        return sum(
+            _count_between(prices, low, high)
+            for cell, prices in self._cells.items()
+            if all(self._matches(cell, category_id, storage, in_stock))
+        )
+
+    def bucket_label(self, index: int) -> str:
+        bounds = (0,) + self.price_buckets
+        if index == len(self.price_buckets):
+            return f"{bounds[index]:.0f}+"
+        return f"{bounds[index]:.0f}-{bounds[index + 1]:.0f}"
+
+    def counts(
+        self,
+        category_id: Optional[int] = None,
+        storage: Optional[str] = None,
+        in_stock: Optional[bool] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None
+    ) -> Dict[str, Dict[Any, int]]:
+        """
+        Har bir facet qiymati uchun mahsulotlar soni.
+        Facet o'z filtrini hisobga olmaydi (masalan kategoriya sonlari boshqa
+        filtrlar bo'yicha sanaladi) - sidebar da boshqa qiymatga o'tish uchun.
+        """
+        low = float("-inf") if min_price is None else min_price
+        high = float("inf") if max_price is None else max_price
+        bounds = (float("-inf"),) + self.price_buckets + (float("inf"),)
+
+        result: Dict[str, Dict[Any, int]] = {
+            "category_id": {},
+            "storage": {},
+            "in_stock": {},
+            "price": {self.bucket_label(i): 0 for i in range(len(bounds) - 1)},
+        }
+        for cell, prices in self._cells.items():
+            by_category, by_storage, by_stock = self._matches(cell, category_id, storage, in_stock)
+            in_range = _count_between(prices, low, high)
+            if in_range:
+                if by_storage and by_stock:
+                    result["category_id"][cell[0]] = result["category_id"].get(cell[0], 0) + in_range
+                if by_category and by_stock:
+                    result["storage"][cell[1]] = result["storage"].get(cell[1], 0) + in_range
+                if by_category and by_storage:
+                    result["in_stock"][cell[2]] = result["in_stock"].get(cell[2], 0) + in_range
+            if by_category and by_storage and by_stock:
+                for i in range(len(bounds) - 1):
+                    result["price"][self.bucket_label(i)] += _count_between(prices, bounds[i], bounds[i + 1], high_inclusive=False)
+        return result
+
+
+# ============ SORTED LISTS ============
+class _SortedBucket:
+    """Bitta kategoriya (yoki butun katalog) uchun tartiblangan ro'yxatlar"""
+
+    __slots__ = ("ids", "by_price", "by_name")
+
+    def __init__(self):
+        self.ids: List[int] = []
+        self.by_price: List[Tuple[float, int]] = []
+        self.by_name: List[Tuple[str, int]] = []
+
+    def add(self, product_id: int, price: float, name: str) -> None:
+        insort(self.ids, product_id)
+        insort(self.by_price, (price, product_id))
+        insort(self.by_name, (name, product_id))
+
+    def remove(self, product_id: int, price: float, name: str) -> None:
+        del self.ids[bisect_left(self.ids, product_id)]
+        del self.by_price[bisect_left(self.by_price, (price, product_id))]
+        del self.by_name[bisect_left(self.by_name, (name, product_id))]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+class ProductSortIndex:
+    """Kategoriya -> narx/nom bo'yicha tartiblangan mahsulot ID lari va facet sonlari"""
+
+    def __init__(self):
+        self._all = _SortedBucket()
+        self._by_category: Dict[Optional[int], _SortedBucket] = {}
+        # product_id -> (category_id, price, name, storage, in_stock)
+        self._rows: Dict[int, Tuple[Optional[int], float, str, Optional[str], bool]] = {}
+        self._facets = FacetIndex()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add(
+        self,
+        product_id: int,
+        category_id: Optional[int],
+        price: float,
+        name: Optional[str],
+        storage: Optional[str] = None,
+        in_stock: bool = True
+    ) -> None:
+        """Mahsulotni indeksga qo'shish (mavjud bo'lsa yangilash)"""
+        row = (category_id, price, name or "", storage, bool(in_stock))
+        with self._lock:
+            if self._rows.get(product_id) == row:
+                return
+            self._remove(product_id)
+            self._rows[product_id] = row
+            self._all.add(product_id, price, row[2])
+            self._by_category.setdefault(category_id, _SortedBucket()).add(product_id, price, row[2])
+            self._facets.add(product_id, category_id, storage, row[4], price)
+
+    def remove(self, product_id: int) -> None:
+        """Mahsulotni indeksdan olib tashlash"""
+        with self._lock:
+            self._remove(product_id)
+
+    def _remove(self, product_id: int) -> None:
+        row = self._rows.pop(product_id, None)
+        if row is None:
+            return
+        category_id, price, name = row[:3]
+        self._all.remove(product_id, price, name)
+        bucket = self._by_category[category_id]
+        bucket.remove(product_id, price, name)
+        if not bucket:
+            del self._by_category[category_id]
+        self._facets.remove(product_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._all = _SortedBucket()
+            self._by_category.clear()
+            self._rows.clear()
+            self._facets.clear()
+
+    def category_ids(self, category_id: Optional[int], limit: Optional[int] = None) -> List[int]:
+        """Kategoriyadagi mahsulot ID lari (ID tartibida, ko'pi bilan limit ta)"""
+        with self._lock:
+            bucket = self._by_category.get(category_id)
+            if bucket is None:
+                return []
+            return bucket.ids[:limit]
+
+    def facet_counts(
+        self,
+        category_id: Optional[int] = None,
+        storage: Optional[str] = None,
+        in_stock: Optional[bool] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None
+    ) -> Dict[str, Dict[Any, int]]:
+        """Joriy filtr uchun facet sonlari (FacetIndex.counts)"""
+        with self._lock:
+            return self._facets.counts(category_id, storage, in_stock, min_price, max_price)
+
+    def _bucket(self, category_id: Optional[int]) -> Optional[_SortedBucket]:
+        if category_id:
+            return self._by_category.get(category_id)
+        return self._all
+
+    @staticmethod
+    def _price_range(bucket: _SortedBucket, min_price: Optional[float], max_price: Optional[float]) -> Tuple[int, int]:
+        """by_price ichida [min_price, max_price] oralig'i chegaralari (bisect)"""
+        lo = 0 if min_price is None else bisect_left(bucket.by_price, (min_price, float("-inf")))
+        hi = len(bucket.by_price) if max_price is None else bisect_right(bucket.by_price, (max_price, float("inf")))
+        return lo, max(lo, hi)
+
+    def sort_key(self, product_id: int, sort_by: Optional[str]) -> tuple:
+        """Cursor uchun mahsulotning tartiblash kaliti (mahsulot indeksda bo'lishi kerak)"""
+        with self._lock:
+            return self._sort_key(product_id, sort_by)
+
+    def _sort_key(self, product_id: int, sort_by: Optional[str]) -> tuple:
+        _, price, name = self._rows[product_id][:3]
+        if sort_by in ("price_asc", "price_desc"):
+            return price, product_id
+        if sort_by in ("name_asc", "name_desc"):
+            return name, product_id
+        return (product_id,)
+
+    def page(
+        self,
+        offset: int,
+        limit: int,
+        category_id: Optional[int] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        sort_by: Optional[str] = None,
+        storage: Optional[str] = None,
+        in_stock: Optional[bool] = None
+    ) -> Tuple[List[int], int, Optional[tuple]]:
+        """
+        Bitta sahifadagi mahsulot ID lari, filtrga mos jami soni va oxirgi
+        mahsulotning tartiblash kaliti (cursor uchun; sahifa bo'sh bo'lsa None).
+        Kalit shu lock ichida olinadi - keyin mahsulot o'chirilsa ham xato bo'lmaydi.
+        Tartib: sort_by bo'yicha, aks holda ID (qo'shilish) tartibida.
+        """
+        with self._lock:
+            ids, total = self._page(offset, limit, category_id, min_price, max_price, sort_by, storage, in_stock)
+            return ids, total, self._sort_key(ids[-1], sort_by) if ids else None
+
+    def _page(
+        self,
+        offset: int,
+        limit: int,
+        category_id: Optional[int],
+        min_price: Optional[float],
+        max_price: Optional[float],
+        sort_by: Optional[str],
+        storage: Optional[str],
+        in_stock: Optional[bool]
+    ) -> Tuple[List[int], int]:
+        """page() ning lock ichidagi qismi: (ID lar, jami soni)"""
+        bucket = self._bucket(category_id)
+        if bucket is None:
+            return [], 0
+
+        if storage is not None or in_stock is not None:
+            # Qo'shimcha filtr: jami son facet kataklaridan, sahifa esa tartib bo'ylab yurib
+            total = self._facets.count(category_id, storage, in_stock, min_price, max_price)
+            if offset >= total:
+                return [], total
+            matches = self._walk(bucket, None, sort_by, min_price, max_price, storage, in_stock)
+            return list(islice(matches, offset, offset + limit)), total
+
+        filtered = min_price is not None or max_price is not None
+        lo, hi = self._price_range(bucket, min_price, max_price)
+        total = hi - lo
+        end = min(offset + limit, total)
+        if offset >= end:
+            return [], total
+
+        if sort_by == "price_asc":
+            return [pid for _, pid in bucket.by_price[lo + offset:lo + end]], total
+        if sort_by == "price_desc":
+            return [pid for _, pid in reversed(bucket.by_price[hi - end:hi - offset])], total
+
+        if not filtered:
+            if sort_by == "name_asc":
+                return [pid for _, pid in bucket.by_name[offset:end]], total
+            if sort_by == "name_desc":
+                return [pid for _, pid in reversed(bucket.by_name[total - end:total - offset])], total
+            return bucket.ids[offset:end], total
+
+        if sort_by in ("name_asc", "name_desc"):
+            return self._name_page(bucket, lo, hi, offset, end, sort_by == "name_desc"), total
+
+        # Tartiblanmagan, lekin narx bo'yicha filtrlangan: ID tartibida
+        return self._id_page(bucket, lo, hi, offset, end), total
+
+    def _id_page(self, bucket: _SortedBucket, lo: int, hi: int, offset: int, end: int) -> List[int]:
+        """Narx oralig'idagi mahsulotlar ID tartibida"""
+        if (hi - lo) * 4 < len(bucket):
+            # Oraliq tor: faqat shu ID larni saralash arzonroq
+            return sorted(pid for _, pid in bucket.by_price[lo:hi])[offset:end]
+
+        # Oraliq keng (har 4 tadan kamida bittasi mos): ID ro'yxati bo'ylab yurib,
+        # sahifa to'lguncha filtrlash - O(end), butun oraliqni saralamasdan
+        low_price, high_price = bucket.by_price[lo][0], bucket.by_price[hi - 1][0]
+        matches = (pid for pid in bucket.ids if low_price <= self._rows[pid][1] <= high_price)
+        return list(islice(matches, offset, end))
+
+    def _name_page(self, bucket: _SortedBucket, lo: int, hi: int, offset: int, end: int, reverse: bool) -> List[int]:
+        """Narx oralig'idagi mahsulotlar nom bo'yicha tartibda"""
+        in_range = hi - lo
+        if in_range * 4 < len(bucket):
+            # Oraliq tor: faqat shu mahsulotlarni nom bo'yicha saralash arzonroq
+            rows = self._rows
+            ids = sorted((pid for _, pid in bucket.by_price[lo:hi]), key=lambda pid: (rows[pid][2], pid), reverse=reverse)
+            return ids[offset:end]
+
+        # Oraliq keng: nom ro'yxati bo'ylab yurib, sahifa to'lguncha filtrlash
+        low_price, high_price = bucket.by_price[lo][0], bucket.by_price[hi - 1][0]
+        names = reversed(bucket.by_name) if reverse else iter(bucket.by_name)
+        matches = (pid for _, pid in names if low_price <= self._rows[pid][1] <= high_price)
+        return list(islice(matches, offset, end))
+
+    def page_after(
+        self,
+        after: Optional[tuple],
+        limit: int,
+        category_id: Optional[int] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        sort_by: Optional[str] = None,
+        storage: Optional[str] = None,
+        in_stock: Optional[bool] = None
+    ) -> Tuple[List[int], int, bool, Optional[tuple]]:
+        """
+        Keyset pagination: after kalitidan keyingi limit ta ID.
+        Natija: (ID lar, filtrga mos jami soni, yana sahifa bormi, oxirgi ID ning
+        tartiblash kaliti - keyingi cursor uchun, lock ichida olinadi)
+        """
+        with self._lock:
+            bucket = self._bucket(category_id)
+            if bucket is None:
+                return [], 0, False, None
+
+            if storage is not None or in_stock is not None:
+                total = self._facets.count(category_id, storage, in_stock, min_price, max_price)
+            else:
+                lo, hi = self._price_range(bucket, min_price, max_price)
+                total = hi - lo
+
+            matches = self._walk(bucket, after, sort_by, min_price, max_price, storage, in_stock)
+            ids = list(islice(matches, limit + 1))
+            page_ids = ids[:limit]
+            last_key = self._sort_key(page_ids[-1], sort_by) if page_ids else None
+            return page_ids, total, len(ids) > limit, last_key
+
+    def _walk(
+        self,
+        bucket: _SortedBucket,
+        after: Optional[tuple],
+        sort_by: Optional[str],
+        min_price: Optional[float],
+        max_price: Optional[float],
+        storage: Optional[str],
+        in_stock: Optional[bool]
+    ) -> Iterator[int]:
+        """sort_by tartibida after dan keyingi, barcha filtrlardan o'tgan ID lar (lazy)"""
+        rows = self._rows
+        if sort_by in ("price_asc", "price_desc"):
+            # Narx oralig'i bisect bilan kesiladi, narxni qayta tekshirish shart emas
+            entries = bucket.by_price
+            lo, hi = self._price_range(bucket, min_price, max_price)
+            if sort_by == "price_desc":
+                stop = hi if after is None else min(hi, bisect_left(entries, after))
+                candidates = (entries[i][1] for i in range(stop - 1, lo - 1, -1))
+            else:
+                start = lo if after is None else max(lo, bisect_right(entries, after))
+                candidates = (entries[i][1] for i in range(start, hi))
+        else:
+            if sort_by in ("name_asc", "name_desc"):
+                entries = bucket.by_name
+                pid_of = lambda entry: entry[1]
+            else:
+                entries = bucket.ids
+                pid_of = lambda entry: entry
+                after = None if after is None else after[0]
+
+            if sort_by == "name_desc":
+                stop = len(entries) if after is None else bisect_left(entries, after)
+                ordered = (entries[i] for i in range(stop - 1, -1, -1))
+            else:
+                start = 0 if after is None else bisect_right(entries, after)
+                ordered = (entries[i] for i in range(start, len(entries)))
+
+            low = float("-inf") if min_price is None else min_price
+            high = float("inf") if max_price is None else max_price
+            candidates = (pid for pid in map(pid_of, ordered) if low <= rows[pid][1] <= high)
+
+        if storage is None and in_stock is None:
+            return candidates
+        return (
+            pid for pid in candidates
+            if (storage is None or rows[pid][3] == storage) and (in_stock is None or rows[pid][4] == in_stock)
+        )
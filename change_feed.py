@@ -0,0 +1,77 @@
+"""
+Worker'lar orasida o'zgarishlar lentasi (change feed)
+Ma'lumotlarning o'zi umumiy SQLite faylida, lekin indekslar, statistika
+hisoblagichlari va keshlar har bir worker xotirasida. Shuning uchun indeksga
+ta'sir qiladigan har bir yozuv _changes jadvaliga (kind, key) sifatida ham
+yoziladi. Har bir worker so'rovdan oldin o'zidan boshqa jarayonlar yozgan
+yangi o'zgarishlarni o'qiydi (poll) va o'z indekslarini yangilaydi.
+
+Poll ko'pi bilan CHANGE_FEED_POLL_MS da bir marta (main.py middleware):
+boshqa worker yozgan o'zgarish shu vaqt ichida ko'rinadi, o'zi yozgani - darhol.
+
+memory backend da (bitta jarayon) lenta o'chirilgan: publish/poll hech narsa qilmaydi.
+"""
+from typing import List, Optional, Tuple
+import os
+import threading
+
+CHANGE_FEED_KEEP = int(os.getenv("CHANGE_FEED_KEEP", "10000"))  # saqlanadigan oxirgi o'zgarishlar soni
+CHANGE_FEED_POLL_MS = int(os.getenv("CHANGE_FEED_POLL_MS", "50"))  # poll'lar orasidagi eng kam vaqt
+
+
+class ChangeFeed:
+    """_changes jadvali: seq (o'suvchi), pid (yozgan jarayon), kind, key"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.enabled = backend.name == "sqlite"
+        self._last_seq = 0
+        self._lock = threading.Lock()
+        if self.enabled:
+            backend.connection().execute(
+                "CREATE TABLE IF NOT EXISTS _changes ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, pid INTEGER NOT NULL, kind TEXT NOT NULL, key INTEGER)"
+            )
+
+    def publish(self, kind: str, key: Optional[int]) -> None:
+        """O'zgarishni boshqa worker'lar uchun yozish"""
+        if not self.enabled:
+            return
+        conn = self.backend.connection()
+        seq = conn.execute(
+            "INSERT INTO _changes (pid, kind, key) VALUES (?, ?, ?)", (os.getpid(), kind, key)
+        ).lastrowid
+        if seq % 1000 == 0:
+            conn.execute("DELETE FROM _changes WHERE seq <= ?", (seq - CHANGE_FEED_KEEP,))
+
+    def mark_current(self) -> None:
+        """Hozirgacha bo'lgan o'zgarishlarni o'qilgan deb belgilash (indekslar to'liq qurilishidan oldin)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            row = self.backend.connection().execute("SELECT MAX(seq) FROM _changes").fetchone()
+            self._last_seq = row[0] or 0
+
+    def poll(self) -> Optional[List[Tuple[str, Optional[int]]]]:
+        """
+        Boshqa jarayonlarning oxirgi poll dan keyingi o'zgarishlari (kind, key).
+        None - worker juda orqada qoldi (kerakli yozuvlar o'chirilgan), indekslarni
+        to'liq qayta qurish kerak.
+        """
+        if not self.enabled:
+            return []
+        with self._lock:
+            conn = self.backend.connection()
+            rows = conn.execute(
+                "SELECT seq, pid, kind, key FROM _changes WHERE seq > ? ORDER BY seq", (self._last_seq,)
+            ).fetchall()
+            if not rows:
+                return []
+            if rows[0][0] > self._last_seq + 1 and self._last_seq:
+                oldest = conn.execute("SELECT MIN(seq) FROM _changes").fetchone()[0]
+                if oldest > self._last_seq + 1:
+                    self._last_seq = rows[-1][0]
+                    return None
+            self._last_seq = rows[-1][0]
+            pid = os.getpid()
+            return [(kind, key) for _, row_pid, kind, key in rows if row_pid != pid]
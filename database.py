@@ -1,99 +1,243 @@
 """
 Ma'lumotlar bazasi xizmati
-Hozircha in-memory (xotirada) saqlanadi, keyinroq haqiqiy database ga o'zgartirish mumkin
+Store'lar storage.py orqali saqlanadi: in-memory (default) yoki SQLite (STORAGE_BACKEND=sqlite)
 """
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional
 from datetime import datetime, timedelta
-import os
 from models import (
-    ProductCreate, ProductResponse, CategoryCreate, CategoryResponse,
+    ProductCreate, ProductResponse, CategoryCreate, CategoryResponse, SuggestionResponse,
     CartItemCreate, CartItemResponse, OrderCreate, OrderResponse, OrderStatus,
     ReviewCreate, ReviewResponse, WishlistItemResponse, StatisticsResponse,
     VideoCreate, VideoResponse,
     UserCreate, UserResponse, UserRole, DeliveryAddressCreate, DeliveryAddressResponse,
-    OneClickBuyRequest, CompareProductsResponse
+    OneClickBuyRequest, CompareProductsResponse, FacetCount, ProductFacets,
+    SalesAnalyticsResponse, SalesBucketResponse
 )
-import hashlib
 import random
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-
-SMTP_HOST = "smtp.gmail.com"
-SMTP_PORT = 587
-SMTP_USER = "sizning_emailingiz@gmail.com"       # ← haqiqiy email
-SMTP_PASSWORD = "xxxx xxxx xxxx xxxx"            # ← Gmail App Password (16 belgi)
-
-# Environment orqali override (production uchun tavsiya)
-SMTP_HOST = os.getenv("SMTP_HOST", SMTP_HOST)
-SMTP_PORT = int(os.getenv("SMTP_PORT", str(SMTP_PORT)))
-SMTP_USER = os.getenv("SMTP_USER", SMTP_USER)
-SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", SMTP_PASSWORD)
-SMTP_TO_EMAIL = os.getenv("SMTP_TO_EMAIL", SMTP_USER)
-
-
-# ============ IN-MEMORY DATABASES ============
-# Haqiqiy loyihada SQLAlchemy, PostgreSQL, MySQL yoki MongoDB ishlatiladi
-
-# Products database
-products_db: Dict[int, dict] = {}
-products_counter = 0
+from storage import backend, Table, RecordList
+from search_index import SearchIndex, TrigramIndex
+from catalog_index import ProductSortIndex, encode_cursor, decode_cursor
+from catalog_columns import product_columns, CATALOG_NUMPY_MIN_OFFSET  # NumPy yo'q bo'lsa product_columns = None
+from cart_store import CartStore
+from review_index import ReviewIndex
+from analytics import OrderStats, SalesRollups
+from order_index import OrderIndex
+from response_cache import response_cache
+from token_cache import token_cache
+from change_feed import ChangeFeed
+from email_outbox import EmailOutbox, SMTP_TO_EMAIL
+from ttl_store import TTLStore
+from catalog_snapshot import with_catalog_snapshot
+from product_rows import ProductRows
+from password_hashing import hash_password, verify_password, needs_rehash
+
+
+# ============ DATABASES (STORAGE BACKEND) ============
+# Har bir store storage.py dagi backend jadvali (memory yoki SQLite).
+# dict kabi ishlatiladi: o'zgartirilgan record qayta yozilishi kerak (db[id] = record)
+
+# Products database: xotirada ixcham ustunlar (product_rows.py); CATALOG_SNAPSHOT_PATH
+# sozlangan bo'lsa - mmap katalog fayli + shu jadvaldagi o'zgarishlar
+products_db: Table = with_catalog_snapshot(
+    backend.table("products", indexes=("category_id",), row_store=ProductRows)
+)
 
 # Categories database
-categories_db: Dict[int, dict] = {}
-categories_counter = 0
+categories_db: Table = backend.table("categories")
 
-# Cart database (session-based, haqiqiy loyihada user_id bilan bog'lash kerak)
-cart_db: Dict[int, dict] = {}  # cart_item_id -> cart_item_data
-cart_counter = 0
+# Carts database: cart_key ("user:<id>" yoki "session:<token>") -> savatcha (cart_store.py)
+carts_db: Table = backend.table("carts", key_type=str)
+carts = CartStore(carts_db)
 
 # Orders database
-orders_db: Dict[int, dict] = {}
-orders_counter = 0
+orders_db: Table = backend.table("orders", indexes=("customer_phone", "customer_email"))
 
 # Form submissions database
-callbacks_db: List[dict] = []
-credit_applications_db: List[dict] = []
-trade_in_requests_db: List[dict] = []
-price_match_requests_db: List[dict] = []
-newsletter_subscribers_db: List[dict] = []
-submit_forms_db: List[dict] = []
+callbacks_db = RecordList(backend.table("callbacks"))
+credit_applications_db = RecordList(backend.table("credit_applications"))
+trade_in_requests_db = RecordList(backend.table("trade_in_requests"))
+price_match_requests_db = RecordList(backend.table("price_match_requests"))
+newsletter_subscribers_db = RecordList(backend.table("newsletter_subscribers"))
+submit_forms_db = RecordList(backend.table("submit_forms"))
+
+# Email navbati: yuborilmagan xabarlar (email_outbox.py worker'lari yuboradi)
+email_outbox_db: Table = backend.table("email_outbox", indexes=("status",))
+email_outbox = EmailOutbox(email_outbox_db)
 
 # Reviews database
-reviews_db: Dict[int, dict] = {}  # review_id -> review_data
-reviews_counter = 0
+reviews_db: Table = backend.table("reviews", indexes=("product_id",))  # review_id -> review_data
 
 # Wishlist database
-wishlist_db: Dict[int, dict] = {}  # wishlist_item_id -> wishlist_item_data
-wishlist_counter = 0
+wishlist_db: Table = backend.table("wishlist", indexes=("product_id",))  # wishlist_item_id -> wishlist_item_data
 
 # Users database
-users_db: Dict[int, dict] = {}  # user_id -> user_data
-users_counter = 0
+users_db: Table = backend.table("users", indexes=("email", "username", "phone"))  # user_id -> user_data
 
 # Verification codes database (phone -> code, expires_at)
-verification_codes_db: Dict[str, dict] = {}  # phone -> {code, expires_at, user_id}
+verification_codes_db: Table = backend.table("verification_codes", key_type=str)  # phone -> {code, expires_at, user_id}
+VERIFICATION_CODE_TTL = timedelta(minutes=10)
+verification_codes = TTLStore(verification_codes_db, VERIFICATION_CODE_TTL)  # ttl_store.py
 
 # Delivery addresses database
-delivery_addresses_db: Dict[int, dict] = {}  # address_id -> address_data
-delivery_addresses_counter = 0
+delivery_addresses_db: Table = backend.table("delivery_addresses", indexes=("user_id",))  # address_id -> address_data
 
 # Videos database
-videos_db: Dict[int, dict] = {}
-videos_counter = 0
+videos_db: Table = backend.table("videos", indexes=("product_id",))
 
 # Password reset tokens database
-password_reset_tokens_db: Dict[str, dict] = {}  # email -> {token, expires_at, user_id}
+password_reset_tokens_db: Table = backend.table(
+    "password_reset_tokens", indexes=("token", "user_id"), key_type=str
+)  # email -> {token, expires_at, user_id}
+PASSWORD_RESET_TOKEN_TTL = timedelta(hours=1)
+password_reset_tokens = TTLStore(password_reset_tokens_db, PASSWORD_RESET_TOKEN_TTL)  # ttl_store.py
+
+# Sales analytics rollups (analytics.py): vaqt bucket'lari bo'yicha yig'ilgan savdo
+sales_rollups_db: Table = backend.table("sales_rollups", indexes=("slot",), key_type=str)  # katak kaliti -> {orders, units, revenue}
+sales_facts_db: Table = backend.table("sales_facts")  # order_id -> buyurtmaning rollup dagi ulushi
+sales_rollups = SalesRollups(sales_rollups_db, sales_facts_db, backend.transaction)
+
+
+# ============ IN-PROCESS INDEXES ============
+# Store'lardan hosil qilinadigan indekslar: yozuvchi funksiyalar ularni
+# darhol yangilaydi, startup da esa rebuild_indexes() qaytadan quradi
+
+# Qidiruv indeksi (mahsulot nomi va tavsifi)
+product_search_index = SearchIndex()
+
+# Xatoga chidamli takliflar uchun trigram indeks (mahsulot nomlari)
+product_suggest_index = TrigramIndex()
+
+# Pagination uchun kategoriya bo'yicha narx/nom tartiblangan indeks
+product_sort_index = ProductSortIndex()
+product_review_index = ReviewIndex()  # product_id -> sharh ID lari, soni, yig'indi, histogramma
+order_stats = OrderStats()  # OrderStatus -> buyurtmalar soni va summasi (/statistics uchun)
+order_index = OrderIndex()  # telefon/email/user_id va holat -> sana bo'yicha tartiblangan buyurtma ID lari
+
+# Boshqa worker'lar yozgan o'zgarishlar (change_feed.py): sync_from_peers() ularni shu indekslarga qo'llaydi
+change_feed = ChangeFeed(backend)
+
+
+def _index_product(product_data: dict) -> None:
+    """Mahsulotni barcha indekslarga qo'shish (yoki yangilash)"""
+    product_search_index.add(product_data["id"], product_data.get("name"), product_data.get("description"))
+    product_suggest_index.add(product_data["id"], product_data.get("name"))
+    product_sort_index.add(
+        product_data["id"], product_data.get("category_id"), product_data["price"], product_data.get("name"),
+        storage=product_data.get("storage"), in_stock=product_data.get("in_stock", True)
+    )
+    if product_columns is not None:
+        product_columns.add(
+            product_data["id"], product_data["price"], product_data.get("category_id"),
+            product_data.get("in_stock", True)
+        )
+
+
+def _unindex_product(product_id: int) -> None:
+    """Mahsulotni barcha indekslardan olib tashlash"""
+    product_search_index.remove(product_id)
+    product_suggest_index.remove(product_id)
+    product_sort_index.remove(product_id)
+    if product_columns is not None:
+        product_columns.remove(product_id)
+
+
+def rebuild_indexes() -> None:
+    """Indekslarni store'lardan qaytadan qurish (masalan, SQLite dan ishga tushganda)"""
+    change_feed.mark_current()  # Qurish davomidagi o'zgarishlar keyin qayta qo'llanadi (idempotent)
+    product_search_index.clear()
+    product_suggest_index.clear()
+    product_sort_index.clear()
+    if product_columns is not None:
+        product_columns.clear()
+    product_review_index.clear()
+    for product_data in products_db.values():
+        _index_product(product_data)
+    for review_data in reviews_db.values():
+        product_review_index.add(review_data["id"], review_data["product_id"], review_data["rating"])
+    order_stats.clear()
+    order_index.clear()
+    for order_data in orders_db.values():
+        order_stats.add(order_data["status"], order_data["total_price"])
+        order_index.add(order_data)
+    carts.load()
+    verification_codes.load()
+    password_reset_tokens.load()
+
+
+def _sync_order(order_id: int) -> None:
+    """Boshqa worker yozgan buyurtmani statistika va indeksga qo'llash"""
+    order = orders_db.get(order_id)
+    if order is None:
+        return
+    old_status = order_index.status_of(order_id)
+    if old_status is None:
+        order_stats.add(order["status"], order["total_price"])
+        order_index.add(order)
+    elif old_status != order["status"]:
+        order_stats.transition(old_status, order["status"], order["total_price"])
+        order_index.set_status(order_id, order["status"])
+
+
+def sync_from_peers() -> None:
+    """
+    Boshqa worker'lar yozgan o'zgarishlarni shu jarayon indekslari va
+    keshlariga qo'llash (so'rovdan oldin, CHANGE_FEED_POLL_MS da bir marta, main.py middleware).
+    """
+    changes = change_feed.poll()
+    if changes is None:
+        products_db.refresh()
+        rebuild_indexes()
+        response_cache.clear()
+        token_cache.clear()
+        return
+    for kind, key in changes:
+        if kind == "product":
+            products_db.refresh(key)
+            product_data = products_db.get(key)
+            if product_data is None:
+                _unindex_product(key)
+            else:
+                _index_product(product_data)
+            response_cache.invalidate("products", f"product:{key}")
+        elif kind == "category":
+            response_cache.invalidate("categories", f"category:{key}")
+        elif kind == "review":
+            review_data = reviews_db.get(key)
+            if review_data is not None and (review_data["product_id"], key) not in product_review_index:
+                product_review_index.add(key, review_data["product_id"], review_data["rating"])
+                response_cache.invalidate("products", f"product:{review_data['product_id']}")
+        elif kind == "order":
+            _sync_order(key)
+        elif kind == "user":
+            token_cache.invalidate_user(key)
+
+
+def prepare_shared_state() -> None:
+    """
+    Bir martalik ishga tushirish ishlari: eski buyurtmalarni normallashtirish,
+    namuna ma'lumotlar va yuborilmay qolgan emaillarni bo'shatish.
+    gunicorn da master jarayonda (fork dan oldin) bir marta, bitta jarayonli
+    rejimda esa startup da chaqiriladi.
+    """
+    with backend.transaction():  # Bir vaqtda ishga tushgan jarayonlar navbat bilan
+        normalize_stored_orders()
+        initialize_sample_data()
+        email_outbox.release()
 
 
 # ============ PRODUCT FUNCTIONS ============
+def _product_response(product_data: dict) -> ProductResponse:
+    """Mahsulot yozuvi + sharhlar bo'yicha o'rtacha baho va soni (indeksdan, O(1))"""
+    average_rating, total_reviews = product_review_index.stats(product_data["id"])
+    return ProductResponse(**product_data, average_rating=average_rating, total_reviews=total_reviews)
+
+
 def create_product(product: ProductCreate) -> ProductResponse:
     """Yangi mahsulot yaratish"""
-    global products_counter
-    products_counter += 1
+    product_id = products_db.next_id()
 
     product_data = {
-    "id": products_counter,
+    "id": product_id,
     "name": product.name or "",
     "description": product.description or "",
     "price": product.price,
@@ -104,54 +248,66 @@ def create_product(product: ProductCreate) -> ProductResponse:
     "created_at": datetime.now()
     }
 
-    products_db[products_counter] = product_data
-    return ProductResponse(**product_data)
+    products_db[product_id] = product_data
+    _index_product(product_data)
+    response_cache.invalidate("products")
+    change_feed.publish("product", product_id)
+    return _product_response(product_data)
 
 
 def get_product(product_id: int) -> Optional[ProductResponse]:
     """Mahsulotni ID bo'yicha olish"""
     product = products_db.get(product_id)
     if product:
-        return ProductResponse(**product)
+        return _product_response(product)
     return None
 
 
 def get_all_products(category_id: Optional[int] = None) -> List[ProductResponse]:
     """Barcha mahsulotlarni olish (kategoriya bo'yicha filtrlash mumkin)"""
-    products = list(products_db.values())
-
     if category_id:
-        products = [p for p in products if p.get("category_id") == category_id]
+        products = products_db.find("category_id", category_id)
+    else:
+        products = products_db.values()
 
-    return [ProductResponse(**p) for p in products]
+    return [_product_response(p) for p in products]
 
 
-def search_products(query: str) -> List[ProductResponse]:
-    """Mahsulotlarni qidirish"""
-    query_lower = query.lower()
+def search_products(query: str, limit: Optional[int] = None) -> tuple[List[ProductResponse], int]:
+    """Mahsulotlarni qidirish (relevantlik bo'yicha tartiblangan natijalar, jami soni)"""
+    product_ids, total = product_search_index.search(query, limit=limit)
     results = []
 
-    for product in products_db.values():
-        if (query_lower in product["name"].lower() or
-                (product["description"] and query_lower in product["description"].lower())):
-            results.append(ProductResponse(**product))
+    for product_id in product_ids:
+        product = products_db.get(product_id)
+        if product:
+            results.append(_product_response(product))
+
+    return results, total
 
-    return results
+
+def suggest_products(query: str, limit: int = 10) -> List[SuggestionResponse]:
+    """Xatoli yozilgan so'rov uchun ham mahsulot nomlarini taklif qilish"""
+    return [
+        SuggestionResponse(text=text, product_id=product_id, score=score)
+        for text, product_id, score in product_suggest_index.suggest(query, limit=limit)
+    ]
 
 
 # ============ CATEGORY FUNCTIONS ============
 def create_category(category: CategoryCreate) -> CategoryResponse:
     """Yangi kategoriya yaratish"""
-    global categories_counter
-    categories_counter += 1
+    category_id = categories_db.next_id()
 
     category_data = {
-        "id": categories_counter,
+        "id": category_id,
         "name": category.name,
         "slug": category.slug or category.name.lower().replace(" ", "-")
     }
 
-    categories_db[categories_counter] = category_data
+    categories_db[category_id] = category_data
+    response_cache.invalidate("categories")
+    change_feed.publish("category", category_id)
     return CategoryResponse(**category_data)
 
 
@@ -169,75 +325,149 @@ def get_all_categories() -> List[CategoryResponse]:
 
 
 # ============ CART FUNCTIONS ============
-def add_to_cart(cart_item: CartItemCreate) -> CartItemResponse:
+def add_to_cart(cart_key: str, cart_item: CartItemCreate) -> CartItemResponse:
     """Savatchaga mahsulot qo'shish"""
-    global cart_counter
-
     product = get_product(cart_item.product_id)
     if not product:
         raise ValueError(f"Mahsulot topilmadi: {cart_item.product_id}")
 
-    existing_item = None
-    for item_id, item_data in cart_db.items():
-        if item_data["product_id"] == cart_item.product_id:
-            existing_item = item_id
-            break
-
-    if existing_item:
-        cart_db[existing_item]["quantity"] += cart_item.quantity
-        item_data = cart_db[existing_item]
-    else:
-        cart_counter += 1
-        item_data = {
-            "id": cart_counter,
-            "product_id": cart_item.product_id,
-            "product_name": product.name,
-            "product_price": product.price,
-            "product_image": product.image_url,
-            "quantity": cart_item.quantity,
-            "total_price": product.price * cart_item.quantity
-        }
-        cart_db[cart_counter] = item_data
+    with carts.edit(cart_key) as cart:
+        item_id = cart["products"].get(str(cart_item.product_id))
+
+        if item_id is not None:
+            item_data = cart["items"][str(item_id)]
+            item_data["quantity"] += cart_item.quantity
+            item_data["total_price"] = item_data["product_price"] * item_data["quantity"]
+        else:
+            item_id = cart["next_item_id"]
+            cart["next_item_id"] += 1
+            item_data = {
+                "id": item_id,
+                "product_id": cart_item.product_id,
+                "product_name": product.name,
+                "product_price": product.price,
+                "product_image": product.image_url,
+                "quantity": cart_item.quantity,
+                "total_price": product.price * cart_item.quantity
+            }
+            cart["items"][str(item_id)] = item_data
+            cart["products"][str(cart_item.product_id)] = item_id
 
     return CartItemResponse(**item_data)
 
 
-def get_cart() -> List[CartItemResponse]:
+def get_cart(cart_key: str) -> List[CartItemResponse]:
     """Savatchadagi barcha mahsulotlarni olish"""
-    return [CartItemResponse(**item) for item in cart_db.values()]
+    cart = carts.get(cart_key)
+    if not cart:
+        return []
+    return [CartItemResponse(**item) for item in cart["items"].values()]
 
 
-def update_cart_item(item_id: int, quantity: int) -> Optional[CartItemResponse]:
+def update_cart_item(cart_key: str, item_id: int, quantity: int) -> Optional[CartItemResponse]:
     """Savatchadagi mahsulot miqdorini yangilash"""
-    if item_id not in cart_db:
-        return None
+    with carts.edit(cart_key) as cart:
+        item_data = cart["items"].get(str(item_id))
+        if item_data is None:
+            return None
 
-    item_data = cart_db[item_id]
-    item_data["quantity"] = quantity
-    item_data["total_price"] = item_data["product_price"] * quantity
+        item_data["quantity"] = quantity
+        item_data["total_price"] = item_data["product_price"] * quantity
 
     return CartItemResponse(**item_data)
 
 
-def remove_from_cart(item_id: int) -> bool:
+def remove_from_cart(cart_key: str, item_id: int) -> bool:
     """Savatchadan mahsulotni olib tashlash"""
-    if item_id in cart_db:
-        del cart_db[item_id]
-        return True
-    return False
+    with carts.edit(cart_key) as cart:
+        item_data = cart["items"].pop(str(item_id), None)
+        if item_data is None:
+            return False
+        cart["products"].pop(str(item_data["product_id"]), None)
+    return True
 
 
-def clear_cart():
+def clear_cart(cart_key: str):
     """Savatchani tozalash"""
-    global cart_db
-    cart_db = {}
+    carts.delete(cart_key)
+
+
+def merge_carts(source_key: str, target_key: str) -> None:
+    """
+    Sessiya savatchasini foydalanuvchi savatchasiga qo'shish (login dan keyin).
+    Bir xil mahsulotlar miqdori qo'shiladi, sessiya savatchasi o'chiriladi.
+    """
+    if source_key == target_key:
+        return
+    source = carts.get(source_key)
+    if not source:
+        return
+
+    with carts.edit(target_key) as cart:
+        for item in source["items"].values():
+            item_id = cart["products"].get(str(item["product_id"]))
+            if item_id is not None:
+                item_data = cart["items"][str(item_id)]
+                item_data["quantity"] += item["quantity"]
+                item_data["total_price"] = item_data["product_price"] * item_data["quantity"]
+            else:
+                item_id = cart["next_item_id"]
+                cart["next_item_id"] += 1
+                cart["items"][str(item_id)] = dict(item, id=item_id)
+                cart["products"][str(item["product_id"])] = item_id
+    carts.delete(source_key)
 
 
 # ============ ORDER FUNCTIONS ============
-def create_order(order: OrderCreate, cart_items: List[CartItemResponse], user: UserResponse) -> OrderResponse:
+# Buyurtma yozuvi yozilayotganda bir marta normallashtiriladi: barcha maydonlar
+# mavjud, items - oddiy dict lar, status - matn. O'qishda yozuv o'zgartirilmaydi,
+# Pydantic obyektlari ham yaratilmaydi - JSON ga tayyor yengil ko'rinish qaytadi.
+ORDER_FIELDS = (
+    "id", "user_id", "customer_name", "customer_phone", "customer_email",
+    "delivery_address", "delivery_address_id", "status", "total_price",
+    "items", "notes", "created_at"
+)
+ORDER_ITEM_FIELDS = ("id", "product_id", "product_name", "product_price", "product_image", "quantity", "total_price")
+ORDER_VIEW_FIELDS = tuple(field for field in ORDER_FIELDS if field != "delivery_address_id")
+
+
+def _normalize_order(order_data: dict) -> dict:
+    """Buyurtmani saqlanadigan ixcham ko'rinishga keltirish (faqat yozishda)"""
+    record = {field: order_data.get(field) for field in ORDER_FIELDS}
+    record["status"] = OrderStatus(record["status"]).value
+    record["items"] = [
+        {field: (item.get(field) if isinstance(item, dict) else getattr(item, field)) for field in ORDER_ITEM_FIELDS}
+        for item in order_data.get("items") or []
+    ]
+    return record
+
+
+def _order_view(order_data: dict) -> dict:
+    """Saqlangan buyurtmadan JSON ga tayyor ko'rinish (OrderResponse shakli)"""
+    view = {field: order_data[field] for field in ORDER_VIEW_FIELDS}
+    view["created_at"] = order_data["created_at"].isoformat()
+    return view
+
+
+def normalize_stored_orders() -> int:
+    """Eski formatdagi buyurtmalarni bir marta normallashtirish (startup). Natija: yangilanganlar soni"""
+    updated = 0
+    for order_data in orders_db.values():
+        record = _normalize_order(order_data)
+        if record != order_data:
+            orders_db[order_data["id"]] = record
+            updated += 1
+    return updated
+
+
+def _product_category(product_id: int) -> Optional[int]:
+    """Savdo analitikasi uchun mahsulot kategoriyasi (mahsulot o'chirilgan bo'lsa None)"""
+    return products_db.field(product_id, "category_id")
+
+
+def create_order(order: OrderCreate, cart_items: List[CartItemResponse], user: UserResponse, cart_key: str) -> OrderResponse:
     """Yangi buyurtma yaratish"""
-    global orders_counter
-    orders_counter += 1
+    order_id = orders_db.next_id()
 
     total_price = sum(item.total_price for item in cart_items)
 
@@ -248,7 +478,7 @@ def create_order(order: OrderCreate, cart_items: List[CartItemResponse], user: U
             delivery_address_text = f"{address.address}, {address.city}"
 
     order_data = {
-        "id": orders_counter,
+        "id": order_id,
         "user_id": user.id,
         "customer_name": user.full_name,
         "customer_phone": user.phone,
@@ -262,17 +492,19 @@ def create_order(order: OrderCreate, cart_items: List[CartItemResponse], user: U
         "created_at": datetime.now()
     }
 
-    orders_db[orders_counter] = order_data
-    clear_cart()
+    order_data = _normalize_order(order_data)
+    orders_db[order_id] = order_data
+    order_stats.add(order_data["status"], order_data["total_price"])
+    order_index.add(order_data)
+    sales_rollups.add_order(order_data, _product_category)
+    change_feed.publish("order", order_id)
+    clear_cart(cart_key)
 
     return OrderResponse(**order_data)
 
 
 def create_one_click_order(request: OneClickBuyRequest) -> OrderResponse:
     """1-click buy - bir bosishda sotib olish (savatga qo'shmasdan)"""
-    global orders_counter
-    orders_counter += 1
-
     product = get_product(request.product_id)
     if not product:
         raise ValueError(f"Mahsulot topilmadi: {request.product_id}")
@@ -280,6 +512,8 @@ def create_one_click_order(request: OneClickBuyRequest) -> OrderResponse:
     if not product.in_stock:
         raise ValueError(f"Mahsulot omborda yo'q: {product.name}")
 
+    order_id = orders_db.next_id()
+
     total_price = product.price * request.quantity
 
     cart_item = CartItemResponse(
@@ -293,7 +527,7 @@ def create_one_click_order(request: OneClickBuyRequest) -> OrderResponse:
     )
 
     order_data = {
-        "id": orders_counter,
+        "id": order_id,
         "user_id": None,
         "customer_name": request.name,
         "customer_phone": request.phone,
@@ -307,39 +541,86 @@ def create_one_click_order(request: OneClickBuyRequest) -> OrderResponse:
         "created_at": datetime.now()
     }
 
-    orders_db[orders_counter] = order_data
+    order_data = _normalize_order(order_data)
+    orders_db[order_id] = order_data
+    order_stats.add(order_data["status"], order_data["total_price"])
+    order_index.add(order_data)
+    sales_rollups.add_order(order_data, _product_category)
+    change_feed.publish("order", order_id)
 
     return OrderResponse(**order_data)
 
 
-def get_order(order_id: int) -> Optional[OrderResponse]:
-    """Buyurtmani ID bo'yicha olish"""
+def get_order(order_id: int) -> Optional[dict]:
+    """Buyurtmani ID bo'yicha olish (JSON ko'rinishi)"""
     order = orders_db.get(order_id)
     if order:
-        order["items"] = [CartItemResponse(**item) for item in order["items"]]
-        if "user_id" not in order:
-            order["user_id"] = None
-        if "delivery_address" not in order:
-            order["delivery_address"] = None
-        if "notes" not in order:
-            order["notes"] = None
-        return OrderResponse(**order)
+        return _order_view(order)
     return None
 
 
-def get_all_orders() -> List[OrderResponse]:
-    """Barcha buyurtmalarni olish"""
+def get_orders(
+    phone: Optional[str] = None,
+    email: Optional[str] = None,
+    user_id: Optional[int] = None,
+    status: Optional[OrderStatus] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    page: int = 1,
+    page_size: Optional[int] = None
+) -> tuple[List[dict], int]:
+    """
+    Buyurtmalar (eng yangisidan boshlab) va filtrga mos jami soni.
+    Egasi bo'yicha filtr: user_id, phone yoki email (birinchi berilgani).
+    Faqat sahifadagi buyurtmalar o'qiladi (order_index dan).
+    """
+    if user_id is not None:
+        owner, value = "user_id", user_id
+    elif phone:
+        owner, value = "phone", phone
+    elif email:
+        owner, value = "email", email
+    else:
+        owner, value = "all", None
+
+    offset = (page - 1) * page_size if page_size else 0
+    order_ids, total = order_index.page(
+        owner, value,
+        status=OrderStatus(status).value if status else None,
+        date_from=date_from,
+        date_to=date_to,
+        offset=offset,
+        limit=page_size
+    )
+
     orders = []
-    for order_data in orders_db.values():
-        order_data["items"] = [CartItemResponse(**item) for item in order_data["items"]]
-        if "user_id" not in order_data:
-            order_data["user_id"] = None
-        if "delivery_address" not in order_data:
-            order_data["delivery_address"] = None
-        if "notes" not in order_data:
-            order_data["notes"] = None
-        orders.append(OrderResponse(**order_data))
-    return orders
+    for order_id in order_ids:
+        order_data = orders_db.get(order_id)
+        if order_data:
+            orders.append(_order_view(order_data))
+    return orders, total
+
+
+def iter_orders(
+    status: Optional[OrderStatus] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None
+) -> Iterator[dict]:
+    """Filtrga mos buyurtmalar eng eskisidan boshlab, bittadan (eksport uchun, xotira O(1))"""
+    order_ids = order_index.iter_ids(
+        status=OrderStatus(status).value if status else None,
+        date_from=date_from,
+        date_to=date_to
+    )
+    for order_id in order_ids:
+        order_data = orders_db.get(order_id)
+        if order_data:
+            yield _order_view(order_data)
+
+
+def get_all_orders() -> List[dict]:
+    """Barcha buyurtmalarni olish (JSON ko'rinishlari)"""
+    return get_orders()[0]
 
 
 # ============ INITIAL DATA (Dummy data for testing) ============
@@ -356,11 +637,18 @@ def initialize_sample_data():
             ),
             role=UserRole.ADMIN
         )
-        users_db[admin_user.id]["is_verified"] = True
+        admin_data = users_db[admin_user.id]
+        admin_data["is_verified"] = True
+        _save_user(admin_data)
         print(f"✅ Admin foydalanuvchi yaratildi: {admin_user.username} (ID: {admin_user.id})")
     except ValueError:
         print("ℹ️  Admin foydalanuvchi allaqachon mavjud")
 
+    # Doimiy backend (SQLite) da katalog restartdan keyin ham saqlanib qoladi
+    if len(products_db) > 0:
+        print("ℹ️  Katalog allaqachon to'ldirilgan")
+        return
+
     category1 = create_category(CategoryCreate(name="iPhone", slug="iphone"))
     category2 = create_category(CategoryCreate(name="Samsung", slug="samsung"))
     create_category(CategoryCreate(name="iPad", slug="ipad"))
@@ -570,15 +858,13 @@ def initialize_sample_data():
 # ============ REVIEW FUNCTIONS ============
 def create_review(review: ReviewCreate) -> ReviewResponse:
     """Yangi sharh yaratish"""
-    global reviews_counter
-    reviews_counter += 1
-
     product = get_product(review.product_id)
     if not product:
         raise ValueError(f"Mahsulot topilmadi: {review.product_id}")
 
+    review_id = reviews_db.next_id()
     review_data = {
-        "id": reviews_counter,
+        "id": review_id,
         "product_id": review.product_id,
         "customer_name": review.customer_name,
         "rating": review.rating,
@@ -586,14 +872,24 @@ def create_review(review: ReviewCreate) -> ReviewResponse:
         "created_at": datetime.now()
     }
 
-    reviews_db[reviews_counter] = review_data
+    reviews_db[review_id] = review_data
+    product_review_index.add(review_id, review.product_id, review.rating)
+    # O'rtacha baho va sharhlar soni mahsulot javoblarida bor
+    response_cache.invalidate("products", f"product:{review.product_id}")
+    change_feed.publish("review", review_id)
     return ReviewResponse(**review_data)
 
 
-def get_product_reviews(product_id: int) -> List[ReviewResponse]:
-    """Mahsulot sharhlarini olish"""
-    reviews = [r for r in reviews_db.values() if r["product_id"] == product_id]
-    return [ReviewResponse(**r) for r in reviews]
+def get_product_reviews(product_id: int, page: int = 1, page_size: Optional[int] = None) -> List[ReviewResponse]:
+    """Mahsulot sharhlarini olish (eng yangisidan boshlab; page_size berilmasa hammasi)"""
+    offset = (page - 1) * page_size if page_size else 0
+    review_ids, _ = product_review_index.page(product_id, offset=max(offset, 0), limit=page_size)
+    reviews = []
+    for review_id in review_ids:
+        review_data = reviews_db.get(review_id)
+        if review_data:
+            reviews.append(ReviewResponse(**review_data))
+    return reviews
 
 
 def get_all_reviews() -> List[ReviewResponse]:
@@ -604,14 +900,11 @@ def get_all_reviews() -> List[ReviewResponse]:
 # ============ WISHLIST FUNCTIONS ============
 def add_to_wishlist(product_id: int) -> WishlistItemResponse:
     """Wishlist ga mahsulot qo'shish"""
-    global wishlist_counter
-
     product = get_product(product_id)
     if not product:
         raise ValueError(f"Mahsulot topilmadi: {product_id}")
 
-    for item_id, item_data in wishlist_db.items():
-        if item_data["product_id"] == product_id:
+    for item_data in wishlist_db.find("product_id", product_id):
             stored_product = ProductResponse(**item_data["product"])
             return WishlistItemResponse(
                 id=item_data["id"],
@@ -620,17 +913,17 @@ def add_to_wishlist(product_id: int) -> WishlistItemResponse:
                 added_at=item_data["added_at"]
             )
 
-    wishlist_counter += 1
+    item_id = wishlist_db.next_id()
     item_data = {
-        "id": wishlist_counter,
+        "id": item_id,
         "product_id": product_id,
         "product": product.dict(),
         "added_at": datetime.now()
     }
-    wishlist_db[wishlist_counter] = item_data
+    wishlist_db[item_id] = item_data
 
     return WishlistItemResponse(
-        id=wishlist_counter,
+        id=item_id,
         product_id=product_id,
         product=product,
         added_at=item_data["added_at"]
@@ -654,10 +947,9 @@ def get_wishlist() -> List[WishlistItemResponse]:
 
 def remove_from_wishlist(product_id: int) -> bool:
     """Wishlist dan mahsulotni olib tashlash"""
-    for item_id, item_data in list(wishlist_db.items()):
-        if item_data["product_id"] == product_id:
-            del wishlist_db[item_id]
-            return True
+    for item_data in wishlist_db.find("product_id", product_id):
+        del wishlist_db[item_data["id"]]
+        return True
     return False
 
 
@@ -668,75 +960,149 @@ def get_products_paginated(
     category_id: Optional[int] = None,
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
-    sort_by: Optional[str] = None  # "price_asc", "price_desc", "name_asc", "name_desc"
-) -> tuple[List[ProductResponse], int]:
-    """Sahifalangan mahsulotlar ro'yxati"""
-    products = get_all_products(category_id=category_id)
+    sort_by: Optional[str] = None,  # "price_asc", "price_desc", "name_asc", "name_desc"
+    after: Optional[str] = None,  # Cursor: oldingi sahifaning next_cursor qiymati
+    storage: Optional[str] = None,
+    in_stock: Optional[bool] = None
+) -> tuple[List[ProductResponse], int, Optional[str]]:
+    """
+    Sahifalangan mahsulotlar ro'yxati (faqat sahifadagi mahsulotlar yaratiladi)
+    Natija: (mahsulotlar, jami soni, keyingi sahifa cursori yoki None)
+    after berilsa page e'tiborsiz qoldiriladi (keyset pagination)
+    """
+    filters = dict(
+        category_id=category_id,
+        min_price=min_price or None,
+        max_price=max_price or None,
+        sort_by=sort_by,
+        storage=storage or None,
+        in_stock=in_stock
+    )
+    if after:
+        product_ids, total, has_more, last_key = product_sort_index.page_after(
+            decode_cursor(after, sort_by), limit=page_size, **filters
+        )
+    else:
+        start = max((page - 1) * page_size, 0)
+        if (
+            product_columns is not None and in_stock is not None and not storage
+            and start >= CATALOG_NUMPY_MIN_OFFSET and sort_by in (None, "price_asc", "price_desc")
+        ):
+            # Indeks bu holatda tartib bo'ylab Python da yuradi (O(offset)) - NumPy mask tezroq
+            product_ids, total, last_key = product_columns.query(
+                start, page_size, category_id=category_id, min_price=filters["min_price"],
+                max_price=filters["max_price"], in_stock=in_stock, sort_by=sort_by
+            )
+        else:
+            product_ids, total, last_key = product_sort_index.page(offset=start, limit=page_size, **filters)
+        has_more = start + len(product_ids) < total
+
+    # Kalit indeks lock'i ichida olingan: oxirgi mahsulot hozir o'chirilgan bo'lsa ham cursor to'g'ri
+    next_cursor = encode_cursor(sort_by, last_key) if has_more and last_key is not None else None
 
-    if min_price:
-        products = [p for p in products if p.price >= min_price]
-    if max_price:
-        products = [p for p in products if p.price <= max_price]
+    paginated_products = []
+    for product_id in product_ids:
+        product = products_db.get(product_id)
+        if product:
+            paginated_products.append(_product_response(product))
 
-    if sort_by == "price_asc":
-        products = sorted(products, key=lambda x: x.price)
-    elif sort_by == "price_desc":
-        products = sorted(products, key=lambda x: x.price, reverse=True)
-    elif sort_by == "name_asc":
-        products = sorted(products, key=lambda x: x.name)
-    elif sort_by == "name_desc":
-        products = sorted(products, key=lambda x: x.name, reverse=True)
+    return paginated_products, total, next_cursor
 
-    total = len(products)
-    start = (page - 1) * page_size
-    end = start + page_size
-    paginated_products = products[start:end]
 
-    return paginated_products, total
+def get_product_facets(
+    category_id: Optional[int] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    storage: Optional[str] = None,
+    in_stock: Optional[bool] = None
+) -> ProductFacets:
+    """
+    Joriy filtr uchun facet sonlari: kategoriya, xotira, omborda borligi va narx oraliqlari.
+    Katalog aylanmaydi - sonlar indeks kataklaridan olinadi.
+    """
+    counts = product_sort_index.facet_counts(
+        category_id=category_id,
+        storage=storage or None,
+        in_stock=in_stock,
+        min_price=min_price or None,
+        max_price=max_price or None
+    )
+    ordered = lambda values: sorted(values.items(), key=lambda item: (-item[1], str(item[0])))
+    return ProductFacets(
+        category_id=[FacetCount(value=value, count=count) for value, count in ordered(counts["category_id"])],
+        storage=[FacetCount(value=value, count=count) for value, count in ordered(counts["storage"])],
+        in_stock=[FacetCount(value=value, count=count) for value, count in ordered(counts["in_stock"])],
+        price=[FacetCount(value=value, count=count) for value, count in counts["price"].items()]
+    )
 
 
 # ============ ORDER STATUS UPDATE ============
-def update_order_status(order_id: int, new_status: OrderStatus) -> Optional[OrderResponse]:
-    """Buyurtma holatini yangilash"""
-    if order_id not in orders_db:
+def update_order_status(order_id: int, new_status: OrderStatus) -> Optional[dict]:
+    """Buyurtma holatini yangilash (yangi yozuv saqlanadi, eskisi o'zgartirilmaydi)"""
+    order = orders_db.get(order_id)
+    if order is None:
         return None
 
-    orders_db[order_id]["status"] = new_status
-    order = orders_db[order_id]
-    order["items"] = [CartItemResponse(**item) for item in order["items"]]
-    return OrderResponse(**order)
+    old_status = order["status"]
+    order = dict(order, status=OrderStatus(new_status).value)
+    orders_db[order_id] = order
+    order_stats.transition(old_status, new_status, order["total_price"])
+    order_index.set_status(order_id, order["status"])
+    sales_rollups.change_status(order_id, new_status)
+    change_feed.publish("order", order_id)
+    return _order_view(order)
 
 
 # ============ STATISTICS FUNCTIONS ============
 def get_statistics() -> StatisticsResponse:
     """Statistikalar"""
-    total_products = len(products_db)
-    total_categories = len(categories_db)
-    total_orders = len(orders_db)
+    # Buyurtmalar bo'yicha barcha sonlar order_stats hisoblagichlaridan (O(1))
+    return StatisticsResponse(
+        total_products=len(product_sort_index),
+        total_categories=len(categories_db),
+        total_orders=order_stats.total_orders,
+        total_revenue=order_stats.value(OrderStatus.DELIVERED),
+        pending_orders=order_stats.count(OrderStatus.PENDING),
+        completed_orders=order_stats.count(OrderStatus.DELIVERED),
+        average_order_value=order_stats.average_order_value
+    )
 
-    total_revenue = sum(order["total_price"] for order in orders_db.values()
-                        if order["status"] == OrderStatus.DELIVERED)
 
-    pending_orders = sum(1 for order in orders_db.values()
-                         if order["status"] == OrderStatus.PENDING)
-    completed_orders = sum(1 for order in orders_db.values()
-                           if order["status"] == OrderStatus.DELIVERED)
+# ============ SALES ANALYTICS FUNCTIONS ============
+def get_sales_analytics(
+    granularity: str,
+    start: datetime,
+    end: datetime,
+    dimension: str = "total",
+    key: Optional[int] = None,
+    statuses: Optional[List[OrderStatus]] = None
+) -> SalesAnalyticsResponse:
+    """
+    Vaqt oralig'i bo'yicha savdo (rollup'lardan, orders_db aylanmaydi)
+    statuses berilmasa bekor qilinganlardan tashqari barcha buyurtmalar
+    """
+    if statuses is None:
+        statuses = [status for status in OrderStatus if status != OrderStatus.CANCELLED]
+    buckets = sales_rollups.query(granularity, start, end, dimension=dimension, key=key, statuses=statuses)
+    return SalesAnalyticsResponse(
+        granularity=granularity,
+        dimension=dimension,
+        start=start,
+        end=end,
+        statuses=statuses,
+        buckets=[SalesBucketResponse(**bucket) for bucket in buckets]
+    )
 
-    if total_orders > 0:
-        all_order_prices = [order["total_price"] for order in orders_db.values()]
-        average_order_value = sum(all_order_prices) / total_orders
-    else:
-        average_order_value = None
 
-    return StatisticsResponse(
-        total_products=total_products,
-        total_categories=total_categories,
-        total_orders=total_orders,
-        total_revenue=total_revenue,
-        pending_orders=pending_orders,
-        completed_orders=completed_orders,
-        average_order_value=average_order_value
-    )
+def rebuild_sales_rollups() -> int:
+    """Rollup'larni mavjud buyurtmalardan qayta qurish (backfill). Natija: buyurtmalar soni"""
+    count = 0
+    with backend.transaction():  # Qayta qurish davomida boshqa worker'lar rollup'ga yozmaydi
+        sales_rollups.clear()
+        for order_data in orders_db.values():
+            sales_rollups.add_order(order_data, _product_category)
+            count += 1
+    return count
 
 
 # ============ RELATED PRODUCTS FUNCTIONS ============
@@ -746,11 +1112,17 @@ def get_related_products(product_id: int, limit: int = 4) -> List[ProductRespons
     if not product:
         return []
 
-    related = [
-        p for p in products_db.values()
-        if p.get("category_id") == product.category_id and p["id"] != product_id
-    ]
-    return [ProductResponse(**p) for p in related]
+    # category_id -> ID lar indeksidan faqat kerakli limit ta olinadi (kategoriya hajmiga bog'liq emas)
+    related_ids = [
+        pid for pid in product_sort_index.category_ids(product.category_id, limit + 1)
+        if pid != product_id
+    ][:limit]
+    related = []
+    for pid in related_ids:
+        p = products_db.get(pid)
+        if p:
+            related.append(_product_response(p))
+    return related
 
 
 def compare_products(product_ids: List[int]) -> List[ProductResponse]:
@@ -764,7 +1136,7 @@ def compare_products(product_ids: List[int]) -> List[ProductResponse]:
 
 
 # ============ PROMOTIONS & FEATURES FUNCTIONS ============
-def get_promotions_and_features() -> PromotionsFeaturesResponse:
+def get_promotions_and_features() -> "PromotionsFeaturesResponse":
     """Aktsiyalar va xususiyatlar ro'yxatini olish"""
     from models import PromotionsFeaturesResponse, PromotionResponse, FeatureResponse
     
@@ -832,11 +1204,10 @@ def get_promotions_and_features() -> PromotionsFeaturesResponse:
 # ============ VIDEO FUNCTIONS ============
 def create_video(video: VideoCreate) -> VideoResponse:
     """Yangi video yaratish (mahsulotga bog'lash mumkin)"""
-    global videos_counter
-    videos_counter += 1
+    video_id = videos_db.next_id()
 
     video_data = {
-        "id": videos_counter,
+        "id": video_id,
         "product_id": video.product_id,
         "title": video.title,
         "description": video.description,
@@ -846,7 +1217,7 @@ def create_video(video: VideoCreate) -> VideoResponse:
         "created_at": datetime.now()
     }
 
-    videos_db[videos_counter] = video_data
+    videos_db[video_id] = video_data
     return VideoResponse(**video_data)
 
 
@@ -860,7 +1231,7 @@ def get_video(video_id: int) -> Optional[VideoResponse]:
 
 def get_videos_by_product(product_id: int) -> List[VideoResponse]:
     """Berilgan mahsulotga tegishli videolarni olish"""
-    vids = [VideoResponse(**v) for v in videos_db.values() if v.get("product_id") == product_id]
+    vids = [VideoResponse(**v) for v in videos_db.find("product_id", product_id)]
     return vids
 
 
@@ -877,6 +1248,9 @@ def delete_video(video_id: int) -> bool:
     return False
 
 
+LATEST_REVIEWS_COUNT = 10  # Mahsulot sahifasida ko'rsatiladigan so'nggi sharhlar
+
+
 def get_product_with_reviews(product_id: int):
     """Mahsulot + sharhlar + o'rtacha baholash"""
     from models import ProductWithReviews
@@ -885,18 +1259,10 @@ def get_product_with_reviews(product_id: int):
     if not product:
         return None
 
-    reviews = get_product_reviews(product_id)
-
-    if reviews:
-        average_rating = sum(r.rating for r in reviews) / len(reviews)
-    else:
-        average_rating = None
-
     return ProductWithReviews(
         **product.dict(),
-        reviews=reviews,
-        average_rating=average_rating,
-        total_reviews=len(reviews)
+        reviews=get_product_reviews(product_id, page_size=LATEST_REVIEWS_COUNT),
+        rating_histogram=product_review_index.histogram(product_id)
     )
 
 
@@ -905,17 +1271,25 @@ def update_product(product_id: int, product_update: dict) -> Optional[ProductRes
     if product_id not in products_db:
         return None
 
+    product_data = products_db[product_id]
     for key, value in product_update.items():
         if value is not None:
-            products_db[product_id][key] = value
+            product_data[key] = value
+    products_db[product_id] = product_data
+    _index_product(product_data)
+    response_cache.invalidate("products", f"product:{product_id}")
+    change_feed.publish("product", product_id)
 
-    return ProductResponse(**products_db[product_id])
+    return _product_response(product_data)
 
 
 def delete_product(product_id: int) -> bool:
     """Mahsulotni o'chirish"""
     if product_id in products_db:
         del products_db[product_id]
+        _unindex_product(product_id)
+        response_cache.invalidate("products", f"product:{product_id}")
+        change_feed.publish("product", product_id)
         return True
     return False
 
@@ -925,77 +1299,55 @@ def update_category(category_id: int, category_update: dict) -> Optional[Categor
     if category_id not in categories_db:
         return None
 
+    category_data = categories_db[category_id]
     for key, value in category_update.items():
         if value is not None:
-            categories_db[category_id][key] = value
+            category_data[key] = value
+    categories_db[category_id] = category_data
+    response_cache.invalidate("categories", f"category:{category_id}")
+    change_feed.publish("category", category_id)
 
-    return CategoryResponse(**categories_db[category_id])
+    return CategoryResponse(**category_data)
 
 
 def delete_category(category_id: int) -> bool:
     """Kategoriyani o'chirish"""
     if category_id in categories_db:
         del categories_db[category_id]
+        response_cache.invalidate("categories", f"category:{category_id}")
+        change_feed.publish("category", category_id)
         return True
     return False
 
 
-def get_orders_by_phone(phone: str) -> List[OrderResponse]:
-    """Telefon raqami bo'yicha buyurtmalarni olish"""
-    orders = []
-    for order_data in orders_db.values():
-        if order_data.get("customer_phone") == phone:
-            order_data["items"] = [CartItemResponse(**item) for item in order_data["items"]]
-            if "user_id" not in order_data:
-                order_data["user_id"] = None
-            if "delivery_address" not in order_data:
-                order_data["delivery_address"] = None
-            if "notes" not in order_data:
-                order_data["notes"] = None
-            orders.append(OrderResponse(**order_data))
-    return orders
-
-
-def get_orders_by_email(email: str) -> List[OrderResponse]:
-    """Email bo'yicha buyurtmalarni olish"""
-    orders = []
-    for order_data in orders_db.values():
-        if order_data.get("customer_email") == email:
-            order_data["items"] = [CartItemResponse(**item) for item in order_data["items"]]
-            if "user_id" not in order_data:
-                order_data["user_id"] = None
-            if "delivery_address" not in order_data:
-                order_data["delivery_address"] = None
-            if "notes" not in order_data:
-                order_data["notes"] = None
-            orders.append(OrderResponse(**order_data))
-    return orders
+def get_orders_by_phone(phone: str) -> List[dict]:
+    """Telefon raqami bo'yicha buyurtmalarni olish (JSON ko'rinishlari)"""
+    return get_orders(phone=phone)[0]
 
 
-# ============ USER FUNCTIONS ============
-def hash_password(password: str) -> str:
-    """Parolni hash qilish"""
-    return hashlib.sha256(password.encode()).hexdigest()
+def get_orders_by_email(email: str) -> List[dict]:
+    """Email bo'yicha buyurtmalarni olish (JSON ko'rinishlari)"""
+    return get_orders(email=email)[0]
 
 
-def verify_password(password: str, hashed: str) -> bool:
-    """Parolni tekshirish"""
-    return hash_password(password) == hashed
+# ============ USER FUNCTIONS ============
+def _save_user(user_data: dict) -> None:
+    """Mavjud foydalanuvchini yozish (rol, parol, tasdiqlanish) - token keshidagi snapshot'lari o'chadi"""
+    users_db[user_data["id"]] = user_data
+    token_cache.invalidate_user(user_data["id"])
+    change_feed.publish("user", user_data["id"])
 
 
 def create_user(user: UserCreate, role: UserRole = UserRole.USER) -> UserResponse:
     """Yangi foydalanuvchi yaratish"""
-    global users_counter
-    users_counter += 1
-
-    for existing_user in users_db.values():
-        if existing_user["email"] == user.email:
-            raise ValueError("Bu email allaqachon ro'yxatdan o'tgan")
-        if existing_user["username"] == user.username:
-            raise ValueError("Bu username allaqachon band")
+    if users_db.find_one("email", user.email):
+        raise ValueError("Bu email allaqachon ro'yxatdan o'tgan")
+    if users_db.find_one("username", user.username):
+        raise ValueError("Bu username allaqachon band")
 
+    user_id = users_db.next_id()
     user_data = {
-        "id": users_counter,
+        "id": user_id,
         "username": user.username,
         "email": user.email,
         "phone": user.phone,
@@ -1006,23 +1358,23 @@ def create_user(user: UserCreate, role: UserRole = UserRole.USER) -> UserRespons
         "created_at": datetime.now()
     }
 
-    users_db[users_counter] = user_data
+    users_db[user_id] = user_data
     return UserResponse(**user_data)
 
 
 def get_user_by_email(email: str) -> Optional[UserResponse]:
     """Email bo'yicha foydalanuvchini olish"""
-    for user_data in users_db.values():
-        if user_data["email"] == email:
-            return UserResponse(**user_data)
+    user_data = users_db.find_one("email", email)
+    if user_data:
+        return UserResponse(**user_data)
     return None
 
 
 def get_user_by_username(username: str) -> Optional[UserResponse]:
     """Username bo'yicha foydalanuvchini olish"""
-    for user_data in users_db.values():
-        if user_data["username"] == username:
-            return UserResponse(**user_data)
+    user_data = users_db.find_one("username", username)
+    if user_data:
+        return UserResponse(**user_data)
     return None
 
 
@@ -1036,48 +1388,43 @@ def get_user_by_id(user_id: int) -> Optional[UserResponse]:
 
 def get_user_by_phone(phone: str) -> Optional[UserResponse]:
     """Telefon raqami bo'yicha foydalanuvchini olish"""
-    for user_data in users_db.values():
-        if user_data["phone"] == phone:
-            return UserResponse(**user_data)
+    user_data = users_db.find_one("phone", phone)
+    if user_data:
+        return UserResponse(**user_data)
     return None
 
 
 def authenticate_user(username_or_email: str, password: str) -> Optional[UserResponse]:
     """Foydalanuvchini autentifikatsiya qilish"""
-    user_data = None
-    for u in users_db.values():
-        if u["email"] == username_or_email or u["username"] == username_or_email:
-            user_data = u
-            break
+    user_data = (users_db.find_one("email", username_or_email)
+                 or users_db.find_one("username", username_or_email))
 
     if not user_data:
         return None
 
-    if verify_password(password, user_data["password_hash"]):
-        return UserResponse(**user_data)
-    return None
-
-
-def verify_user_phone(phone: str, code: str) -> Optional[UserResponse]:
-    """Telefon raqamini tasdiqlash"""
-    if phone not in verification_codes_db:
+    if not verify_password(password, user_data["password_hash"]):
         return None
 
-    verification_data = verification_codes_db[phone]
+    if needs_rehash(user_data["password_hash"]):
+        # Eski SHA-256 (yoki boshqa narxdagi) hash: parol ma'lum bo'lgan shu paytda yangilanadi
+        user_data["password_hash"] = hash_password(password)
+        _save_user(user_data)
+    return UserResponse(**user_data)
 
-    if verification_data["code"] != code:
-        return None
 
-    expires_at = verification_data["expires_at"]
-    if datetime.now() > expires_at:
-        del verification_codes_db[phone]
+def verify_user_phone(phone: str, code: str) -> Optional[UserResponse]:
+    """Telefon raqamini tasdiqlash"""
+    verification_data = verification_codes.get(phone)  # Muddati o'tgan bo'lsa None
+    if verification_data is None or verification_data["code"] != code:
         return None
 
     user_id = verification_data["user_id"]
-    if user_id in users_db:
-        users_db[user_id]["is_verified"] = True
-        del verification_codes_db[phone]
-        return UserResponse(**users_db[user_id])
+    user_data = users_db.get(user_id)
+    if user_data:
+        user_data["is_verified"] = True
+        _save_user(user_data)
+        verification_codes.pop(phone)
+        return UserResponse(**user_data)
 
     return None
 
@@ -1090,15 +1437,7 @@ def generate_verification_code() -> str:
 def send_verification_code(phone: str, user_id: int) -> str:
     """Tasdiqlovchi kod yuborish (simulyatsiya)"""
     code = generate_verification_code()
-    expires_at = datetime.now().replace(second=0, microsecond=0)
-    expires_at = expires_at.replace(minute=expires_at.minute + 10)
-
-    verification_codes_db[phone] = {
-        "code": code,
-        "expires_at": expires_at,
-        "user_id": user_id,
-        "created_at": datetime.now()
-    }
+    verification_codes.put(phone, {"code": code, "user_id": user_id})
 
     print(f"📱 SMS yuborildi {phone} ga: Tasdiqlovchi kod: {code}")
 
@@ -1107,11 +1446,7 @@ def send_verification_code(phone: str, user_id: int) -> str:
 
 def resend_verification_code(phone: str) -> Optional[str]:
     """Kodni qayta yuborish"""
-    user = None
-    for user_data in users_db.values():
-        if user_data["phone"] == phone:
-            user = user_data
-            break
+    user = users_db.find_one("phone", phone)
 
     if not user:
         return None
@@ -1121,31 +1456,17 @@ def resend_verification_code(phone: str) -> Optional[str]:
 
 # ============ CONTACT FORM EMAIL ============
 def send_contact_form_email(name: str, email_address: str, message: str) -> bool:
-    """Submit form xabarini email orqali yuborish"""
-    msg = MIMEMultipart()
-    msg["From"] = SMTP_USER
-    msg["To"] = SMTP_TO_EMAIL
-    msg["Subject"] = "Yangi submit form xabari"
-
+    """Submit form xabarini email navbatiga qo'yish (fon worker'i yuboradi)"""
     body = f"""Yangi forma xabari:
 
 Name: {name}
 Email: {email_address}
 Message: {message}
 """
-    msg.attach(MIMEText(body, "plain", "utf-8"))
-
-    try:
-        with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-            server.ehlo()
-            server.starttls()
-            server.ehlo()
-            server.login(SMTP_USER, SMTP_PASSWORD)
-            server.sendmail(SMTP_USER, SMTP_TO_EMAIL, msg.as_string())
-        return True
-    except Exception as e:
-        print(f"❌ Submit email yuborishda xatolik: {e}")
+    if email_outbox.enqueue(SMTP_TO_EMAIL, "Yangi submit form xabari", body) is None:
+        print("❌ Submit email navbatga qo'yilmadi: navbat to'la")
         return False
+    return True
 
 
 # ============ PASSWORD RESET FUNCTIONS ============
@@ -1158,22 +1479,10 @@ def generate_password_reset_token() -> str:
 def send_password_reset_email(email: str, user_id: int) -> str:
     """Parolni tiklash email yuborish"""
     reset_token = generate_password_reset_token()
-    expires_at = datetime.now() + timedelta(hours=1)
-
-    password_reset_tokens_db[email] = {
-        "token": reset_token,
-        "expires_at": expires_at,
-        "user_id": user_id,
-        "created_at": datetime.now()
-    }
+    expires_at = password_reset_tokens.put(email, {"token": reset_token, "user_id": user_id})["expires_at"]
 
     reset_link = f"https://phone-shop-frontend.vercel.app/reset-password?token={reset_token}"
 
-    msg = MIMEMultipart()
-    msg['From'] = SMTP_USER
-    msg['To'] = email
-    msg['Subject'] = "Parolni tiklash - Phone Shop"
-
     body = f"""Assalomu alaykum!
 
 Parolni tiklash so'rovi qabul qilindi.
@@ -1188,36 +1497,21 @@ Agar siz parolni tiklashni so'ramagan bo'lsangiz, ushbu xabarni e'tiborsiz qoldi
 Hurmat bilan,
 Phone Shop jamoasi"""
 
-    msg.attach(MIMEText(body, 'plain', 'utf-8'))
-
-    try:
-        with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-            server.ehlo()
-            server.starttls()
-            server.ehlo()
-            server.login(SMTP_USER, SMTP_PASSWORD)
-            server.sendmail(SMTP_USER, email, msg.as_string())
-
-        print(f"📧 EMAIL YUBORILDI: {email}")
+    if email_outbox.enqueue(email, "Parolni tiklash - Phone Shop", body) is None:
+        print(f"❌ Email navbatga qo'yilmadi (navbat to'la): {email}")
+    else:
+        print(f"📧 EMAIL NAVBATGA QO'YILDI: {email}")
         print(f"🔑 TOKEN: {reset_token}")
         print(f"🔗 RESET LINK: {reset_link}")
         print(f"⏰ EXPIRES: {expires_at}")
 
-    except Exception as e:
-        print(f"❌ Email yuborishda xatolik: {e}")
-
     return reset_token
 
 
 def verify_password_reset_token(token: str) -> Optional[dict]:
-    """Parolni tiklash tokenini tekshirish"""
-    for email, token_data in password_reset_tokens_db.items():
-        if token_data["token"] == token:
-            if datetime.now() > token_data["expires_at"]:
-                del password_reset_tokens_db[email]
-                return None
-            return token_data
-    return None
+    """Parolni tiklash tokenini tekshirish (token indeksi orqali, muddati o'tgan bo'lsa None)"""
+    row = password_reset_tokens.find_one("token", token)
+    return row[1] if row else None
 
 
 def reset_user_password(user_id: int, new_password: str) -> bool:
@@ -1225,15 +1519,12 @@ def reset_user_password(user_id: int, new_password: str) -> bool:
     if user_id not in users_db:
         return False
 
-    users_db[user_id]["password_hash"] = hash_password(new_password)
-
-    tokens_to_remove = []
-    for email, token_data in password_reset_tokens_db.items():
-        if token_data["user_id"] == user_id:
-            tokens_to_remove.append(email)
+    user_data = users_db[user_id]
+    user_data["password_hash"] = hash_password(new_password)
+    _save_user(user_data)
 
-    for email in tokens_to_remove:
-        del password_reset_tokens_db[email]
+    for email, _ in password_reset_tokens.find("user_id", user_id):
+        password_reset_tokens.pop(email)
 
     return True
 
@@ -1256,16 +1547,15 @@ def forgot_password(email: str = None, phone: str = None) -> Optional[str]:
 # ============ DELIVERY ADDRESS FUNCTIONS ============
 def create_delivery_address(user_id: int, address: DeliveryAddressCreate) -> DeliveryAddressResponse:
     """Yetkazib berish manzili yaratish"""
-    global delivery_addresses_counter
-    delivery_addresses_counter += 1
-
     if address.is_default:
-        for addr_id, addr_data in delivery_addresses_db.items():
-            if addr_data["user_id"] == user_id:
+        for addr_data in delivery_addresses_db.find("user_id", user_id):
+            if addr_data.get("is_default"):
                 addr_data["is_default"] = False
+                delivery_addresses_db[addr_data["id"]] = addr_data
 
+    address_id = delivery_addresses_db.next_id()
     address_data = {
-        "id": delivery_addresses_counter,
+        "id": address_id,
         "user_id": user_id,
         "address": address.address,
         "city": address.city,
@@ -1274,22 +1564,19 @@ def create_delivery_address(user_id: int, address: DeliveryAddressCreate) -> Del
         "created_at": datetime.now()
     }
 
-    delivery_addresses_db[delivery_addresses_counter] = address_data
+    delivery_addresses_db[address_id] = address_data
     return DeliveryAddressResponse(**address_data)
 
 
 def get_user_delivery_addresses(user_id: int) -> List[DeliveryAddressResponse]:
     """Foydalanuvchining manzillarini olish"""
-    addresses = [
-        addr for addr in delivery_addresses_db.values()
-        if addr["user_id"] == user_id
-    ]
+    addresses = delivery_addresses_db.find("user_id", user_id)
     return [DeliveryAddressResponse(**addr) for addr in addresses]
 
 
 def get_default_delivery_address(user_id: int) -> Optional[DeliveryAddressResponse]:
     """Foydalanuvchining asosiy manzilini olish"""
-    for addr_data in delivery_addresses_db.values():
-        if addr_data["user_id"] == user_id and addr_data.get("is_default", False):
+    for addr_data in delivery_addresses_db.find("user_id", user_id):
+        if addr_data.get("is_default", False):
             return DeliveryAddressResponse(**addr_data)
     return None
\ No newline at end of file
@@ -0,0 +1,329 @@
+"""
+Email navbati (outbox) va SMTP ulanishlar puli
+So'rov ichida SMTP ga ulanilmaydi: xabar outbox jadvaliga yoziladi va darhol
+qaytiladi. Fon worker'lari (EMAIL_WORKERS ta, har biri o'z doimiy SMTP
+ulanishi bilan) xabarlarni partiyalab yuboradi:
+- ulanish xabarlar orasida yopilmaydi (STARTTLS va login bir marta);
+  uzoq turib qolgan ulanish NOOP bilan tekshiriladi, uzilgan bo'lsa qayta ulanadi;
+- vaqtinchalik xatoda xabar eksponensial kechikish (backoff) bilan qayta
+  yuboriladi, EMAIL_MAX_ATTEMPTS dan keyin "failed" holatida qoladi;
+- yuborilmagan xabarlar jadvalda saqlanadi va ishga tushganda (load) qayta navbatga qo'yiladi.
+  Har bir xabarning egasi (owner - navbatga qo'ygan jarayon pid) bor: bir nechta
+  worker bo'lsa ham xabarni faqat egasi yuboradi. Qayta ishga tushganda
+  release() eski egalarni tozalaydi, load() esa egasiz xabarlarni o'ziga oladi.
+
+Mahalliy sinov (aiosmtpd):
+    python -m aiosmtpd -n -l localhost:8025
+    SMTP_HOST=localhost SMTP_PORT=8025 SMTP_STARTTLS=0 python main.py
+"""
+from datetime import datetime
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Callable, List, Optional
+import heapq
+import itertools
+import os
+import smtplib
+import threading
+import time
+
+from storage import Table
+
+SMTP_HOST = "smtp.gmail.com"
+SMTP_PORT = 587
+SMTP_USER = "sizning_emailingiz@gmail.com"       # ← haqiqiy email
+SMTP_PASSWORD = "xxxx xxxx xxxx xxxx"            # ← Gmail App Password (16 belgi)
+
+# Environment orqali override (production uchun tavsiya)
+SMTP_HOST = os.getenv("SMTP_HOST", SMTP_HOST)
+SMTP_PORT = int(os.getenv("SMTP_PORT", str(SMTP_PORT)))
+SMTP_USER = os.getenv("SMTP_USER", SMTP_USER)
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", SMTP_PASSWORD)
+SMTP_TO_EMAIL = os.getenv("SMTP_TO_EMAIL", SMTP_USER)
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") == "1"            # aiosmtpd uchun 0
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "10"))              # soniya
+SMTP_IDLE_SECONDS = float(os.getenv("SMTP_IDLE_SECONDS", "60"))    # bo'sh ulanish shundan keyin yopiladi
+SMTP_NOOP_AFTER_SECONDS = 15.0                                     # shundan uzoq turgan ulanish NOOP bilan tekshiriladi
+
+EMAIL_WORKERS = int(os.getenv("EMAIL_WORKERS", "1"))               # pul hajmi (SMTP ulanishlar soni)
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "20"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "5"))
+EMAIL_RETRY_BASE_SECONDS = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", "2"))
+EMAIL_RETRY_MAX_SECONDS = float(os.getenv("EMAIL_RETRY_MAX_SECONDS", "300"))
+EMAIL_OUTBOX_SIZE = int(os.getenv("EMAIL_OUTBOX_SIZE", "10000"))   # navbatdagi xabarlar chegarasi
+
+
+def build_message(message: dict) -> str:
+    """Outbox yozuvidan MIME xabar matni"""
+    msg = MIMEMultipart()
+    msg["From"] = message["from"]
+    msg["To"] = message["to"]
+    msg["Subject"] = message["subject"]
+    msg.attach(MIMEText(message["body"], "plain", "utf-8"))
+    return msg.as_string()
+
+
+def _permanent(error: Exception) -> bool:
+    """Qayta urinish foyda bermaydigan xato (masalan 550 - qabul qiluvchi yo'q)"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    return (
+        isinstance(error, smtplib.SMTPResponseException)
+        and not isinstance(error, smtplib.SMTPAuthenticationError)
+        and 500 <= error.smtp_code < 600
+    )
+
+
+class SMTPConnection:
+    """Bitta doimiy SMTP ulanish (xabarlar orasida yopilmaydi)"""
+
+    def __init__(
+        self,
+        host: str = SMTP_HOST,
+        port: int = SMTP_PORT,
+        user: Optional[str] = SMTP_USER,
+        password: Optional[str] = SMTP_PASSWORD,
+        starttls: bool = SMTP_STARTTLS,
+        timeout: float = SMTP_TIMEOUT
+    ):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self._server: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+
+    @property
+    def idle_seconds(self) -> float:
+        return time.monotonic() - self._last_used
+
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            server.ehlo()
+            if self.starttls:
+                server.starttls()
+                server.ehlo()
+            if self.user and self.password and server.has_extn("auth"):
+                server.login(self.user, self.password)
+        except Exception:
+            server.close()
+            raise
+        return server
+
+    def _ensure(self) -> smtplib.SMTP:
+        if self._server is not None and self.idle_seconds > SMTP_NOOP_AFTER_SECONDS:
+            try:
+                if self._server.noop()[0] != 250:
+                    self.close()
+            except (smtplib.SMTPException, OSError):
+                self.close()
+        if self._server is None:
+            self._server = self._connect()
+        return self._server
+
+    def send(self, from_addr: str, to_addr: str, data: str) -> None:
+        """Xabarni yuborish; qayta ishlatilgan ulanish uzilgan bo'lsa bir marta qayta ulanadi"""
+        reused = self._server is not None
+        try:
+            self._ensure().sendmail(from_addr, [to_addr], data)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            self.close()
+            if not reused:
+                raise
+            self._ensure().sendmail(from_addr, [to_addr], data)
+        self._last_used = time.monotonic()
+
+    def close(self) -> None:
+        server, self._server = self._server, None
+        if server is None:
+            return
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+
+class EmailOutbox:
+    """
+    Jadvalga yoziladigan email navbati va uni yuboruvchi fon worker'lari.
+    Xabar holati: pending -> (yuborilgach jadvaldan o'chiriladi) yoki failed.
+    """
+
+    def __init__(
+        self,
+        table: Table,
+        connection_factory: Callable[[], SMTPConnection] = SMTPConnection,
+        workers: int = EMAIL_WORKERS,
+        batch_size: int = EMAIL_BATCH_SIZE,
+        max_attempts: int = EMAIL_MAX_ATTEMPTS,
+        max_pending: int = EMAIL_OUTBOX_SIZE
+    ):
+        self.table = table
+        self.connection_factory = connection_factory
+        self.workers = max(workers, 1)
+        self.batch_size = max(batch_size, 1)
+        self.max_attempts = max(max_attempts, 1)
+        self.max_pending = max_pending
+        self._heap: List[tuple] = []  # (yuborish vaqti, tartib, message_id)
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._threads: List[threading.Thread] = []
+        self._stopping = False
+        self._cond = threading.Condition()
+
+    def __len__(self) -> int:
+        """Navbatdagi (hali yuborilmagan) xabarlar soni"""
+        with self._cond:
+            return len(self._heap) + self._in_flight
+
+    # ---------- navbatga qo'yish ----------
+    def enqueue(self, to_addr: str, subject: str, body: str, from_addr: str = SMTP_USER) -> Optional[int]:
+        """Xabarni navbatga qo'yish (SMTP ga ulanmaydi). Navbat to'lgan bo'lsa None."""
+        with self._cond:
+            if len(self._heap) + self._in_flight >= self.max_pending:
+                return None
+            message_id = self.table.next_id()
+            self.table[message_id] = {
+                "id": message_id,
+                "from": from_addr,
+                "to": to_addr,
+                "subject": subject,
+                "body": body,
+                "status": "pending",
+                "owner": os.getpid(),
+                "attempts": 0,
+                "last_error": None,
+                "created_at": datetime.now(),
+            }
+            self._push(message_id, time.monotonic())
+        return message_id
+
+    def _push(self, message_id: int, due: float) -> None:
+        heapq.heappush(self._heap, (due, next(self._seq), message_id))
+        self._cond.notify()
+
+    def release(self) -> None:
+        """Yuborilmagan xabarlarni egasiz qilish (bir martalik, worker'lar ishga tushishidan oldin)"""
+        for message in self.table.find("status", "pending"):
+            if message.get("owner") is not None:
+                message["owner"] = None
+                self.table[message["id"]] = message
+
+    def load(self) -> int:
+        """Egasiz yuborilmagan xabarlarni o'ziga olib navbatga qo'yish (ishga tushganda)"""
+        pid = os.getpid()
+        with self._cond:
+            queued = {entry[2] for entry in self._heap}
+            now = time.monotonic()
+            count = 0
+            for message in self.table.find("status", "pending"):
+                if message.get("owner") not in (None, pid) or message["id"] in queued:
+                    continue
+                message["owner"] = pid
+                self.table[message["id"]] = message
+                self._push(message["id"], now)
+                count += 1
+            return count
+
+    # ---------- worker'lar ----------
+    def start(self) -> None:
+        with self._cond:
+            if self._threads:
+                return
+            self._stopping = False
+            self._threads = [
+                threading.Thread(target=self._run, name=f"email-outbox-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Tayyor xabarlarni yuborib worker'larni to'xtatish (kechiktirilganlari jadvalda qoladi)"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            threads, self._threads = self._threads, []
+        deadline = time.monotonic() + timeout
+        for thread in threads:
+            thread.join(max(deadline - time.monotonic(), 0))
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Navbat bo'shaguncha kutish (sinov va skriptlar uchun). Ulgurdimi?"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._heap or self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _next_batch(self) -> Optional[List[int]]:
+        """
+        Yuborish vaqti kelgan xabarlar partiyasi. Bo'sh ro'yxat - kutish vaqti
+        tugadi (worker bo'sh ulanishni yopishi mumkin), None - to'xtash kerak.
+        """
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if self._heap and self._heap[0][0] <= now:
+                    batch = []
+                    while self._heap and self._heap[0][0] <= now and len(batch) < self.batch_size:
+                        batch.append(heapq.heappop(self._heap)[2])
+                    self._in_flight += len(batch)
+                    return batch
+                if self._stopping:
+                    return None
+                wait = SMTP_IDLE_SECONDS if not self._heap else min(self._heap[0][0] - now, SMTP_IDLE_SECONDS)
+                if not self._cond.wait(wait) and not self._heap:
+                    return []
+
+    def _run(self) -> None:
+        connection = self.connection_factory()
+        try:
+            while True:
+                batch = self._next_batch()
+                if batch is None:
+                    return
+                if not batch:
+                    if connection.idle_seconds >= SMTP_IDLE_SECONDS:
+                        connection.close()
+                    continue
+                try:
+                    self._send_batch(connection, batch)
+                finally:
+                    with self._cond:
+                        self._in_flight -= len(batch)
+                        self._cond.notify_all()
+        finally:
+            connection.close()
+
+    def _send_batch(self, connection: SMTPConnection, batch: List[int]) -> None:
+        for message_id in batch:
+            message = self.table.get(message_id)
+            if message is None or message["status"] != "pending":
+                continue
+            try:
+                connection.send(message["from"], message["to"], build_message(message))
+            except Exception as e:
+                connection.close()  # Ulanish holati noma'lum - keyingi xabar yangisini ochadi
+                self._failed(message, e)
+            else:
+                self.table.pop(message_id, None)
+
+    def _failed(self, message: dict, error: Exception) -> None:
+        message["attempts"] += 1
+        message["last_error"] = f"{type(error).__name__}: {error}"
+        if _permanent(error) or message["attempts"] >= self.max_attempts:
+            message["status"] = "failed"
+            self.table[message["id"]] = message
+            print(f"❌ Email yuborilmadi ({message['to']}): {message['last_error']}")
+            return
+        self.table[message["id"]] = message
+        delay = min(EMAIL_RETRY_BASE_SECONDS * 2 ** (message["attempts"] - 1), EMAIL_RETRY_MAX_SECONDS)
+        with self._cond:
+            self._push(message["id"], time.monotonic() + delay)
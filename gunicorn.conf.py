@@ -0,0 +1,39 @@
+"""
+gunicorn sozlamalari (bir nechta worker rejimi)
+Ishga tushirish: gunicorn -c gunicorn.conf.py main:app
+
+- Har bir worker - alohida uvicorn jarayoni (WEB_CONCURRENCY ta, default CPU soni).
+- Ma'lumotlar umumiy SQLite faylida (STORAGE_BACKEND=sqlite): har bir worker
+  o'z indekslarini shundan quradi va boshqalarning o'zgarishlarini
+  change_feed.py orqali oladi. memory backend bilan faqat bitta worker mumkin.
+- Bir martalik ishlar (namuna ma'lumotlar, eski buyurtmalarni normallashtirish)
+  master jarayonda fork dan oldin bir marta bajariladi (on_starting).
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = 60
+graceful_timeout = 30
+accesslog = "-"
+
+
+def on_starting(server):
+    """Master jarayonda, worker'lar fork qilinishidan oldin bir marta"""
+    storage_backend = os.getenv("STORAGE_BACKEND", "memory").lower()
+    if server.cfg.workers > 1 and storage_backend != "sqlite":
+        raise RuntimeError(
+            "Bir nechta worker uchun STORAGE_BACKEND=sqlite kerak "
+            "(memory va wal backend da har bir worker o'z ma'lumotlariga ega bo'lib qoladi)"
+        )
+
+    if storage_backend != "sqlite":
+        # Yagona worker hammasini o'zi qiladi (qayta ishga tushgan worker ham
+        # ma'lumotlarni master xotirasidan emas, o'zi yuklaydi)
+        return
+
+    os.environ["PHONE_SHOP_PREPARED"] = "1"  # Worker'lar startup da qayta bajarmaydi
+    from database import prepare_shared_state
+    prepare_shared_state()
@@ -0,0 +1,167 @@
+"""
+Oddiy yuklama testi (faqat standart kutubxona)
+Bir nechta klient jarayoni (har birida bir nechta thread, keep-alive ulanish)
+berilgan endpoint'larga so'rov yuboradi va so'rov/soniya hamda kechikishlarni chiqaradi.
+
+Ishlayotgan serverga:
+    python loadtest.py run --url http://127.0.0.1:8000 --duration 10
+
+Worker soni bo'yicha masshtablanish (har bir qiymat uchun gunicorn ni o'zi
+ishga tushiradi, vaqtinchalik SQLite fayl bilan):
+    python loadtest.py sweep --workers 1 2 4 8 --duration 10
+
+Eslatma: klientlar ham CPU ishlatadi - aniq natija uchun ularni alohida
+mashinada yoki --clients ni worker'lardan kam bo'lmagan holda ishga tushiring.
+"""
+from multiprocessing import Pool
+from typing import List, Tuple
+from urllib.parse import urlsplit
+import argparse
+import http.client
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+DEFAULT_PATHS = [
+    "/products",
+    "/products/1",
+    "/categories",
+    "/products-paginated?page=1&page_size=20&sort_by=price_asc",
+    "/search?q=iphone",
+]
+
+
+def _client(args: Tuple[str, List[str], int, float]) -> Tuple[int, int, List[float]]:
+    """Bitta klient jarayoni: (muvaffaqiyatli, xato, kechikishlar ms)"""
+    url, paths, threads, duration = args
+    parts = urlsplit(url)
+    deadline = time.perf_counter() + duration
+    lock = threading.Lock()
+    totals = {"ok": 0, "errors": 0}
+    latencies: List[float] = []
+
+    def worker(offset: int) -> None:
+        conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=10)
+        ok = errors = 0
+        local: List[float] = []
+        i = offset
+        while time.perf_counter() < deadline:
+            path = paths[i % len(paths)]
+            i += 1
+            started = time.perf_counter()
+            try:
+                conn.request("GET", path)
+                response = conn.getresponse()
+                response.read()
+                if response.status < 500:
+                    ok += 1
+                else:
+                    errors += 1
+            except (OSError, http.client.HTTPException):
+                errors += 1
+                conn.close()
+                conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=10)
+            local.append((time.perf_counter() - started) * 1000)
+        conn.close()
+        with lock:
+            totals["ok"] += ok
+            totals["errors"] += errors
+            latencies.extend(local)
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return totals["ok"], totals["errors"], latencies
+
+
+def run(url: str, paths: List[str], clients: int, threads: int, duration: float) -> float:
+    """Yuklama berish va natijani chiqarish; so'rov/soniya qaytaradi"""
+    with Pool(clients) as pool:
+        results = pool.map(_client, [(url, paths, threads, duration)] * clients)
+    ok = sum(r[0] for r in results)
+    errors = sum(r[1] for r in results)
+    latencies = sorted(latency for r in results for latency in r[2])
+    rps = ok / duration
+    if latencies:
+        p50 = latencies[len(latencies) // 2]
+        p99 = latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)]
+    else:
+        p50 = p99 = 0.0
+    print(f"  {rps:9.1f} so'rov/s   p50 {p50:6.1f} ms   p99 {p99:6.1f} ms   xatolar {errors}")
+    return rps
+
+
+def _wait_ready(url: str, timeout: float = 60) -> None:
+    parts = urlsplit(url)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=2)
+            conn.request("GET", "/")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.3)
+    raise RuntimeError("Server ishga tushmadi")
+
+
+def sweep(workers_list: List[int], port: int, paths: List[str], clients: int, threads: int, duration: float) -> None:
+    """Har bir worker soni uchun gunicorn ni ishga tushirib o'lchash"""
+    url = f"http://127.0.0.1:{port}"
+    baseline = None
+    print(f"CPU: {os.cpu_count()}, klientlar: {clients} x {threads} thread, {duration:.0f} s")
+    for workers in workers_list:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(
+                os.environ,
+                STORAGE_BACKEND="sqlite",
+                SQLITE_PATH=os.path.join(tmp, "loadtest.db"),
+                WEB_CONCURRENCY=str(workers),
+                PORT=str(port),
+            )
+            server = subprocess.Popen(
+                [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "main:app"],
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                env=env,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            try:
+                _wait_ready(url)
+                time.sleep(1)  # Barcha worker'lar tayyor bo'lishi uchun
+                print(f"workers={workers}")
+                rps = run(url, paths, clients, threads, duration)
+                baseline = baseline or rps
+                print(f"  masshtab: x{rps / baseline:.2f} (ideal x{workers / workers_list[0]:.0f})")
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Phone Shop API yuklama testi")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="ishlayotgan serverga yuklama")
+    run_parser.add_argument("--url", default="http://127.0.0.1:8000")
+
+    sweep_parser = sub.add_parser("sweep", help="worker soni bo'yicha masshtablanish")
+    sweep_parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    sweep_parser.add_argument("--port", type=int, default=8765)
+
+    for p in (run_parser, sweep_parser):
+        p.add_argument("--paths", nargs="+", default=DEFAULT_PATHS)
+        p.add_argument("--clients", type=int, default=os.cpu_count() or 1, help="klient jarayonlari")
+        p.add_argument("--threads", type=int, default=8, help="har bir klientdagi thread'lar")
+        p.add_argument("--duration", type=float, default=10.0, help="soniya")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args.url, args.paths, args.clients, args.threads, args.duration)
+    else:
+        sweep(args.workers, args.port, args.paths, args.clients, args.threads, args.duration)
@@ -5,9 +5,14 @@ Bu yerda FastAPI ilovasi yaratiladi va barcha route'lar ulashadi
 from fastapi import FastAPI, Request, status
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from routes import router
 from auth_routes import router as auth_router
-from database import initialize_sample_data
+from database import prepare_shared_state, rebuild_indexes, sync_from_peers, email_outbox, change_feed
+from change_feed import CHANGE_FEED_POLL_MS
+from storage import backend
+import os
+import time
 import uvicorn
 
 # FastAPI ilovasini yaratish
@@ -27,8 +32,28 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Barcha HTTP metodlar (GET, POST, PUT, DELETE)
     allow_headers=["*"],  # Barcha header'lar
+    expose_headers=["X-Cart-Session", "X-Total-Count"],  # Frontend o'qiy olishi uchun (mehmon savatchasi, jami soni)
 )
 
+# Boshqa worker'lar yozgan o'zgarishlarni so'rovdan oldin indekslarga qo'llash
+# (faqat SQLite backend da). SQLite so'rovi event loop ni to'xtatmasligi uchun
+# threadpool da, ko'pi bilan CHANGE_FEED_POLL_MS da bir marta va bir vaqtda bittasi
+if change_feed.enabled:
+    _sync_state = {"next": 0.0, "running": False}
+
+    @app.middleware("http")
+    async def sync_peers_middleware(request: Request, call_next):
+        now = time.monotonic()
+        if now >= _sync_state["next"] and not _sync_state["running"]:
+            _sync_state["running"] = True
+            _sync_state["next"] = now + CHANGE_FEED_POLL_MS / 1000
+            try:
+                await run_in_threadpool(sync_from_peers)
+            finally:
+                _sync_state["running"] = False
+        return await call_next(request)
+
+
 # Barcha route'larni asosiy ilovaga ulash
 app.include_router(router)
 app.include_router(auth_router)  # Authentication route'lar
@@ -86,7 +111,13 @@ async def startup_event():
     Namuna ma'lumotlar bilan to'ldirish
     """
     print("🚀 Phone Shop API ishga tushmoqda...")
-    initialize_sample_data()
+    if not os.getenv("PHONE_SHOP_PREPARED"):
+        # gunicorn (gunicorn.conf.py) bu ishni master jarayonda bir marta qiladi
+        prepare_shared_state()
+    rebuild_indexes()
+    with backend.transaction():
+        email_outbox.load()  # Oldingi ishga tushirishda yuborilmay qolgan xabarlar
+    email_outbox.start()
     print("✅ Namuna ma'lumotlar yuklandi")
     print("📚 API dokumentatsiya: http://127.0.0.1:8000/docs")
 
@@ -97,18 +128,21 @@ async def shutdown_event():
     """
     Ilova to'xtatilganda bajariladigan funksiya
     """
+    email_outbox.stop()  # Tayyor xabarlar yuboriladi, qolganlari jadvalda saqlanadi
+    backend.close()  # wal backend: log yoziladi va snapshot olinadi
     print("👋 Phone Shop API to'xtatildi")
 
 
 # ============ SERVERNI ISHGA TUSHIRISH ============
 if __name__ == "__main__":
     """
-    Bu kodni to'g'ridan-to'g'ri ishga tushirish uchun
-    Terminalda: python main.py
+    Bu kodni to'g'ridan-to'g'ri ishga tushirish uchun (bitta jarayon)
+    Terminalda: python main.py  (ishlab chiqishda: RELOAD=1 python main.py)
+    Bir nechta worker uchun: gunicorn -c gunicorn.conf.py main:app
     """
     uvicorn.run(
         "main:app",  # main.py faylidagi app obyekti
         host="0.0.0.0",  # Barcha IP manzillardan kirish mumkin
-        port=8000,  # Port raqami
-        reload=True  # Kod o'zgarganda avtomatik qayta yuklash
+        port=int(os.getenv("PORT", "8000")),  # Port raqami
+        reload=os.getenv("RELOAD") == "1"  # Kod o'zgarganda avtomatik qayta yuklash (faqat ishlab chiqishda)
     )
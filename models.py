@@ -3,7 +3,7 @@ Pydantic modellar - API request/response uchun ma'lumotlar strukturasi
 Bu modellar API ga keladigan va ketadigan ma'lumotlarni tekshiradi va validatsiya qiladi
 """
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Dict, Optional, List, Union
 from datetime import datetime
 from enum import Enum
 
@@ -29,6 +29,8 @@ class ProductResponse(ProductBase):
     """Mahsulot ma'lumotlarini qaytarish uchun model"""
     id: int
     created_at: datetime
+    average_rating: Optional[float] = None  # O'rtacha baholash (sharhlar bo'lsa)
+    total_reviews: int = 0  # Jami sharhlar soni
     
     class Config:
         from_attributes = True  # SQLAlchemy modellardan avtomatik konvertatsiya
@@ -132,6 +134,19 @@ class SearchResponse(BaseModel):
     total: int  # Jami topilgan mahsulotlar soni
 
 
+class SuggestionResponse(BaseModel):
+    """Qidiruv taklifi (search-as-you-type)"""
+    text: str  # Taklif qilinayotgan mahsulot nomi
+    product_id: int  # Shu nomdagi birinchi mahsulot ID
+    score: float  # O'xshashlik (0-1)
+
+
+class SuggestResponse(BaseModel):
+    """Qidiruv takliflari"""
+    query: str
+    suggestions: List[SuggestionResponse]
+
+
 # ============ FORM MODELS (Callback, Credit, Trade-in, va hokazo) ============
 class CallbackRequest(BaseModel):
     """Qayta qo'ng'iroq qilish so'rovi"""
@@ -197,6 +212,20 @@ class ErrorResponse(BaseModel):
 
 
 # ============ PAGINATION MODELS ============
+class FacetCount(BaseModel):
+    """Bitta facet qiymati va unga mos mahsulotlar soni"""
+    value: Union[bool, int, str, None]  # category_id, xotira hajmi, in_stock yoki narx oralig'i ("500000-1000000")
+    count: int
+
+
+class ProductFacets(BaseModel):
+    """Joriy filtr uchun facet sonlari (sidebar uchun)"""
+    category_id: List[FacetCount] = []
+    storage: List[FacetCount] = []
+    in_stock: List[FacetCount] = []
+    price: List[FacetCount] = []  # Narx oraliqlari, o'sish tartibida
+
+
 class PaginatedResponse(BaseModel):
     """Sahifalash (pagination) uchun model"""
     items: List[ProductResponse]
@@ -204,6 +233,8 @@ class PaginatedResponse(BaseModel):
     page: int  # Joriy sahifa
     page_size: int  # Sahifadagi mahsulotlar soni
     total_pages: int  # Jami sahifalar soni
+    next_cursor: Optional[str] = None  # Keyingi sahifa uchun cursor (after parametri)
+    facets: Optional[ProductFacets] = None  # facets=true bo'lsa
 
 
 # ============ REVIEW/RATING MODELS ============
@@ -229,10 +260,9 @@ class ReviewResponse(BaseModel):
 
 
 class ProductWithReviews(ProductResponse):
-    """Mahsulot + sharhlar"""
-    reviews: List[ReviewResponse] = []
-    average_rating: Optional[float] = None  # O'rtacha baholash
-    total_reviews: int = 0  # Jami sharhlar soni
+    """Mahsulot + so'nggi sharhlar"""
+    reviews: List[ReviewResponse] = []  # Eng yangi sharhlar (qolganlari /products/{id}/reviews da)
+    rating_histogram: Dict[int, int] = {}  # Baho (1-5) -> sharhlar soni
 
 
 # ============ WISHLIST MODELS ============
@@ -271,6 +301,25 @@ class StatisticsResponse(BaseModel):
     average_order_value: Optional[float]  # O'rtacha buyurtma summasi
 
 
+class SalesBucketResponse(BaseModel):
+    """Bitta vaqt bucket'i (va kategoriya/mahsulot) bo'yicha savdo"""
+    bucket: datetime  # Bucket boshlanishi (soat, kun yoki hafta dushanbasi)
+    key: Optional[int] = None  # category_id yoki product_id (dimension=total bo'lsa None)
+    orders: int  # Buyurtmalar soni
+    units: int  # Sotilgan donalar
+    revenue: float  # Daromad
+
+
+class SalesAnalyticsResponse(BaseModel):
+    """Vaqt oralig'i bo'yicha savdo analitikasi"""
+    granularity: str  # "hour", "day", "week"
+    dimension: str  # "total", "category", "product"
+    start: datetime
+    end: datetime
+    statuses: List[OrderStatus]  # Hisobga olingan buyurtma holatlari
+    buckets: List[SalesBucketResponse]
+
+
 # ============ RELATED PRODUCTS ============
 class RelatedProductsResponse(BaseModel):
     """O'xshash mahsulotlar"""
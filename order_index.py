@@ -0,0 +1,151 @@
+"""
+Buyurtmalar indeksi (telefon, email, user_id, holat va sana bo'yicha)
+Har bir egasi kaliti (barcha buyurtmalar, telefon, email, user_id) uchun ikki
+xil ro'yxat saqlanadi: holatidan qat'i nazar hamma buyurtmalar va har bir
+holat (OrderStatus) bo'yicha alohida. Ro'yxatlar (created_at, id) bo'yicha
+tartiblangan, shuning uchun sana oralig'i bisect bilan topiladi va sahifa
+(eng yangisidan boshlab) O(log N + page_size) - buyurtmalar tarixiga bog'liq emas.
+"""
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+import threading
+
+OWNER_FIELDS = {
+    "phone": "customer_phone",
+    "email": "customer_email",
+    "user_id": "user_id",
+}
+
+_Key = Tuple[str, object, Optional[str]]  # (owner maydoni, qiymati, holat yoki None)
+
+
+class OrderIndex:
+    """(egasi, holat) -> (created_at, order_id) tartiblangan ro'yxatlari"""
+
+    def __init__(self):
+        self._lists: Dict[_Key, List[Tuple[float, int]]] = {}
+        self._rows: Dict[int, Tuple[List[Tuple[str, object]], str, float]] = {}  # id -> (egalari, holat, vaqt)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add(self, order: dict) -> None:
+        """Buyurtmani indeksga qo'shish (mavjud bo'lsa yangilash)"""
+        owners = [("all", None)] + [
+            (name, order.get(field)) for name, field in OWNER_FIELDS.items() if order.get(field) is not None
+        ]
+        status = order["status"]
+        row = (owners, status, order["created_at"].timestamp())
+        with self._lock:
+            self._remove(order["id"])
+            self._rows[order["id"]] = row
+            self._insert(order["id"], row)
+
+    def status_of(self, order_id: int) -> Optional[str]:
+        """Indeksdagi holati (buyurtma indeksda bo'lmasa None)"""
+        row = self._rows.get(order_id)
+        return row[1] if row else None
+
+    def set_status(self, order_id: int, status: str) -> None:
+        """Buyurtma holati o'zgardi: faqat holat ro'yxatlari yangilanadi"""
+        with self._lock:
+            row = self._rows.get(order_id)
+            if row is None or row[1] == status:
+                return
+            owners, old_status, created = row
+            entry = (created, order_id)
+            for owner, value in owners:
+                self._discard((owner, value, old_status), entry)
+                insort(self._lists.setdefault((owner, value, status), []), entry)
+            self._rows[order_id] = (owners, status, created)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._lists.clear()
+            self._rows.clear()
+
+    def _insert(self, order_id: int, row) -> None:
+        owners, status, created = row
+        entry = (created, order_id)
+        for owner, value in owners:
+            for key in ((owner, value, None), (owner, value, status)):
+                entries = self._lists.setdefault(key, [])
+                if not entries or entries[-1] < entry:
+                    entries.append(entry)  # Odatiy holat: yangi buyurtma eng oxirida
+                else:
+                    insort(entries, entry)
+
+    def _remove(self, order_id: int) -> None:
+        row = self._rows.pop(order_id, None)
+        if row is None:
+            return
+        owners, status, created = row
+        for owner, value in owners:
+            for key in ((owner, value, None), (owner, value, status)):
+                self._discard(key, (created, order_id))
+
+    def _discard(self, key: _Key, entry: Tuple[float, int]) -> None:
+        entries = self._lists.get(key)
+        if not entries:
+            return
+        i = bisect_left(entries, entry)
+        if i < len(entries) and entries[i] == entry:
+            del entries[i]
+        if not entries:
+            del self._lists[key]
+
+    def page(
+        self,
+        owner: str = "all",
+        value: object = None,
+        status: Optional[str] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        offset: int = 0,
+        limit: Optional[int] = None
+    ) -> Tuple[List[int], int]:
+        """
+        Filtrga mos buyurtma ID lari (eng yangisidan boshlab) va jami soni.
+        owner: "all", "phone", "email" yoki "user_id"; sana oralig'i [date_from, date_to].
+        """
+        with self._lock:
+            entries = self._lists.get((owner, value, status), [])
+            lo = 0 if date_from is None else bisect_left(entries, (date_from.timestamp(), float("-inf")))
+            hi = len(entries) if date_to is None else bisect_right(entries, (date_to.timestamp(), float("inf")))
+            total = max(hi - lo, 0)
+
+            start = hi - 1 - max(offset, 0)
+            stop = lo - 1 if limit is None else max(start - limit, lo - 1)
+            return [entries[i][1] for i in range(start, stop, -1)], total
+
+    def iter_ids(
+        self,
+        owner: str = "all",
+        value: object = None,
+        status: Optional[str] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        batch_size: int = 500
+    ) -> Iterator[int]:
+        """
+        Filtrga mos buyurtma ID lari eng eskisidan boshlab (eksport uchun).
+        Lock faqat bitta partiyani olishda ushlanadi; keyingi partiya oxirgi
+        (created_at, id) dan davom etadi, shuning uchun orada qo'shilgan
+        buyurtmalar ro'yxatni siljitmaydi.
+        """
+        after = None if date_from is None else (date_from.timestamp(), float("-inf"))
+        high = None if date_to is None else (date_to.timestamp(), float("inf"))
+        while True:
+            with self._lock:
+                entries = self._lists.get((owner, value, status), [])
+                start = 0 if after is None else bisect_right(entries, after)
+                batch = entries[start:start + batch_size]
+            if high is not None:
+                batch = [entry for entry in batch if entry <= high]
+            for _, order_id in batch:
+                yield order_id
+            if len(batch) < batch_size:
+                return
+            after = batch[-1]
@@ -0,0 +1,125 @@
+"""
+Parollarni hash qilish (scrypt, tuzli va xotira talab qiladigan KDF)
+Saqlash formati: scrypt$<log2 N>$<r>$<p>$<salt base64>$<hash base64>
+Narx (cost) PASSWORD_SCRYPT_LOG_N bilan sozlanadi: har bir +1 vaqt va xotirani
+ikki barobar oshiradi (14 -> ~16 MB, bir necha o'n ms).
+
+Hisoblash cheklangan pulda (PASSWORD_HASH_WORKERS ta thread) bajariladi:
+hashlib.scrypt GIL ni qo'yib yuboradi, shuning uchun event loop va boshqa
+so'rovlar to'xtab qolmaydi; auth endpoint'lari (oddiy def, FastAPI threadpool'ida)
+faqat natijani kutadi. Bir vaqtdagi hash'lar soni (va xotira) cheklangan.
+
+Eski format (tuzsiz SHA-256 hex) hali tekshiriladi; bunday foydalanuvchi
+login qilganda paroli joriy narx bilan qayta hash qilinadi (needs_rehash).
+
+Benchmark (har bir narxda login/soniya):
+    python password_hashing.py bench --costs 12 13 14 15 --logins 100
+"""
+from concurrent.futures import ThreadPoolExecutor
+import base64
+import hashlib
+import hmac
+import os
+
+PASSWORD_SCRYPT_LOG_N = int(os.getenv("PASSWORD_SCRYPT_LOG_N", "14"))  # N = 2**14
+PASSWORD_SCRYPT_R = 8
+PASSWORD_SCRYPT_P = 1
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(os.cpu_count() or 1, 4))))
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+_pools = {}  # pid -> ThreadPoolExecutor (fork dan keyin ota jarayon thread'lari bolada yo'q)
+
+
+def _pool() -> ThreadPoolExecutor:
+    pool = _pools.get(os.getpid())
+    if pool is None:
+        pool = _pools[os.getpid()] = ThreadPoolExecutor(
+            max_workers=max(PASSWORD_HASH_WORKERS, 1), thread_name_prefix="password-hash"
+        )
+    return pool
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii").rstrip("=")
+
+
+def _unb64(data: str) -> bytes:
+    return base64.b64decode(data + "=" * (-len(data) % 4))
+
+
+def _scrypt(password: str, salt: bytes, log_n: int, r: int, p: int) -> bytes:
+    n = 1 << log_n
+    return hashlib.scrypt(
+        password.encode(), salt=salt, n=n, r=r, p=p,
+        maxmem=256 * r * n + 1024 * 1024,  # default 32 MB chegarasi katta narxlarga yetmaydi
+        dklen=KEY_BYTES
+    )
+
+
+def _hash_sync(password: str, log_n: int) -> str:
+    salt = os.urandom(SALT_BYTES)
+    key = _scrypt(password, salt, log_n, PASSWORD_SCRYPT_R, PASSWORD_SCRYPT_P)
+    return f"scrypt${log_n}${PASSWORD_SCRYPT_R}${PASSWORD_SCRYPT_P}${_b64(salt)}${_b64(key)}"
+
+
+def _verify_sync(password: str, hashed: str) -> bool:
+    if not hashed.startswith("scrypt$"):
+        # Eski format: tuzsiz SHA-256
+        legacy = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(legacy, hashed)
+    try:
+        _, log_n, r, p, salt, key = hashed.split("$")
+        expected = _unb64(key)
+        actual = _scrypt(password, _unb64(salt), int(log_n), int(r), int(p))
+    except ValueError:
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
+def needs_rehash(hashed: str, log_n: int = PASSWORD_SCRYPT_LOG_N) -> bool:
+    """Hash eski formatda yoki boshqa narx bilan qilinganmi"""
+    return not hashed.startswith(f"scrypt${log_n}${PASSWORD_SCRYPT_R}${PASSWORD_SCRYPT_P}$")
+
+
+def hash_password(password: str, log_n: int = PASSWORD_SCRYPT_LOG_N) -> str:
+    """Parolni hash qilish (pulda; chaqiruvchi thread natijani kutadi)"""
+    return _pool().submit(_hash_sync, password, log_n).result()
+
+
+def verify_password(password: str, hashed: str) -> bool:
+    """Parolni tekshirish (pulda; chaqiruvchi thread natijani kutadi)"""
+    return _pool().submit(_verify_sync, password, hashed).result()
+
+
+def _bench(costs, logins: int, concurrency: int) -> None:
+    """Har bir narxda parallel login'lar (tekshirish) tezligi"""
+    import time
+
+    print(f"pul: {PASSWORD_HASH_WORKERS} thread, parallel so'rovlar: {concurrency}, login'lar: {logins}")
+    print(f"{'log2 N':>6} {'xotira MB':>10} {'hash ms':>9} {'login/s':>9}")
+    with ThreadPoolExecutor(max_workers=concurrency) as clients:
+        for log_n in costs:
+            hashed = hash_password("Parol12345", log_n)
+            started = time.perf_counter()
+            hash_password("Parol12345", log_n)
+            single_ms = (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            results = list(clients.map(lambda _: verify_password("Parol12345", hashed), range(logins)))
+            elapsed = time.perf_counter() - started
+            assert all(results)
+            memory_mb = 128 * PASSWORD_SCRYPT_R * (1 << log_n) / (1024 * 1024)
+            print(f"{log_n:>6} {memory_mb:>10.0f} {single_ms:>9.1f} {logins / elapsed:>9.1f}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Parol hash narxi bo'yicha benchmark")
+    parser.add_argument("command", choices=["bench"])
+    parser.add_argument("--costs", type=int, nargs="+", default=[12, 13, 14, 15, 16], help="log2 N qiymatlari")
+    parser.add_argument("--logins", type=int, default=100, help="har bir narxda login'lar soni")
+    parser.add_argument("--concurrency", type=int, default=16, help="parallel so'rovlar (API threadpool'i kabi)")
+    args = parser.parse_args()
+    _bench(args.costs, args.logins, args.concurrency)
@@ -0,0 +1,235 @@
+"""
+Mahsulot qatorlari uchun ixcham saqlash (struct of arrays)
+products jadvali (memory va wal backend) har bir mahsulotni 9 kalitli dict
+sifatida emas, ustunlarda saqlaydi:
+- narx - array('d'), kategoriya - array('i'), omborda - array('b'),
+  yaratilgan vaqt - array('q') (mikrosekund), id - array('q')
+- nom, tavsif, rasm URL - oddiy ro'yxatlar (str obyektlarning o'zi)
+- xotira hajmi (storage) - intern qilingan satrlar: "128 GB" butun katalog
+  uchun bitta obyekt
+
+O'qishda (get, values) har safar yangi dict yig'iladi, shuning uchun
+Table qoidasi o'zgarmaydi: o'zgartirilgan yozuv qayta yozilishi kerak.
+Sxemaga sig'maydigan yozuvlar (qo'shimcha kalit, boshqa tur) dict holida qoladi.
+
+Xotira benchmarki (dict qatorlar bilan solishtirish):
+    python product_rows.py bench --products 200000
+"""
+from array import array
+from collections.abc import MutableMapping
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+import sys
+
+FIELDS = ("id", "name", "description", "price", "storage", "category_id", "image_url", "in_stock", "created_at")
+_FIELD_SET = frozenset(FIELDS)
+NO_CATEGORY = -1                     # category_id = None
+MAX_CATEGORY = (1 << 31) - 1         # array('i') chegarasi
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def _fits(key: Any, record: dict) -> bool:
+    """Yozuv ustunlarga aniq (qiymat turlari o'zgarmasdan) sig'adimi"""
+    if record.keys() != _FIELD_SET or record["id"] != key or type(key) is not int:
+        return False
+    if type(record["price"]) is not float or type(record["in_stock"]) is not bool:
+        return False
+    category_id = record["category_id"]
+    if category_id is not None and (type(category_id) is not int or not 0 <= category_id <= MAX_CATEGORY):
+        return False
+    created_at = record["created_at"]
+    if type(created_at) is not datetime or created_at.tzinfo is not None:
+        return False
+    return all(
+        record[field] is None or type(record[field]) is str
+        for field in ("name", "description", "storage", "image_url")
+    )
+
+
+class ProductRows(MutableMapping):
+    """product_id -> mahsulot yozuvi (dict interfeysi, ichida ustunlar)"""
+
+    def __init__(self, rows: Optional[Dict[Any, dict]] = None):
+        self._slots: Dict[Any, int] = {}    # key -> ustundagi qator (-1: yozuv _other da)
+        self._other: Dict[Any, dict] = {}   # sxemaga sig'magan yozuvlar
+        self._free: List[int] = []          # o'chirilganlardan bo'shagan qatorlar
+        self._ids = array("q")
+        self._prices = array("d")
+        self._categories = array("i")
+        self._in_stock = array("b")
+        self._created_at = array("q")
+        self._names: List[Optional[str]] = []
+        self._descriptions: List[Optional[str]] = []
+        self._storages: List[Optional[str]] = []
+        self._image_urls: List[Optional[str]] = []
+        if rows:
+            for key, record in rows.items():
+                self[key] = record
+
+    def _decode(self, slot: int) -> dict:
+        return {
+            "id": self._ids[slot],
+            "name": self._names[slot],
+            "description": self._descriptions[slot],
+            "price": self._prices[slot],
+            "storage": self._storages[slot],
+            "category_id": None if self._categories[slot] == NO_CATEGORY else self._categories[slot],
+            "image_url": self._image_urls[slot],
+            "in_stock": self._in_stock[slot] == 1,
+            "created_at": _EPOCH + timedelta(microseconds=self._created_at[slot]),
+        }
+
+    def _release(self, slot: int) -> None:
+        """Qatorni bo'shatish (satrlar darhol xotiradan chiqadi)"""
+        self._names[slot] = self._descriptions[slot] = self._storages[slot] = self._image_urls[slot] = None
+        self._free.append(slot)
+
+    def __getitem__(self, key) -> dict:
+        slot = self._slots[key]
+        if slot < 0:
+            return self._other[key]
+        return self._decode(slot)
+
+    def get(self, key, default=None):
+        slot = self._slots.get(key)
+        if slot is None:
+            return default
+        if slot < 0:
+            return self._other[key]
+        return self._decode(slot)
+
+    def field(self, key, name: str) -> Any:
+        """Bitta maydon (butun yozuv yig'ilmaydi); yozuv yo'q bo'lsa None"""
+        slot = self._slots.get(key)
+        if slot is None:
+            return None
+        if slot < 0:
+            return self._other[key].get(name)
+        if name == "price":
+            return self._prices[slot]
+        if name == "category_id":
+            return None if self._categories[slot] == NO_CATEGORY else self._categories[slot]
+        if name == "in_stock":
+            return self._in_stock[slot] == 1
+        return self._decode(slot).get(name)
+
+    def __setitem__(self, key, record: dict) -> None:
+        slot = self._slots.get(key)
+        if not _fits(key, record):
+            if slot is not None and slot >= 0:
+                self._release(slot)
+            self._slots[key] = -1
+            self._other[key] = record
+            return
+
+        storage = record["storage"]
+        category_id = record["category_id"]
+        values = (
+            key,
+            record["price"],
+            NO_CATEGORY if category_id is None else category_id,
+            1 if record["in_stock"] else 0,
+            (record["created_at"] - _EPOCH) // _MICROSECOND,
+            record["name"],
+            record["description"],
+            sys.intern(storage) if storage is not None else None,
+            record["image_url"],
+        )
+        columns = (
+            self._ids, self._prices, self._categories, self._in_stock, self._created_at,
+            self._names, self._descriptions, self._storages, self._image_urls,
+        )
+        if slot is not None and slot < 0:
+            del self._other[key]
+            slot = None
+        if slot is None and self._free:
+            slot = self._free.pop()
+        if slot is None:
+            self._slots[key] = len(self._ids)
+            for column, value in zip(columns, values):
+                column.append(value)
+        else:
+            self._slots[key] = slot
+            for column, value in zip(columns, values):
+                column[slot] = value
+
+    def __delitem__(self, key) -> None:
+        slot = self._slots.pop(key)
+        if slot < 0:
+            del self._other[key]
+        else:
+            self._release(slot)
+
+    def __contains__(self, key) -> bool:
+        return key in self._slots
+
+    def __iter__(self):
+        return iter(self._slots)
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def clear(self) -> None:
+        self.__init__()
+
+
+# ============ BENCHMARK ============
+def _sample_records(count: int, now: datetime) -> Iterable[dict]:
+    """JSON/SQLite dan o'qilgandek yozuvlar: har bir satr alohida obyekt"""
+    storages = ["64 GB", "128 GB", "256 GB", "512 GB", "1 TB"]
+    for i in range(1, count + 1):
+        yield {
+            "id": i,
+            "name": f"Phone {i}",
+            "description": f"Namuna mahsulot {i} - qisqa tavsif matni",
+            "price": 1_000_000.0 + i,
+            "storage": "".join(storages[i % len(storages)]),  # har bir yozuvda yangi satr (decode kabi)
+            "category_id": i % 20 + 1,
+            "image_url": f"https://example.com/img/{i}.webp",
+            "in_stock": i % 7 != 0,
+            "created_at": now - timedelta(minutes=i),
+        }
+
+
+def _bench(count: int) -> None:
+    """dict qatorlar va ProductRows: bayt/mahsulot va o'qish tezligi"""
+    import gc
+    import random
+    import time
+    import tracemalloc
+
+    def measure(build):
+        gc.collect()
+        tracemalloc.start()
+        store = build()
+        used = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return store, used
+
+    now = datetime.now()
+    dict_rows, dict_bytes = measure(lambda: {r["id"]: r for r in _sample_records(count, now)})
+    compact_rows, compact_bytes = measure(lambda: ProductRows({r["id"]: r for r in _sample_records(count, now)}))
+    assert compact_rows[count // 2] == dict_rows[count // 2]
+
+    print(f"{count} ta mahsulot")
+    print(f"dict qatorlar:  {dict_bytes / count:6.0f} bayt/mahsulot ({dict_bytes / 1e6:.1f} MB)")
+    print(f"ProductRows:    {compact_bytes / count:6.0f} bayt/mahsulot ({compact_bytes / 1e6:.1f} MB)")
+    print(f"tejash:         {1 - compact_bytes / dict_bytes:6.0%}")
+
+    keys = [random.randint(1, count) for _ in range(100_000)]
+    for label, rows in (("dict get", dict_rows), ("ProductRows get", compact_rows)):
+        started = time.perf_counter()
+        for key in keys:
+            rows.get(key)
+        print(f"{label + ':':16}{(time.perf_counter() - started) / len(keys) * 1e6:6.2f} µs")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ixcham mahsulot qatorlari: xotira benchmarki")
+    parser.add_argument("command", choices=["bench"])
+    parser.add_argument("--products", type=int, default=200_000)
+    args = parser.parse_args()
+    _bench(args.products)
@@ -0,0 +1,129 @@
+"""
+Katalog o'qish endpoint'lari uchun javob keshi (response cache)
+Javob tayyor JSON bayt ko'rinishida saqlanadi: keshdan olinganda Pydantic
+validatsiya va serializatsiya umuman ishlamaydi. Har bir yozuvning ETag i
+bor - If-None-Match mos kelsa 304 qaytariladi.
+
+Har bir yozuv teglar bilan belgilanadi ("products", "product:5", "categories"...).
+Katalogni o'zgartiruvchi funksiyalar (create_product, update_product, ...)
+tegishli teglarni invalidate() qiladi - faqat shu teglarga bog'liq javoblar
+o'chadi. Kesh jarayon ichida (har bir worker o'zinikini saqlaydi).
+"""
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, NamedTuple, Optional, Set, Tuple
+import hashlib
+import os
+import threading
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2048"))  # yozuvlar soni (LRU)
+
+
+class CachedResponse(NamedTuple):
+    """Keshdagi bitta javob"""
+    body: bytes
+    etag: str
+    tags: Tuple[str, ...]
+
+
+class ResponseCache:
+    """Kalit (route + query) -> tayyor JSON, teglar bo'yicha invalidatsiya bilan"""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._by_tag: Dict[str, Set[str]] = {}
+        self._generation = 0  # har bir invalidatsiyada oshadi
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, body: bytes, tags: Iterable[str], generation: int) -> CachedResponse:
+        """
+        Javobni saqlash. generation - javob qurilishidan oldingi qiymat: orada
+        invalidatsiya bo'lgan bo'lsa javob eskirgan bo'lishi mumkin, saqlanmaydi.
+        """
+        entry = CachedResponse(body, '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"', tuple(tags))
+        with self._lock:
+            if generation != self._generation:
+                return entry
+            self._drop(key)
+            self._entries[key] = entry
+            for tag in entry.tags:
+                self._by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+        return entry
+
+    def invalidate(self, *tags: str) -> None:
+        """Shu teglardan biriga ega barcha javoblarni o'chirish"""
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                for key in self._by_tag.pop(tag, ()):
+                    self._drop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._by_tag.clear()
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry.tags:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+
+response_cache = ResponseCache()
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match header ETag ga mosmi (ro'yxat, W/ va * qo'llab-quvvatlanadi)"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def cached_json_response(request: Request, tags: Tuple[str, ...], build: Callable[[], Any]) -> Response:
+    """
+    Endpoint javobini keshdan berish yoki build() bilan qurib keshlash.
+    Kalit: route yo'li + tartiblangan query parametrlar.
+    build() HTTPException ko'tarsa (masalan 404), hech narsa keshlanmaydi.
+    """
+    key = request.url.path + "?" + "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    entry = response_cache.get(key)
+    if entry is None:
+        generation = response_cache.generation
+        body = JSONResponse(jsonable_encoder(build())).body
+        entry = response_cache.put(key, body, tags, generation)
+
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
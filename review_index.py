@@ -0,0 +1,80 @@
+"""
+Mahsulot sharhlari indeksi
+Har bir mahsulot uchun sharh ID lari (o'sish tartibida) va yig'ma ko'rsatkichlar:
+soni, baholar yig'indisi va 1-5 baholar histogrammasi. create_review da
+yangilanadi, shuning uchun o'rtacha baho va sharhlar soni O(1), sahifa esa
+(eng yangisidan boshlab) O(log N + page_size).
+"""
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+import threading
+
+RATINGS = (1, 2, 3, 4, 5)
+
+
+class ReviewStats:
+    """Bitta mahsulot sharhlarining yig'ma ko'rsatkichlari"""
+
+    __slots__ = ("count", "rating_sum", "histogram")
+
+    def __init__(self):
+        self.count = 0
+        self.rating_sum = 0
+        self.histogram: Dict[int, int] = {rating: 0 for rating in RATINGS}
+
+    @property
+    def average(self) -> Optional[float]:
+        return self.rating_sum / self.count if self.count else None
+
+
+class ReviewIndex:
+    """product_id -> sharh ID lari va ReviewStats"""
+
+    def __init__(self):
+        self._ids: Dict[int, List[int]] = {}
+        self._stats: Dict[int, ReviewStats] = {}
+        self._lock = threading.Lock()
+
+    def add(self, review_id: int, product_id: int, rating: int) -> None:
+        with self._lock:
+            ids = self._ids.setdefault(product_id, [])
+            if ids and ids[-1] < review_id:
+                ids.append(review_id)  # Odatiy holat: yangi sharh eng katta ID ga ega
+            else:
+                insort(ids, review_id)
+            stats = self._stats.setdefault(product_id, ReviewStats())
+            stats.count += 1
+            stats.rating_sum += rating
+            stats.histogram[rating] = stats.histogram.get(rating, 0) + 1
+
+    def __contains__(self, key: Tuple[int, int]) -> bool:
+        """(product_id, review_id) indeksda bormi"""
+        product_id, review_id = key
+        ids = self._ids.get(product_id, [])
+        i = bisect_left(ids, review_id)
+        return i < len(ids) and ids[i] == review_id
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ids.clear()
+            self._stats.clear()
+
+    def stats(self, product_id: int) -> Tuple[Optional[float], int]:
+        """(o'rtacha baho, sharhlar soni)"""
+        stats = self._stats.get(product_id)
+        if stats is None:
+            return None, 0
+        return stats.average, stats.count
+
+    def histogram(self, product_id: int) -> Dict[int, int]:
+        stats = self._stats.get(product_id)
+        return dict(stats.histogram) if stats else {rating: 0 for rating in RATINGS}
+
+    def page(self, product_id: int, offset: int = 0, limit: Optional[int] = None) -> Tuple[List[int], int]:
+        """Eng yangisidan boshlab sharh ID lari va jami soni"""
+        with self._lock:
+            ids = self._ids.get(product_id, [])
+            total = len(ids)
+            start = total - max(offset, 0)
+            stop = 0 if limit is None else max(start - limit, 0)
+            return [ids[i] for i in range(start - 1, stop - 1, -1)], total
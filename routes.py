@@ -1,24 +1,33 @@
 
 # ============ IMPORTS ============
-from fastapi import APIRouter, Query, HTTPException, status, Depends, Form
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Query, HTTPException, status, Depends, Form, Header, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from typing import Optional, List
-from models import ProductResponse, PaginatedResponse, UserResponse, ProductCreate, ProductWithReviews, MessageResponse, CategoryResponse, CategoryCreate, SearchResponse, CartResponse, CartItemResponse, CartItemCreate, OrderResponse, OrderCreate, OneClickBuyRequest, CallbackRequest, CreditApplication, TradeInRequest, PriceMatchRequest, NewsletterSubscribe, ReviewResponse, ReviewCreate, WishlistResponse, WishlistItemResponse, OrderStatusUpdate, StatisticsResponse, RelatedProductsResponse, CompareProductsResponse, CompareProductsRequest, VideoResponse, VideoCreate, PromotionsFeaturesResponse
+from datetime import datetime
+from models import ProductResponse, PaginatedResponse, UserResponse, ProductCreate, ProductWithReviews, MessageResponse, CategoryResponse, CategoryCreate, SearchResponse, SuggestResponse, CartResponse, CartItemResponse, CartItemCreate, OrderResponse, OrderCreate, OneClickBuyRequest, CallbackRequest, CreditApplication, TradeInRequest, PriceMatchRequest, NewsletterSubscribe, ReviewResponse, ReviewCreate, WishlistResponse, WishlistItemResponse, OrderStatusUpdate, StatisticsResponse, RelatedProductsResponse, CompareProductsResponse, CompareProductsRequest, VideoResponse, VideoCreate, PromotionsFeaturesResponse, OrderStatus, SalesAnalyticsResponse
 from database import (
-    create_product, get_product, get_all_products, search_products,
+    create_product, get_product, get_all_products, search_products, suggest_products,
     create_category, get_category, get_all_categories,
-    add_to_cart, get_cart, update_cart_item, remove_from_cart, clear_cart,
-    create_order, get_order, get_all_orders, create_one_click_order,
+    add_to_cart, get_cart, update_cart_item, remove_from_cart, clear_cart, merge_carts,
+    create_order, get_order, get_orders, iter_orders, create_one_click_order,
     get_product_reviews, create_review, get_all_reviews,
     add_to_wishlist, get_wishlist, remove_from_wishlist,
-    get_products_paginated, update_order_status,
-    get_statistics, get_related_products, compare_products,
+    get_products_paginated, get_product_facets, update_order_status,
+    get_statistics, get_sales_analytics, get_related_products, compare_products,
     create_video, get_video, get_videos_by_product, get_all_videos, delete_video,
     get_product_with_reviews, update_product, delete_product,
-    update_category, delete_category, get_orders_by_phone, get_orders_by_email,
+    update_category, delete_category,
     get_promotions_and_features
 )
 from database import callbacks_db, submit_forms_db, send_contact_form_email
+from auth import get_optional_user
+import auth
+from response_cache import cached_json_response
+import csv
+import io
+import json
+import re
+import uuid
 
 # Minimal admin dependency for endpoints that require admin
 def get_current_admin():
@@ -64,13 +73,15 @@ def validate_category_id(category_id: Optional[int] = Query(None)) -> Optional[i
 # ============ PRODUCT ENDPOINTS ============
 
 @router.get("/products", response_model=List[ProductResponse], tags=["Products"])
-def get_products(category_id: Optional[int] = Depends(validate_category_id)):
+def get_products(request: Request, category_id: Optional[int] = Depends(validate_category_id)):
     """
     Barcha mahsulotlarni olish
     
     - **category_id**: Ixtiyoriy. Faqat shu kategoriyadagi mahsulotlarni qaytaradi
+    
+    Javob keshlanadi (ETag / If-None-Match -> 304)
     """
-    return get_all_products(category_id=category_id)
+    return cached_json_response(request, ("products",), lambda: get_all_products(category_id=category_id))
 
 
 @router.get("/products-paginated", response_model=PaginatedResponse, tags=["Products"])
@@ -80,7 +91,11 @@ def get_products_paginated_endpoint(
     category_id: Optional[int] = None,
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
-    sort_by: Optional[str] = None
+    sort_by: Optional[str] = None,
+    after: Optional[str] = None,
+    storage: Optional[str] = None,
+    in_stock: Optional[bool] = None,
+    facets: bool = False
 ):
     """
     Sahifalangan mahsulotlar ro'yxati (Pagination)
@@ -91,15 +106,30 @@ def get_products_paginated_endpoint(
     - **min_price**: Minimal narx
     - **max_price**: Maksimal narx
     - **sort_by**: Tartiblash ("price_asc", "price_desc", "name_asc", "name_desc")
+    - **after**: Cursor (oldingi javobdagi next_cursor). Berilsa, page o'rniga
+      shu joydan davom etadi - chuqur sahifalar va infinite scroll uchun
+    - **storage**: Xotira hajmi bo'yicha filtrlash (masalan: "128 GB")
+    - **in_stock**: Faqat omborda bor (true) yoki yo'q (false) mahsulotlar
+    - **facets**: true bo'lsa javobga har bir filtr qiymati uchun mahsulotlar
+      soni qo'shiladi (kategoriya, xotira, in_stock, narx oraliqlari)
     """
-    products, total = get_products_paginated(
-        page=page,
-        page_size=page_size,
-        category_id=category_id,
-        min_price=min_price,
-        max_price=max_price,
-        sort_by=sort_by
-    )
+    try:
+        products, total, next_cursor = get_products_paginated(
+            page=page,
+            page_size=page_size,
+            category_id=category_id,
+            min_price=min_price,
+            max_price=max_price,
+            sort_by=sort_by,
+            after=after,
+            storage=storage,
+            in_stock=in_stock
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
     total_pages = (total + page_size - 1) // page_size
     
@@ -108,24 +138,35 @@ def get_products_paginated_endpoint(
         total=total,
         page=page,
         page_size=page_size,
-        total_pages=total_pages
+        total_pages=total_pages,
+        next_cursor=next_cursor,
+        facets=get_product_facets(
+            category_id=category_id,
+            min_price=min_price,
+            max_price=max_price,
+            storage=storage,
+            in_stock=in_stock
+        ) if facets else None
     )
 
 
 @router.get("/products/{product_id}", response_model=ProductResponse, tags=["Products"])
-def get_product_by_id(product_id: int):
+def get_product_by_id(request: Request, product_id: int):
     """
     Bitta mahsulotni ID bo'yicha olish
     
     - **product_id**: Mahsulot ID si
     """
-    product = get_product(product_id)
-    if not product:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Mahsulot topilmadi: {product_id}"
-        )
-    return product
+    def build():
+        product = get_product(product_id)
+        if not product:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Mahsulot topilmadi: {product_id}"
+            )
+        return product
+
+    return cached_json_response(request, (f"product:{product_id}",), build)
 
 
 @router.post("/products", response_model=ProductResponse, status_code=status.HTTP_201_CREATED, tags=["Products"])
@@ -156,8 +197,8 @@ def get_product_detail(product_id: int):
     
     Qaytaradi:
     - Mahsulot ma'lumotlari
-    - Barcha sharhlar
-    - O'rtacha baholash
+    - So'nggi 10 ta sharh (hammasi: /products/{product_id}/reviews)
+    - O'rtacha baholash va baholar histogrammasi (1-5)
     - Jami sharhlar soni
     """
     product_detail = get_product_with_reviews(product_id)
@@ -211,27 +252,30 @@ def delete_product_endpoint(
 # ============ CATEGORY ENDPOINTS ============
 
 @router.get("/categories", response_model=List[CategoryResponse], tags=["Categories"])
-def get_categories():
+def get_categories(request: Request):
     """
     Barcha kategoriyalarni olish
     """
-    return get_all_categories()
+    return cached_json_response(request, ("categories",), get_all_categories)
 
 
 @router.get("/categories/{category_id}", response_model=CategoryResponse, tags=["Categories"])
-def get_category_by_id(category_id: int):
+def get_category_by_id(request: Request, category_id: int):
     """
     Bitta kategoriyani ID bo'yicha olish
     
     - **category_id**: Kategoriya ID si
     """
-    category = get_category(category_id)
-    if not category:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Kategoriya topilmadi: {category_id}"
-        )
-    return category
+    def build():
+        category = get_category(category_id)
+        if not category:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Kategoriya topilmadi: {category_id}"
+            )
+        return category
+
+    return cached_json_response(request, (f"category:{category_id}",), build)
 
 
 @router.post("/categories", response_model=CategoryResponse, status_code=status.HTTP_201_CREATED, tags=["Categories"])
@@ -290,32 +334,79 @@ def delete_category_endpoint(
 # ============ SEARCH ENDPOINT ============
 
 @router.get("/search", response_model=SearchResponse, tags=["Search"])
-def search_products_endpoint(query: str):
+def search_products_endpoint(query: str, limit: int = Query(50, ge=1, le=200)):
     """
     Mahsulotlarni qidirish
     
     - **query**: Qidiruv so'rovi (majburiy)
+    - **limit**: Qaytariladigan natijalar soni (default: 50)
     
-    Qidiruv mahsulot nomi va tavsifida amalga oshiriladi
+    Qidiruv mahsulot nomi va tavsifida amalga oshiriladi.
+    So'zlar prefiks bo'yicha mos keladi ("ipho" -> "iPhone"),
+    natijalar relevantlik bo'yicha tartiblanadi
     """
-    results = search_products(query)
+    results, total = search_products(query, limit=limit)
     return SearchResponse(
         query=query,
         results=results,
-        total=len(results)
+        total=total
+    )
+
+
+@router.get("/search/suggest", response_model=SuggestResponse, tags=["Search"])
+def suggest_products_endpoint(query: str, limit: int = Query(10, ge=1, le=50)):
+    """
+    Qidiruv takliflari (search-as-you-type)
+    
+    - **query**: Foydalanuvchi yozayotgan matn (majburiy)
+    - **limit**: Takliflar soni (default: 10)
+    
+    Xato yozilgan so'rovlarni ham tushunadi: "ifone 14 pro", "самсунг"
+    """
+    return SuggestResponse(
+        query=query,
+        suggestions=suggest_products(query, limit=limit)
     )
 
 
 # ============ CART ENDPOINTS ===========
+CART_SESSION_HEADER = "X-Cart-Session"
+_CART_SESSION_PATTERN = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+
+
+def get_cart_key(
+    response: Response,
+    x_cart_session: Optional[str] = Header(None),
+    current_user: Optional[UserResponse] = Depends(get_optional_user)
+) -> str:
+    """
+    Joriy savatcha kaliti
+    - Login qilgan foydalanuvchi: "user:<id>" (sessiya savatchasi unga qo'shiladi)
+    - Mehmon: X-Cart-Session header dagi token; yo'q bo'lsa yangisi yaratilib
+      javob header'ida qaytariladi - keyingi so'rovlarda shuni yuborish kerak
+    """
+    session = x_cart_session if x_cart_session and _CART_SESSION_PATTERN.match(x_cart_session) else None
+
+    if current_user:
+        user_key = f"user:{current_user.id}"
+        if session:
+            merge_carts(f"session:{session}", user_key)
+        return user_key
+
+    if session is None:
+        session = uuid.uuid4().hex
+    response.headers[CART_SESSION_HEADER] = session
+    return f"session:{session}"
+
 
 @router.get("/cart", response_model=CartResponse, tags=["Cart"])
-def get_cart_items():
+def get_cart_items(cart_key: str = Depends(get_cart_key)):
     """
     Savatchadagi barcha mahsulotlarni olish
     
     Jami mahsulotlar soni, narx, chegirma, yetkazib berish va yakuniy summani qaytaradi
     """
-    items = get_cart()
+    items = get_cart(cart_key)
     total_items = sum(item.quantity for item in items)
     total_price = sum(item.total_price for item in items)
     
@@ -344,7 +435,7 @@ def get_cart_items():
 
 
 @router.post("/cart/add", response_model=CartItemResponse, tags=["Cart"])
-def add_product_to_cart(cart_item: CartItemCreate):
+def add_product_to_cart(cart_item: CartItemCreate, cart_key: str = Depends(get_cart_key)):
     """
     Savatchaga mahsulot qo'shish
     
@@ -354,7 +445,7 @@ def add_product_to_cart(cart_item: CartItemCreate):
     Agar mahsulot allaqachon savatchada bo'lsa, miqdori oshiriladi
     """
     try:
-        return add_to_cart(cart_item)
+        return add_to_cart(cart_key, cart_item)
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -363,7 +454,7 @@ def add_product_to_cart(cart_item: CartItemCreate):
 
 
 @router.put("/cart/{item_id}", response_model=CartItemResponse, tags=["Cart"])
-def update_cart_item_quantity(item_id: int, quantity: int):
+def update_cart_item_quantity(item_id: int, quantity: int, cart_key: str = Depends(get_cart_key)):
     """
     Savatchadagi mahsulot miqdorini yangilash
     
@@ -376,7 +467,7 @@ def update_cart_item_quantity(item_id: int, quantity: int):
             detail="Miqdor 1-10 oralig'ida bo'lishi kerak"
         )
     
-    updated_item = update_cart_item(item_id, quantity)
+    updated_item = update_cart_item(cart_key, item_id, quantity)
     if not updated_item:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -386,13 +477,13 @@ def update_cart_item_quantity(item_id: int, quantity: int):
 
 
 @router.delete("/cart/{item_id}", response_model=MessageResponse, tags=["Cart"])
-def delete_cart_item(item_id: int):
+def delete_cart_item(item_id: int, cart_key: str = Depends(get_cart_key)):
     """
     Savatchadan mahsulotni olib tashlash
     
     - **item_id**: Savatchadagi item ID si
     """
-    success = remove_from_cart(item_id)
+    success = remove_from_cart(cart_key, item_id)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -402,11 +493,11 @@ def delete_cart_item(item_id: int):
 
 
 @router.delete("/cart", response_model=MessageResponse, tags=["Cart"])
-def clear_cart_items():
+def clear_cart_items(cart_key: str = Depends(get_cart_key)):
     """
     Savatchani to'liq tozalash
     """
-    clear_cart()
+    clear_cart(cart_key)
     return MessageResponse(message="Savatcha tozalandi")
 
 
@@ -415,7 +506,8 @@ def clear_cart_items():
 @router.post("/orders", response_model=OrderResponse, status_code=status.HTTP_201_CREATED, tags=["Orders"])
 def create_new_order(
     order: OrderCreate,
-    current_user: UserResponse = Depends(get_current_active_user)
+    current_user: UserResponse = Depends(auth.get_current_active_user),
+    cart_key: str = Depends(get_cart_key)
 ):
     """
     Yangi buyurtma yaratish (Faqat autentifikatsiya qilingan foydalanuvchilar uchun)
@@ -428,7 +520,7 @@ def create_new_order(
     Foydalanuvchi ma'lumotlari avtomatik olinadi.
     """
     # Avval savatchani tekshirish
-    cart_items = get_cart()
+    cart_items = get_cart(cart_key)
     if not cart_items:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -442,7 +534,7 @@ def create_new_order(
             detail="Yetkazib berish manzili ko'rsatilishi kerak"
         )
     
-    return create_order(order, cart_items, current_user)
+    return create_order(order, cart_items, current_user, cart_key)
 
 
 @router.post("/orders/one-click", response_model=OrderResponse, status_code=status.HTTP_201_CREATED, tags=["Orders"])
@@ -470,10 +562,65 @@ def create_one_click_buy_order(request: OneClickBuyRequest):
         )
 
 
+# Eksport ustunlari (CSV)
+ORDER_EXPORT_COLUMNS = (
+    "id", "created_at", "status", "customer_name", "customer_phone", "customer_email",
+    "user_id", "delivery_address", "total_price", "items", "notes"
+)
+
+
+def _order_export_lines(orders, export_format: str):
+    """Buyurtmalarni NDJSON yoki CSV qatorlariga aylantirish (generator)"""
+    if export_format == "ndjson":
+        for order in orders:
+            yield json.dumps(order, ensure_ascii=False) + "\n"
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(ORDER_EXPORT_COLUMNS)
+    for order in orders:
+        row = dict(order, items="; ".join(f"{item['product_name']} x{item['quantity']}" for item in order["items"]))
+        writer.writerow([row[column] for column in ORDER_EXPORT_COLUMNS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+@router.get("/orders/export", tags=["Orders"])
+def export_orders(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    status_filter: Optional[OrderStatus] = Query(None, alias="status"),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    current_user: UserResponse = Depends(auth.get_current_admin)
+):
+    """
+    Buyurtmalarni eksport qilish (Admin uchun)
+    
+    - **format**: "ndjson" (har qatorda bitta JSON buyurtma) yoki "csv"
+    - **status**: Buyurtma holati bo'yicha filtrlash (ixtiyoriy)
+    - **date_from**, **date_to**: Yaratilgan sana oralig'i (ixtiyoriy)
+    
+    Buyurtmalar eng eskisidan boshlab oqim (streaming) sifatida yuboriladi:
+    javob darhol boshlanadi va xotira buyurtmalar soniga bog'liq emas.
+    """
+    orders = iter_orders(status=status_filter, date_from=date_from, date_to=date_to)
+    media_type = "application/x-ndjson" if export_format == "ndjson" else "text/csv; charset=utf-8"
+    filename = f"orders-{datetime.now():%Y%m%d-%H%M%S}.{export_format}"
+    return StreamingResponse(
+        _order_export_lines(orders, export_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
 @router.get("/orders/{order_id}", response_model=OrderResponse, tags=["Orders"])
 def get_order_by_id(
     order_id: int,
-    current_user: UserResponse = Depends(get_current_active_user)
+    current_user: UserResponse = Depends(auth.get_current_active_user)
 ):
     """
     Buyurtmani ID bo'yicha olish
@@ -492,7 +639,7 @@ def get_order_by_id(
     
     # Foydalanuvchi faqat o'z buyurtmalarini ko'rishi mumkin
     from models import UserRole
-    if current_user.role != UserRole.ADMIN and order.user_id != current_user.id:
+    if current_user.role != UserRole.ADMIN and order["user_id"] != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Bu buyurtmaga kirish huquqingiz yo'q"
@@ -505,29 +652,41 @@ def get_order_by_id(
 def get_all_orders_endpoint(
     phone: Optional[str] = None,
     email: Optional[str] = None,
-    current_user: UserResponse = Depends(get_current_active_user)
+    user_id: Optional[int] = None,
+    status_filter: Optional[OrderStatus] = Query(None, alias="status"),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    page: int = Query(1, ge=1),
+    page_size: Optional[int] = Query(None, ge=1, le=500),
+    current_user: UserResponse = Depends(auth.get_current_active_user)
 ):
     """
-    Buyurtmalarni olish
+    Buyurtmalarni olish (eng yangisidan boshlab)
     
-    - **phone**: Telefon raqami bo'yicha filtrlash (ixtiyoriy)
-    - **email**: Email bo'yicha filtrlash (ixtiyoriy)
+    - **phone**: Telefon raqami bo'yicha filtrlash (ixtiyoriy, Admin)
+    - **email**: Email bo'yicha filtrlash (ixtiyoriy, Admin)
+    - **user_id**: Foydalanuvchi ID bo'yicha filtrlash (ixtiyoriy, Admin)
+    - **status**: Buyurtma holati bo'yicha filtrlash (ixtiyoriy)
+    - **date_from**, **date_to**: Yaratilgan sana oralig'i (ixtiyoriy)
+    - **page**: Sahifa raqami (default: 1)
+    - **page_size**: Sahifadagi buyurtmalar soni (berilmasa hammasi)
     
+    Filtrga mos jami soni X-Total-Count header'ida qaytariladi.
     Oddiy foydalanuvchilar faqat o'z buyurtmalarini ko'radi.
     Admin barcha buyurtmalarni ko'radi.
     """
+    filters = dict(status=status_filter, date_from=date_from, date_to=date_to, page=page, page_size=page_size)
+
     # Agar admin bo'lsa, barcha buyurtmalarni ko'rsatish
     from models import UserRole
     if current_user.role == UserRole.ADMIN:
-        if phone:
-            return get_orders_by_phone(phone)
-        elif email:
-            return get_orders_by_email(email)
-        else:
-            return get_all_orders()
+        orders, total = get_orders(phone=phone, email=email, user_id=user_id, **filters)
     else:
-        # Oddiy foydalanuvchi faqat o'z buyurtmalarini ko'radi
-        return get_orders_by_phone(current_user.phone)
+        # Oddiy foydalanuvchi faqat o'z buyurtmalarini ko'radi (telefoni bo'lmasa ham - user_id bo'yicha)
+        orders, total = get_orders(user_id=current_user.id, **filters)
+
+    # Buyurtmalar yozishda normallashtirilgan - qayta validatsiya qilmasdan JSON
+    return JSONResponse(orders, headers={"X-Total-Count": str(total)})
 
 
 # ============ FORM ENDPOINTS ============
@@ -718,11 +877,17 @@ def create_product_review(review: ReviewCreate):
 
 
 @router.get("/products/{product_id}/reviews", response_model=List[ReviewResponse], tags=["Reviews"])
-def get_reviews_for_product(product_id: int):
+def get_reviews_for_product(
+    product_id: int,
+    page: int = Query(1, ge=1),
+    page_size: Optional[int] = Query(None, ge=1, le=100)
+):
     """
-    Mahsulot sharhlarini olish
+    Mahsulot sharhlarini olish (eng yangisidan boshlab)
     
     - **product_id**: Mahsulot ID
+    - **page**: Sahifa raqami (default: 1)
+    - **page_size**: Sahifadagi sharhlar soni (berilmasa barcha sharhlar)
     """
     product = get_product(product_id)
     if not product:
@@ -730,7 +895,7 @@ def get_reviews_for_product(product_id: int):
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Mahsulot topilmadi: {product_id}"
         )
-    return get_product_reviews(product_id)
+    return get_product_reviews(product_id, page=page, page_size=page_size)
 
 
 @router.get("/reviews", response_model=List[ReviewResponse], tags=["Reviews"])
@@ -831,10 +996,49 @@ def get_statistics_endpoint(
     return get_statistics()
 
 
+@router.get("/analytics/sales", response_model=SalesAnalyticsResponse, tags=["Statistics"])
+def get_sales_analytics_endpoint(
+    start: datetime,
+    end: datetime,
+    granularity: str = "day",
+    dimension: str = "total",
+    key: Optional[int] = None,
+    status_filter: Optional[List[OrderStatus]] = Query(None, alias="status"),
+    current_user: UserResponse = Depends(auth.get_current_admin)
+):
+    """
+    Savdo analitikasi vaqt bo'yicha (Admin uchun)
+    
+    - **start**, **end**: Oraliq [start, end) (masalan: 2024-01-01T00:00:00)
+    - **granularity**: "hour", "day" yoki "week" (default: day)
+    - **dimension**: "total", "category" yoki "product" (default: total)
+    - **key**: Faqat bitta category_id / product_id uchun (ixtiyoriy)
+    - **status**: Hisobga olinadigan buyurtma holatlari (bir necha marta berish mumkin).
+      Berilmasa bekor qilinganlardan tashqari hammasi
+    
+    Har bir bucket uchun daromad, buyurtmalar va sotilgan donalar soni.
+    Natija oldindan yig'ilgan rollup'lardan olinadi (python analytics.py rebuild - qayta qurish).
+    """
+    try:
+        return get_sales_analytics(
+            granularity=granularity,
+            start=start,
+            end=end,
+            dimension=dimension,
+            key=key,
+            statuses=status_filter
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
 # ============ RELATED PRODUCTS ENDPOINT ============
 
 @router.get("/products/{product_id}/related", response_model=RelatedProductsResponse, tags=["Products"])
-def get_related_products_endpoint(product_id: int, limit: int = 4):
+def get_related_products_endpoint(request: Request, product_id: int, limit: int = 4):
     """
     O'xshash mahsulotlarni olish
     
@@ -843,18 +1047,30 @@ def get_related_products_endpoint(product_id: int, limit: int = 4):
     
     Bir xil kategoriyadagi boshqa mahsulotlarni qaytaradi
     """
-    product = get_product(product_id)
-    if not product:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Mahsulot topilmadi: {product_id}"
+    def build():
+        product = get_product(product_id)
+        if not product:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Mahsulot topilmadi: {product_id}"
+            )
+
+        related = get_related_products(product_id, limit)
+        return RelatedProductsResponse(
+            product_id=product_id,
+            related_products=related
         )
-    
-    related = get_related_products(product_id, limit)
-    return RelatedProductsResponse(
-        product_id=product_id,
-        related_products=related
-    )
+
+    # Boshqa mahsulotlar o'zgarishi ham natijaga ta'sir qiladi - "products" tegi
+    return cached_json_response(request, ("products",), build)
+
+
+@router.get("/promotions", response_model=PromotionsFeaturesResponse, tags=["Info"])
+def get_promotions(request: Request):
+    """
+    Aktsiyalar va do'kon xususiyatlari (bosh sahifa bloklari)
+    """
+    return cached_json_response(request, ("promotions",), get_promotions_and_features)
 
 
 # ============ COMPARE PRODUCTS ENDPOINT ============
@@ -0,0 +1,363 @@
+"""
+Mahsulotlar uchun qidiruv indeksi (inverted index)
+Nom va tavsifdagi so'zlar -> mahsulot ID lari. create/update/delete
+vaqtida yangilanadi, shuning uchun qidiruv katalog hajmiga bog'liq emas.
+Lotin, kirill va o'zbekcha apostrofli (o'zbek, g'isht) so'zlarni tushunadi.
+TrigramIndex esa xatoli yozilgan so'rovlar uchun nom takliflarini beradi.
+"""
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+import heapq
+import re
+import threading
+
+# O'zbek tilidagi turli apostrof belgilari bitta ko'rinishga keltiriladi
+_APOSTROPHES = str.maketrans({"ʻ": "'", "ʼ": "'", "’": "'", "‘": "'", "`": "'", "´": "'"})
+_TOKEN_RE = re.compile(r"\w+(?:'\w+)*")
+
+NAME_WEIGHT = 3  # Nomdagi so'z tavsifdagidan muhimroq
+DESCRIPTION_WEIGHT = 1
+EXACT_BONUS = 2  # To'liq so'z mosligi prefiksdan yuqori turadi
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Matnni kichik harfli so'zlarga ajratish"""
+    if not text:
+        return []
+    text = text.lower().translate(_APOSTROPHES)
+    return _TOKEN_RE.findall(text)
+
+
+def _index_terms(token: str) -> Tuple[str, ...]:
+    """So'z va uning apostrofsiz varianti (o'zbek -> ozbek)"""
+    plain = token.replace("'", "")
+    if plain != token:
+        return token, plain
+    return (token,)
+
+
+class SearchIndex:
+    """So'z -> {product_id: og'irlik} inverted index va prefiks uchun tartiblangan lug'at"""
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._doc_terms: Dict[int, Set[str]] = {}
+        self._vocabulary: List[str] = []  # bisect bilan prefiks qidirish uchun
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    def add(self, product_id: int, name: Optional[str], description: Optional[str]) -> None:
+        """Mahsulotni indeksga qo'shish (mavjud bo'lsa yangilash)"""
+        weights: Dict[str, int] = {}
+        for token in tokenize(name):
+            for term in _index_terms(token):
+                weights[term] = weights.get(term, 0) + NAME_WEIGHT
+        for token in tokenize(description):
+            for term in _index_terms(token):
+                weights[term] = weights.get(term, 0) + DESCRIPTION_WEIGHT
+
+        with self._lock:
+            self._remove(product_id)
+            for term, weight in weights.items():
+                posting = self._postings.get(term)
+                if posting is None:
+                    posting = self._postings[term] = {}
+                    insort(self._vocabulary, term)
+                posting[product_id] = weight
+            self._doc_terms[product_id] = set(weights)
+
+    def remove(self, product_id: int) -> None:
+        """Mahsulotni indeksdan olib tashlash"""
+        with self._lock:
+            self._remove(product_id)
+
+    def _remove(self, product_id: int) -> None:
+        for term in self._doc_terms.pop(product_id, ()):
+            posting = self._postings[term]
+            posting.pop(product_id, None)
+            if not posting:
+                del self._postings[term]
+                i = bisect_left(self._vocabulary, term)
+                del self._vocabulary[i]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._postings.clear()
+            self._doc_terms.clear()
+            self._vocabulary.clear()
+
+    def _prefix_terms(self, prefix: str) -> List[str]:
+        """prefix bilan boshlanadigan barcha so'zlar (bisect orqali)"""
+        start = bisect_left(self._vocabulary, prefix)
+        terms = []
+        for i in range(start, len(self._vocabulary)):
+            term = self._vocabulary[i]
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        return terms
+
+    def _match(self, token: str) -> Dict[int, int]:
+        """Bitta so'rov so'zi uchun mahsulot -> ball (prefiks moslik bilan)"""
+        scores: Dict[int, int] = {}
+        for query_term in _index_terms(token):
+            for term in self._prefix_terms(query_term):
+                bonus = EXACT_BONUS if term == query_term else 1
+                for product_id, weight in self._postings[term].items():
+                    score = weight * bonus
+                    if score > scores.get(product_id, 0):
+                        scores[product_id] = score
+        return scores
+
+    def search(self, query: str, limit: Optional[int] = None) -> Tuple[List[int], int]:
+        """
+        So'rovdagi barcha so'zlar (prefiks sifatida) mos kelgan mahsulotlar.
+        Natija: (ball bo'yicha tartiblangan ID lar, jami topilganlar soni)
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return [], 0
+
+        with self._lock:
+            # Eng kam uchraydigan so'zdan boshlab kesishma olinadi
+            matches = sorted((self._match(token) for token in tokens), key=len)
+            scores = matches[0]
+            for other in matches[1:]:
+                scores = {pid: s + other[pid] for pid, s in scores.items() if pid in other}
+                if not scores:
+                    break
+
+        total = len(scores)
+        order_key = lambda pid: (-scores[pid], pid)
+        if limit is not None and limit < total:
+            ranked = heapq.nsmallest(limit, scores, key=order_key)
+        else:
+            ranked = sorted(scores, key=order_key)
+        return ranked, total
+
+
+# ============ TRIGRAM (SUGGEST) INDEX ============
+# Kirill harflari lotinchaga o'giriladi: "самсунг" -> "samsung"
+_CYRILLIC_TO_LATIN = str.maketrans({
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "yo", "ж": "j",
+    "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o",
+    "п": "p", "р": "r", "с": "s", "т": "t", "у": "u", "ф": "f", "х": "x", "ц": "ts",
+    "ч": "ch", "ш": "sh", "щ": "sh", "ъ": "", "ы": "i", "ь": "", "э": "e", "ю": "yu",
+    "я": "ya", "ў": "o", "ғ": "g", "қ": "q", "ҳ": "h",
+})
+# Talaffuz bo'yicha bir xil yoziladigan kombinatsiyalar ("iphone" ~ "ifone", "айфон" ~ "ifon")
+_PHONETIC = (("ph", "f"), ("ck", "k"), ("w", "v"))
+_CYRILLIC_PHONETIC = (("айф", "иф"), ("айп", "ип"))
+
+
+def normalize_for_trigrams(text: Optional[str]) -> str:
+    """Xatoga chidamli solishtirish uchun matnni bir ko'rinishga keltirish"""
+    text = " ".join(token.replace("'", "") for token in tokenize(text))
+    for source, target in _CYRILLIC_PHONETIC:
+        text = text.replace(source, target)
+    text = text.translate(_CYRILLIC_TO_LATIN)
+    for source, target in _PHONETIC:
+        text = text.replace(source, target)
+    return text
+
+
+def trigrams(text: str) -> Set[str]:
+    """Har bir so'z chetlari bo'sh joy bilan to'ldirilgan trigramlar"""
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+class TrigramIndex:
+    """
+    Search-as-you-type uchun xatoga chidamli nom indeksi.
+    Trigramlar nom so'zlari lug'ati ustida quriladi (lug'at katalogdan ancha kichik):
+    so'rovdagi har bir so'z avval lug'atdagi eng o'xshash so'zlarga tuzatiladi,
+    keyin so'z -> nomlar postinglari kesishmasi olinadi.
+    Bir xil nomli mahsulotlar bitta taklifga birlashtiriladi.
+    """
+
+    MAX_WORD_CANDIDATES = 8  # Har bir so'rov so'zi uchun ko'rib chiqiladigan tuzatishlar
+    MIN_SIMILARITY = 0.3  # Bundan past o'xshashlikdagi so'zlar hisobga olinmaydi
+
+    def __init__(self):
+        self._entries: Dict[str, Dict[int, None]] = {}  # nom kaliti -> product ID lar
+        self._labels: Dict[str, str] = {}  # nom kaliti -> ko'rsatiladigan nom
+        self._doc_keys: Dict[int, str] = {}  # product_id -> nom kaliti
+        self._word_keys: Dict[str, Set[str]] = {}  # so'z -> shu so'z bor nom kalitlari
+        self._word_gram_count: Dict[str, int] = {}  # so'z -> trigramlar soni
+        self._gram_words: Dict[str, Set[str]] = {}  # trigram -> so'zlar
+        self._vocabulary: List[str] = []  # prefiks uchun tartiblangan so'zlar
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._doc_keys)
+
+    def add(self, product_id: int, name: Optional[str]) -> None:
+        """Mahsulot nomini indeksga qo'shish (mavjud bo'lsa yangilash)"""
+        key = normalize_for_trigrams(name)
+        with self._lock:
+            self._remove(product_id)
+            if not key:
+                return
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = {}
+                self._labels[key] = name.strip()
+                for word in set(key.split()):
+                    self._add_word(word, key)
+            entry[product_id] = None
+            self._doc_keys[product_id] = key
+
+    def _add_word(self, word: str, key: str) -> None:
+        keys = self._word_keys.get(word)
+        if keys is None:
+            keys = self._word_keys[word] = set()
+            grams = trigrams(word)
+            self._word_gram_count[word] = len(grams)
+            for gram in grams:
+                self._gram_words.setdefault(gram, set()).add(word)
+            insort(self._vocabulary, word)
+        keys.add(key)
+
+    def remove(self, product_id: int) -> None:
+        """Mahsulotni indeksdan olib tashlash"""
+        with self._lock:
+            self._remove(product_id)
+
+    def _remove(self, product_id: int) -> None:
+        key = self._doc_keys.pop(product_id, None)
+        if key is None:
+            return
+        entry = self._entries[key]
+        entry.pop(product_id, None)
+        if entry:
+            return
+        del self._entries[key]
+        del self._labels[key]
+        for word in set(key.split()):
+            keys = self._word_keys[word]
+            keys.discard(key)
+            if keys:
+                continue
+            del self._word_keys[word]
+            del self._word_gram_count[word]
+            for gram in trigrams(word):
+                words = self._gram_words[gram]
+                words.discard(word)
+                if not words:
+                    del self._gram_words[gram]
+            del self._vocabulary[bisect_left(self._vocabulary, word)]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._labels.clear()
+            self._doc_keys.clear()
+            self._word_keys.clear()
+            self._word_gram_count.clear()
+            self._gram_words.clear()
+            self._vocabulary.clear()
+
+    def _word_candidates(self, word: str, prefix: bool) -> Dict[str, float]:
+        """So'rov so'zi -> lug'atdagi mos so'zlar va o'xshashlik (1.0 = aynan)"""
+        candidates: Dict[str, float] = {}
+        if word in self._word_keys:
+            candidates[word] = 1.0
+
+        if prefix:
+            # Yozilayotgan oxirgi so'z: "ipho" -> "ifone" (normalizatsiyadan keyin)
+            start = bisect_left(self._vocabulary, word)
+            for term in self._vocabulary[start:start + self.MAX_WORD_CANDIDATES * 4]:
+                if not term.startswith(word):
+                    break
+                candidates.setdefault(term, 0.6 + 0.4 * len(word) / len(term))
+
+        grams = trigrams(word)
+        shared: Dict[str, int] = Counter()
+        for gram in grams:
+            words = self._gram_words.get(gram)
+            if words:
+                shared.update(words)
+        for term, common in shared.items():
+            similarity = 0.9 * common / (len(grams) + self._word_gram_count[term] - common)
+            if similarity >= self.MIN_SIMILARITY and similarity > candidates.get(term, 0):
+                candidates[term] = similarity
+
+        best = heapq.nlargest(self.MAX_WORD_CANDIDATES, candidates.items(), key=lambda item: item[1])
+        return dict(best)
+
+    def suggest(self, query: str, limit: int = 10) -> List[Tuple[str, int, float]]:
+        """
+        Eng mos nomlar: [(nom, birinchi product_id, ball), ...]
+        Ball = so'rov so'zlarining o'rtacha o'xshashligi (0-1).
+        Tenglikda qisqaroq nom (to'liqroq moslik) oldinda turadi.
+        """
+        words = list(dict.fromkeys(normalize_for_trigrams(query).split()))
+        if not words:
+            return []
+
+        with self._lock:
+            per_word = []
+            for i, word in enumerate(words):
+                candidates = self._word_candidates(word, prefix=(i == len(words) - 1))
+                if candidates:  # Umuman tanilmagan so'z e'tiborsiz qoldiriladi
+                    size = sum(len(self._word_keys[term]) for term in candidates)
+                    per_word.append((size, candidates))
+            if not per_word:
+                return []
+            per_word.sort(key=lambda item: item[0])
+
+            if len(per_word) == 1:
+                best_keys, scores = self._rank_single_word(per_word[0][1], limit)
+            else:
+                best_keys, scores = self._rank_words(per_word, limit)
+
+            return [
+                (self._labels[key], next(iter(self._entries[key])), round(scores[key] / len(words), 3))
+                for key in best_keys
+            ]
+
+    def _rank_single_word(self, candidates: Dict[str, float], limit: int):
+        """Bitta so'z: eng o'xshash so'zlardan boshlab eng qisqa nomlar olinadi"""
+        best_keys: List[str] = []
+        scores: Dict[str, float] = {}
+        for term, similarity in sorted(candidates.items(), key=lambda item: -item[1]):
+            keys = self._word_keys[term].difference(scores)
+            for key in heapq.nsmallest(limit - len(best_keys), keys, key=len):
+                best_keys.append(key)
+                scores[key] = similarity
+            if len(best_keys) >= limit:
+                break
+        return best_keys, scores
+
+    def _rank_words(self, per_word: List[Tuple[int, Dict[str, float]]], limit: int):
+        """Bir nechta so'z: eng kam uchraydigan so'zdan boshlab postinglar kesishmasi"""
+        scores: Dict[str, float] = {}
+        for term, similarity in sorted(per_word[0][1].items(), key=lambda item: item[1]):
+            scores.update(dict.fromkeys(self._word_keys[term], similarity))
+
+        for _, candidates in per_word[1:]:
+            next_scores: Dict[str, float] = {}
+            # Past o'xshashlikdan yuqoriga: yaxshiroq tuzatish ustidan yoziladi
+            for term, similarity in sorted(candidates.items(), key=lambda item: item[1]):
+                for key in scores.keys() & self._word_keys[term]:
+                    next_scores[key] = scores[key] + similarity
+            scores = next_scores
+            if not scores:
+                return [], scores
+
+        # Ballar kam sonli qiymatlardan iborat: eng yuqorisidan boshlab guruhlab olinadi
+        best_keys: List[str] = []
+        for value in sorted(set(scores.values()), reverse=True):
+            group = [key for key, score in scores.items() if score == value]
+            best_keys.extend(heapq.nsmallest(limit - len(best_keys), group, key=len))
+            if len(best_keys) >= limit:
+                break
+        return best_keys, scores
@@ -0,0 +1,730 @@
+"""
+Ma'lumotlarni saqlash qatlami (storage backend)
+database.py dagi barcha store'lar shu interfeys orqali ishlaydi.
+Uch xil backend bor:
+- memory: oddiy dict (default, bitta worker uchun)
+- sqlite: WAL rejimidagi SQLite fayl (bir nechta worker umumiy holatni ko'radi)
+- wal: memory tezligi + restart dan keyin tiklanish (append-only log va snapshot,
+  bitta jarayon uchun)
+
+Tanlash: STORAGE_BACKEND=memory|sqlite|wal, SQLITE_PATH=phone_shop.db, WAL_DIR=data
+"""
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import atexit
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "memory")
+SQLITE_PATH = os.getenv("SQLITE_PATH", "phone_shop.db")
+WAL_DIR = os.getenv("WAL_DIR", "data")
+WAL_FLUSH_MS = int(os.getenv("WAL_FLUSH_MS", "10"))                    # group commit oralig'i
+WAL_SYNC = os.getenv("WAL_SYNC", "0") == "1"                           # 1: yozuv fsync bo'lguncha kutiladi
+WAL_SNAPSHOT_RECORDS = int(os.getenv("WAL_SNAPSHOT_RECORDS", "100000"))  # shuncha yozuvdan keyin snapshot
+
+
+# ============ RECORD CODEC ============
+def _json_default(value: Any):
+    """JSON ga to'g'ridan-to'g'ri o'tmaydigan qiymatlar"""
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    raise TypeError(f"JSON ga o'girib bo'lmaydi: {type(value).__name__}")
+
+
+def _json_object_hook(obj: dict):
+    """datetime qiymatlarni qayta tiklash"""
+    if len(obj) == 1 and "$dt" in obj:
+        return datetime.fromisoformat(obj["$dt"])
+    return obj
+
+
+def encode_record(record: dict) -> str:
+    """Yozuvni ixcham JSON matnga o'girish"""
+    return json.dumps(record, default=_json_default, ensure_ascii=False, separators=(",", ":"))
+
+
+def decode_record(data: str) -> dict:
+    """JSON matndan yozuvni tiklash"""
+    return json.loads(data, object_hook=_json_object_hook)
+
+
+def _column_value(value: Any):
+    """Index ustuni uchun SQLite tushunadigan qiymat"""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+# ============ TABLE INTERFACE ============
+class Table(MutableMapping):
+    """
+    Bitta store (jadval): key -> record (dict)
+    dict kabi ishlatiladi, qo'shimcha ravishda find() va next_id() bor.
+    Muhim: olingan record'ni o'zgartirgandan keyin uni qayta yozish kerak
+    (table[key] = record), aks holda SQLite backend da o'zgarish saqlanmaydi.
+    """
+
+    def __init__(self, name: str, indexes: Tuple[str, ...] = (), key_type: type = int):
+        self.name = name
+        self.indexes = tuple(indexes)
+        self.key_type = key_type
+
+    def find(self, field: str, value: Any) -> List[dict]:
+        """field == value bo'lgan yozuvlar (id tartibida)"""
+        raise NotImplementedError
+
+    def find_one(self, field: str, value: Any) -> Optional[dict]:
+        """field == value bo'lgan birinchi yozuv"""
+        rows = self.find(field, value)
+        return rows[0] if rows else None
+
+    def field(self, key, name: str) -> Any:
+        """Yozuvning bitta maydoni (yozuv yo'q bo'lsa None)"""
+        record = self.get(key)
+        return record.get(name) if record is not None else None
+
+    def next_id(self) -> int:
+        """Keyingi bo'sh id (barcha worker'lar uchun yagona)"""
+        raise NotImplementedError
+
+    def refresh(self, key=None) -> None:
+        """Boshqa worker yozgan o'zgarishni qayta o'qish (xotirada kalit keshi bor jadvallar uchun)"""
+
+
+class RecordList:
+    """Ro'yxat ko'rinishidagi store (formalar uchun): faqat append va o'qish"""
+
+    def __init__(self, table: Table):
+        self.table = table
+
+    def append(self, record: dict) -> None:
+        self.table[self.table.next_id()] = record
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(list(self.table.values()))
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def clear(self) -> None:
+        self.table.clear()
+
+
+# ============ MEMORY BACKEND ============
+class MemoryTable(Table):
+    """
+    Oddiy dict ustidagi jadval.
+    indexes dagi har bir maydon uchun hash index saqlanadi: value -> {key: None}
+    (dict tartibli to'plam sifatida), shuning uchun find() O(natija) ishlaydi.
+    row_store - qatorlar saqlanadigan mapping turi (default dict; masalan
+    mahsulotlar uchun ixcham ustunli product_rows.ProductRows).
+    """
+
+    def __init__(self, name: str, indexes: Tuple[str, ...] = (), key_type: type = int, row_store: type = dict):
+        super().__init__(name, indexes, key_type)
+        self._row_store = row_store
+        self._rows: Dict[Any, dict] = row_store()
+        self._counter = 0
+        self._lock = threading.RLock()
+        self._index: Dict[str, Dict[Any, Dict[Any, None]]] = {field: {} for field in self.indexes}
+        # key -> index qilingan qiymatlar (record joyida o'zgartirilsa ham eski qiymat ma'lum)
+        self._indexed_values: Dict[Any, Tuple] = {}
+
+    def _unindex(self, key) -> None:
+        old_values = self._indexed_values.pop(key, None)
+        if old_values is None:
+            return
+        for field, value in zip(self.indexes, old_values):
+            bucket = self._index[field].get(value)
+            if bucket is not None:
+                bucket.pop(key, None)
+                if not bucket:
+                    del self._index[field][value]
+
+    def __getitem__(self, key):
+        return self._rows[key]
+
+    def __setitem__(self, key, record: dict):
+        with self._lock:
+            values = tuple(record.get(field) for field in self.indexes)
+            if self.indexes and self._indexed_values.get(key) != values:
+                self._unindex(key)
+                for field, value in zip(self.indexes, values):
+                    self._index[field].setdefault(value, {})[key] = None
+                self._indexed_values[key] = values
+            self._rows[key] = record
+
+    def __delitem__(self, key):
+        with self._lock:
+            del self._rows[key]
+            self._unindex(key)
+
+    def __contains__(self, key) -> bool:
+        return key in self._rows
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def get(self, key, default=None):
+        return self._rows.get(key, default)
+
+    def field(self, key, name: str) -> Any:
+        read = getattr(self._rows, "field", None)
+        return read(key, name) if read is not None else super().field(key, name)
+
+    def values(self):
+        return self._rows.values()
+
+    def items(self):
+        return self._rows.items()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._rows.clear()
+            self._indexed_values.clear()
+            for bucket in self._index.values():
+                bucket.clear()
+
+    def find(self, field: str, value: Any) -> List[dict]:
+        bucket = self._index.get(field)
+        if bucket is None:
+            return [r for r in self._rows.values() if r.get(field) == value]
+        keys = bucket.get(value)
+        if not keys:
+            return []
+        return [self._rows[key] for key in list(keys)]
+
+    def next_id(self) -> int:
+        with self._lock:
+            self._counter += 1
+            return self._counter
+
+
+class MemoryBackend:
+    """Hamma narsa jarayon xotirasida (restart da yo'qoladi)"""
+
+    name = "memory"
+
+    def __init__(self):
+        self._transaction_lock = threading.RLock()
+
+    def table(self, name: str, indexes: Tuple[str, ...] = (), key_type: type = int, row_store: type = dict) -> MemoryTable:
+        return MemoryTable(name, indexes, key_type, row_store)
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Bir jarayon ichida ketma-ketlik (SQLite dagi BEGIN IMMEDIATE ga mos)"""
+        with self._transaction_lock:
+            yield
+
+    def close(self) -> None:
+        pass
+
+
+# ============ SQLITE BACKEND ============
+class SQLiteTable(Table):
+    """
+    SQLite jadvali: (id PRIMARY KEY, data JSON, index ustunlari)
+    SQL matnlari oldindan tayyorlanadi, shuning uchun sqlite3 ning
+    statement cache'i ularni har safar qayta parse qilmaydi.
+    """
+
+    def __init__(self, backend: "SQLiteBackend", name: str, indexes: Tuple[str, ...] = (), key_type: type = int):
+        super().__init__(name, indexes, key_type)
+        self.backend = backend
+
+        columns = ["id", "data", *self.indexes]
+        placeholders = ", ".join("?" for _ in columns)
+        self._sql_get = f"SELECT data FROM {name} WHERE id = ?"
+        self._sql_contains = f"SELECT 1 FROM {name} WHERE id = ?"
+        self._sql_put = f"INSERT OR REPLACE INTO {name} ({', '.join(columns)}) VALUES ({placeholders})"
+        self._sql_delete = f"DELETE FROM {name} WHERE id = ?"
+        self._sql_keys = f"SELECT id FROM {name} ORDER BY id"
+        self._sql_rows = f"SELECT id, data FROM {name} ORDER BY id"
+        self._sql_count = f"SELECT COUNT(*) FROM {name}"
+        self._sql_clear = f"DELETE FROM {name}"
+        self._sql_find = {
+            field: f"SELECT data FROM {name} WHERE {field} = ? ORDER BY id"
+            for field in self.indexes
+        }
+
+    def create(self) -> None:
+        """Jadval va index'larni yaratish (agar yo'q bo'lsa)"""
+        key_sql = "INTEGER PRIMARY KEY" if self.key_type is int else "TEXT PRIMARY KEY"
+        extra = "".join(f", {field}" for field in self.indexes)
+        conn = self.backend.connection()
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {self.name} (id {key_sql}, data TEXT NOT NULL{extra})")
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({self.name})")}
+        for field in self.indexes:
+            if field not in existing:
+                # Eski fayl: yangi index ustunini qo'shib, data dan to'ldirish
+                conn.execute(f"ALTER TABLE {self.name} ADD COLUMN {field}")
+                conn.execute(f"UPDATE {self.name} SET {field} = json_extract(data, '$.{field}')")
+        for field in self.indexes:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS ix_{self.name}_{field} ON {self.name} ({field})")
+
+    def __getitem__(self, key):
+        row = self.backend.connection().execute(self._sql_get, (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return decode_record(row[0])
+
+    def __setitem__(self, key, record: dict):
+        params = [key, encode_record(record)]
+        params.extend(_column_value(record.get(field)) for field in self.indexes)
+        self.backend.connection().execute(self._sql_put, params)
+
+    def __delitem__(self, key):
+        cursor = self.backend.connection().execute(self._sql_delete, (key,))
+        if cursor.rowcount == 0:
+            raise KeyError(key)
+
+    def __contains__(self, key) -> bool:
+        return self.backend.connection().execute(self._sql_contains, (key,)).fetchone() is not None
+
+    def __iter__(self):
+        return iter([row[0] for row in self.backend.connection().execute(self._sql_keys)])
+
+    def __len__(self) -> int:
+        return self.backend.connection().execute(self._sql_count).fetchone()[0]
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def values(self) -> List[dict]:
+        return [decode_record(row[1]) for row in self.backend.connection().execute(self._sql_rows)]
+
+    def items(self) -> List[Tuple[Any, dict]]:
+        return [(row[0], decode_record(row[1])) for row in self.backend.connection().execute(self._sql_rows)]
+
+    def clear(self) -> None:
+        self.backend.connection().execute(self._sql_clear)
+
+    def find(self, field: str, value: Any) -> List[dict]:
+        sql = self._sql_find.get(field)
+        if sql is None:
+            return [r for r in self.values() if r.get(field) == value]
+        rows = self.backend.connection().execute(sql, (_column_value(value),))
+        return [decode_record(row[0]) for row in rows]
+
+    def next_id(self) -> int:
+        row = self.backend.connection().execute(
+            "INSERT INTO _counters (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1 RETURNING value",
+            (self.name,)
+        ).fetchone()
+        return row[0]
+
+
+class SQLiteBackend:
+    """
+    Bitta SQLite fayl, har bir thread (va har bir worker jarayoni) uchun alohida ulanish.
+    WAL rejimi o'quvchilar va yozuvchini bir-birini bloklamasdan ishlatadi.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self.connection().execute(
+            "CREATE TABLE IF NOT EXISTS _counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+        )
+
+    def connection(self) -> sqlite3.Connection:
+        """Joriy thread ulanishi (fork dan keyin qayta ochiladi)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(
+                self.path,
+                timeout=30,
+                isolation_level=None,  # autocommit: har bir yozuv alohida tranzaksiya
+                check_same_thread=False,
+                cached_statements=256
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def table(self, name: str, indexes: Tuple[str, ...] = (), key_type: type = int, row_store: type = dict) -> SQLiteTable:
+        # row_store kerak emas: qatorlar xotirada emas, SQLite faylida
+        table = SQLiteTable(self, name, indexes, key_type)
+        table.create()
+        return table
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Joriy thread ulanishida yozish tranzaksiyasi (BEGIN IMMEDIATE).
+        Boshqa worker'lar shu blok tugaguncha yozishni kutadi - masalan
+        ishga tushishdagi bir martalik ishlar uchun. Ichma-ich chaqirilsa
+        tashqi tranzaksiyaning bir qismi bo'ladi.
+        """
+        conn = self.connection()
+        if conn.in_transaction:
+            yield
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def close(self) -> None:
+        pass
+
+
+# ============ WAL BACKEND ============
+# Jadvallar xotirada (MemoryTable), har bir o'zgarish esa WAL_DIR dagi
+# append-only log segmentiga bitta ixcham JSON qator sifatida yoziladi:
+#   ["s", jadval, kalit, yozuv]  - yozish
+#   ["d", jadval, kalit]         - o'chirish
+#   ["c", jadval]                - tozalash
+# Yozuvlar buferga tushadi, fon thread har WAL_FLUSH_MS da bitta write + fsync
+# qiladi (group commit). WAL_SYNC=1 bo'lsa yozuvchi o'z partiyasi fsync
+# bo'lguncha kutadi, aks holda eng ko'pi bilan WAL_FLUSH_MS lik o'zgarish yo'qolishi mumkin.
+#
+# Snapshot: log WAL_SNAPSHOT_RECORDS qatorga yetganda (va to'xtatishda) jadvallar
+# snapshot.jsonl ga yoziladi, eski segmentlar o'chiriladi. Ishga tushganda
+# snapshot + undan keyingi segmentlar qayta o'qiladi (replay).
+class WalTable(MemoryTable):
+    """Har bir o'zgarishi backend logiga yoziladigan MemoryTable"""
+
+    def __init__(
+        self, backend: "WalBackend", name: str, indexes: Tuple[str, ...] = (), key_type: type = int, row_store: type = dict
+    ):
+        super().__init__(name, indexes, key_type, row_store)
+        self.backend = backend
+
+    def _load(self, rows: Dict[Any, dict], counter: int) -> None:
+        """Replay natijasini logga yozmasdan joylash"""
+        self._rows = rows if self._row_store is dict else self._row_store(rows)
+        if self.indexes:
+            for key, record in rows.items():
+                values = tuple(record.get(field) for field in self.indexes)
+                for field, value in zip(self.indexes, values):
+                    self._index[field].setdefault(value, {})[key] = None
+                self._indexed_values[key] = values
+        self._counter = max([counter] + [key for key in rows if isinstance(key, int)])
+
+    # fsync lock'dan tashqarida kutiladi: shu orada boshqa yozuvchilar ham
+    # buferga qo'shiladi va hammasi bitta partiyada yoziladi (group commit)
+    def __setitem__(self, key, record: dict):
+        with self.backend.lock:
+            super().__setitem__(key, record)
+            seq = self.backend.append(["s", self.name, key, record])
+        self.backend.wait_synced(seq)
+
+    def __delitem__(self, key):
+        with self.backend.lock:
+            super().__delitem__(key)
+            seq = self.backend.append(["d", self.name, key])
+        self.backend.wait_synced(seq)
+
+    def clear(self) -> None:
+        with self.backend.lock:
+            super().clear()
+            seq = self.backend.append(["c", self.name])
+        self.backend.wait_synced(seq)
+
+
+class WalBackend:
+    """Xotiradagi jadvallar + append-only log (group commit) + snapshot"""
+
+    name = "wal"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.RLock()  # jadval o'zgarishi + log qatori bitta atomar qadam
+        self._transaction_lock = threading.RLock()
+        self._tables: Dict[str, WalTable] = {}
+        self._replayed: Dict[str, Dict[Any, dict]] = {}
+        self._counters: Dict[str, int] = {}
+
+        self._cond = threading.Condition()
+        self._buffer: List[str] = []
+        self._appended = 0  # bufferga tushgan qatorlar (umumiy)
+        self._synced = 0    # fsync bo'lgan qatorlar
+        self._segment_records = 0
+        self._closed = False
+        self._io_lock = threading.Lock()  # segment fayli (flush va segment almashtirish)
+        self._snapshotting = False
+        self._snapshot_lock = threading.Lock()  # bir vaqtda bitta snapshot (fon thread va close)
+
+        started = time.perf_counter()
+        records = self._replay()
+        self.replay_seconds = time.perf_counter() - started
+        self.replayed_records = records
+        if records:
+            print(f"📀 WAL: {records} ta yozuv {self.replay_seconds:.2f} s da tiklandi")
+
+        self._segment = self._segments()[-1] + 1 if self._segments() else 1
+        self._file = open(self._segment_path(self._segment), "ab")
+        self._start_flusher()
+        # Flusher daemon thread: jarayon tugaganda bufer yo'qolmasin (CLI lar close() chaqirmaydi)
+        self._pid = os.getpid()
+        atexit.register(self.close)
+
+    def _start_flusher(self) -> None:
+        self._flusher = threading.Thread(target=self._flush_loop, name="wal-flusher", daemon=True)
+        self._flusher.start()
+
+    # ---------- fayllar ----------
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"wal-{segment:06d}.log")
+
+    def _segments(self) -> List[int]:
+        return sorted(
+            int(name[4:10]) for name in os.listdir(self.directory)
+            if name.startswith("wal-") and name.endswith(".log")
+        )
+
+    @property
+    def _snapshot_path(self) -> str:
+        return os.path.join(self.directory, "snapshot.jsonl")
+
+    # ---------- replay ----------
+    def _replay(self) -> int:
+        """snapshot + keyingi segmentlar -> self._replayed (jadvallar hali yaratilmagan)"""
+        tables = self._replayed
+        count = 0
+        first_segment = 1
+        if os.path.exists(self._snapshot_path):
+            with open(self._snapshot_path, "r", encoding="utf-8") as f:
+                header = json.loads(f.readline())
+                first_segment = header["segment"]
+                self._counters.update(header["counters"])
+                for line in f:
+                    name, key, record = decode_record(line)
+                    tables.setdefault(name, {})[key] = record
+                    count += 1
+        for segment in self._segments():
+            if segment < first_segment:
+                continue
+            with open(self._segment_path(segment), "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = decode_record(line)
+                    except ValueError:
+                        break  # Oxirgi qator yarim yozilgan (to'satdan to'xtash) - tashlab ketiladi
+                    op, name = entry[0], entry[1]
+                    rows = tables.setdefault(name, {})
+                    if op == "s":
+                        rows[entry[2]] = entry[3]
+                    elif op == "d":
+                        rows.pop(entry[2], None)
+                    elif op == "c":
+                        rows.clear()
+                    count += 1
+        return count
+
+    def table(self, name: str, indexes: Tuple[str, ...] = (), key_type: type = int, row_store: type = dict) -> WalTable:
+        table = WalTable(self, name, indexes, key_type, row_store)
+        table._load(self._replayed.pop(name, {}), self._counters.get(name, 0))
+        self._tables[name] = table
+        return table
+
+    # ---------- log ----------
+    def append(self, entry: list) -> int:
+        """Log qatorini buferga qo'shish; qaytaradi: qatorning tartib raqami (wait_synced uchun)"""
+        line = encode_record(entry) + "\n"
+        with self._cond:
+            self._buffer.append(line)
+            self._appended += 1
+            self._segment_records += 1
+            if len(self._buffer) == 1:
+                self._cond.notify_all()
+            return self._appended
+
+    def wait_synced(self, seq: int) -> None:
+        """WAL_SYNC=1 bo'lsa seq-qator fsync bo'lguncha kutish (backend.lock ushlanmagan holda)"""
+        if not WAL_SYNC:
+            return
+        with self._cond:
+            while self._synced < seq and not self._closed:
+                self._cond.wait()
+
+    def _start_snapshot(self) -> None:
+        """Log katta bo'lsa snapshot ni alohida thread da boshlash"""
+        with self._cond:
+            if self._snapshotting or self._segment_records < WAL_SNAPSHOT_RECORDS:
+                return
+            self._snapshotting = True
+
+        def run():
+            try:
+                self.snapshot()
+            finally:
+                self._snapshotting = False
+
+        threading.Thread(target=run, name="wal-snapshot", daemon=True).start()
+
+    def _flush_loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._buffer and not self._closed:
+                    self._cond.wait()
+                if not self._buffer and self._closed:
+                    return
+            time.sleep(WAL_FLUSH_MS / 1000)  # Shu orada kelgan yozuvlar ham bitta partiyaga tushadi
+            self.flush()
+            self._start_snapshot()
+
+    def flush(self) -> None:
+        """Buferni faylga yozish va fsync (bitta partiya)"""
+        with self._io_lock:
+            with self._cond:
+                lines, self._buffer = self._buffer, []
+                target = self._appended
+            if lines:
+                # fsync paytida yangi yozuvlar buferga tushaveradi (keyingi partiya)
+                self._file.write("".join(lines).encode("utf-8"))
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            with self._cond:
+                self._synced = max(self._synced, target)
+                self._cond.notify_all()
+
+    # ---------- snapshot ----------
+    def snapshot(self) -> None:
+        """
+        Jadvallarni snapshot ga yozish va eski log segmentlarini o'chirish.
+        Lock faqat jadvallarni nusxalash (pickle) va yangi segmentga o'tish
+        vaqtida ushlanadi; faylga yozish va fsync yozuvchilarni to'xtatmaydi.
+        """
+        with self._snapshot_lock:
+            self._write_snapshot()
+
+    def _write_snapshot(self) -> None:
+        with self.lock:
+            self.flush()
+            if self._segment_records == 0 and os.path.exists(self._snapshot_path):
+                return
+            # Haqiqiy nusxa: pickle baytlari o'zgarmaydi - lock dan keyin yozuv joyida
+            # o'zgartirilsa ham snapshot buzilmaydi (JSON ga o'girishdan ~5 marta tez)
+            tables = {name: dict(table.items()) for name, table in self._tables.items()}
+            tables.update({name: dict(rows) for name, rows in self._replayed.items()})
+            frozen = pickle.dumps(tables, pickle.HIGHEST_PROTOCOL)
+            del tables
+            counters = {name: table._counter for name, table in self._tables.items()}
+            with self._io_lock:
+                self._file.close()
+                self._segment += 1
+                self._file = open(self._segment_path(self._segment), "ab")
+            with self._cond:
+                self._segment_records = 0
+            segment = self._segment
+
+        tmp_path = self._snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"segment": segment, "counters": counters}) + "\n")
+            for name, rows in pickle.loads(frozen).items():
+                for key, record in rows.items():
+                    f.write(encode_record([name, key, record]) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._snapshot_path)
+        for old in self._segments():
+            if old < segment:
+                os.remove(self._segment_path(old))
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        with self._transaction_lock:
+            yield
+
+    def close(self) -> None:
+        """To'xtatishda: buferni yozish va snapshot (keyingi ishga tushish tezroq); qayta chaqirilsa hech narsa qilmaydi"""
+        if self._closed or os.getpid() != self._pid:  # fork qilingan jarayon logni yopmaydi
+            return
+        self.snapshot()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._flusher.join(timeout=5)
+        self._file.close()
+
+
+def create_backend(kind: Optional[str] = None):
+    """Sozlamaga qarab backend yaratish"""
+    kind = (kind or STORAGE_BACKEND).lower()
+    if kind == "memory":
+        return MemoryBackend()
+    if kind == "sqlite":
+        return SQLiteBackend(SQLITE_PATH)
+    if kind == "wal":
+        return WalBackend(WAL_DIR)
+    raise ValueError(f"Noma'lum storage backend: {kind}")
+
+
+backend = create_backend()
+
+
+if __name__ == "__main__":
+    # WAL backend benchmark: python storage.py wal-bench --records 1000000
+    import argparse
+    import shutil
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="WAL backend: yozish va replay vaqti")
+    parser.add_argument("command", choices=["wal-bench"])
+    parser.add_argument("--records", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="wal-bench-")
+    WAL_SNAPSHOT_RECORDS = args.records * 10  # Benchmark davomida avtomatik snapshot bo'lmasin
+    wal = WalBackend(directory)
+    try:
+        table = wal.table("products", indexes=("category_id",))
+        now = datetime.now()
+        started = time.perf_counter()
+        for i in range(args.records):
+            product_id = table.next_id()
+            table[product_id] = {
+                "id": product_id, "name": f"Phone {i}", "description": "Namuna mahsulot",
+                "price": 1_000_000 + i, "storage": "128 GB", "category_id": i % 20,
+                "image_url": None, "in_stock": True, "created_at": now,
+            }
+        wal.flush()
+        write_seconds = time.perf_counter() - started
+        log_bytes = sum(os.path.getsize(wal._segment_path(s)) for s in wal._segments())
+        print(f"yozish: {args.records} ta, {write_seconds:.2f} s ({args.records / write_seconds:,.0f}/s), log {log_bytes / 1e6:.1f} MB")
+
+        def replay() -> float:
+            started = time.perf_counter()
+            restored = WalBackend(directory)
+            restored.table("products", indexes=("category_id",))
+            seconds = time.perf_counter() - started
+            restored._closed = True  # flusher thread kerak emas
+            with restored._cond:
+                restored._cond.notify_all()
+            return seconds
+
+        print(f"replay (faqat log): {replay():.2f} s")
+        started = time.perf_counter()
+        wal.snapshot()
+        print(f"snapshot: {time.perf_counter() - started:.2f} s, {os.path.getsize(wal._snapshot_path) / 1e6:.1f} MB")
+        print(f"replay (snapshot + bo'sh log): {replay():.2f} s")
+    finally:
+        wal.close()  # atexit dagi close() o'chirilgan katalogga yozmasin
+        shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,98 @@
+"""
+Tekshirilgan JWT tokenlar keshi (auth.get_current_user uchun)
+Token -> (foydalanuvchi snapshot'i, amal qilish muddati). Kesh topilsa
+jwt.decode ham, users_db ham chaqirilmaydi - bitta dict o'qish.
+
+- Yozuv token exp vaqtidan keyin ham, TOKEN_CACHE_TTL_SECONDS dan keyin ham
+  ishlatilmaydi (boshqa worker'lardagi o'zgarishlar shu muddatda ko'rinadi).
+- Foydalanuvchi o'zgarganda (parol tiklandi, rol yoki tasdiqlanish holati)
+  database.py invalidate_user() chaqiradi - uning barcha tokenlari keshdan o'chadi.
+- Hajmi TOKEN_CACHE_SIZE bilan cheklangan (LRU).
+"""
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Optional, Set
+import os
+import threading
+import time
+
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_TTL_SECONDS = int(os.getenv("TOKEN_CACHE_TTL_SECONDS", "300"))
+
+
+class CachedToken(NamedTuple):
+    user_id: int
+    user: Any           # UserResponse snapshot
+    valid_until: float  # min(token exp, keshga qo'shilgan vaqt + TTL)
+
+
+class TokenCache:
+    """token -> CachedToken (LRU), user_id bo'yicha invalidatsiya bilan"""
+
+    def __init__(self, max_entries: int = TOKEN_CACHE_SIZE, ttl_seconds: int = TOKEN_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, CachedToken]" = OrderedDict()
+        self._by_user: Dict[int, Set[str]] = {}
+        self._generation = 0  # har bir invalidatsiyada oshadi
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, token: str) -> Optional[Any]:
+        """Keshdagi foydalanuvchi (yo'q yoki muddati o'tgan bo'lsa None)"""
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        with self._lock:
+            if entry.valid_until <= time.time():
+                self._drop(token)
+                return None
+            if token in self._entries:
+                self._entries.move_to_end(token)
+        return entry.user
+
+    def put(self, token: str, user_id: int, user: Any, expires_at: float, generation: int) -> None:
+        """
+        Tekshirilgan tokenni saqlash. generation - foydalanuvchi o'qilishidan
+        oldingi qiymat: orada invalidatsiya bo'lgan bo'lsa snapshot eskirgan, saqlanmaydi.
+        """
+        valid_until = min(expires_at, time.time() + self.ttl_seconds)
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._drop(token)
+            self._entries[token] = CachedToken(user_id, user, valid_until)
+            self._by_user.setdefault(user_id, set()).add(token)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Foydalanuvchining barcha tokenlarini keshdan o'chirish"""
+        with self._lock:
+            self._generation += 1
+            for token in self._by_user.pop(user_id, ()):
+                self._entries.pop(token, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._by_user.clear()
+
+    def _drop(self, token: str) -> None:
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        tokens = self._by_user.get(entry.user_id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._by_user[entry.user_id]
+
+
+token_cache = TokenCache()
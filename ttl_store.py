@@ -0,0 +1,114 @@
+"""
+Muddati cheklangan yozuvlar ombori (TTL store)
+Tasdiqlovchi kodlar va parolni tiklash tokenlari uchun: har bir yozuvda
+expires_at bor, muddati o'tganlari o'qilganda ko'rinmaydi va fon tozalashda
+o'chiriladi. Tozalash jarayon ichidagi min-heap (expires_at, kalit) bo'yicha:
+har bir yozishda faqat muddati o'tgan uchidan olinadi - amortizatsiyalangan
+O(log N), butun jadval aylanmaydi. Yozuvlar soni max_entries bilan cheklangan
+(oshsa eng tez tugaydiganlari o'chiriladi).
+
+Yozuvda o'z kaliti ("key") ham saqlanadi; token (yoki boshqa maydon) bo'yicha
+qidirish jadval indeksi orqali: find_one("token", ...) -> (kalit, yozuv).
+"""
+from datetime import datetime, timedelta
+from typing import Any, Iterator, List, Optional, Tuple
+import heapq
+import os
+import threading
+
+from storage import Table
+
+TTL_STORE_MAX_ENTRIES = int(os.getenv("TTL_STORE_MAX_ENTRIES", "100000"))
+
+
+class TTLStore:
+    """Table ustida expires_at, heap tozalash va hajm chegarasi bilan kalit -> yozuv"""
+
+    def __init__(self, table: Table, ttl: timedelta, max_entries: int = TTL_STORE_MAX_ENTRIES):
+        self.table = table
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._heap: List[Tuple[float, Any]] = []  # (expires_at timestamp, kalit); eskirgan juftlar ham qolishi mumkin
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def load(self) -> None:
+        """Heap ni jadvaldan tiklash va muddati o'tganlarni o'chirish (ishga tushganda)"""
+        with self._lock:
+            for key, record in self.table.items():
+                if "key" not in record:  # Eski formatdagi yozuv
+                    record["key"] = key
+                    self.table[key] = record
+            self._heap = [(record["expires_at"].timestamp(), key) for key, record in self.table.items()]
+            heapq.heapify(self._heap)
+            self._sweep(datetime.now())
+
+    @staticmethod
+    def _alive(record: Optional[dict], now: datetime) -> bool:
+        return record is not None and record["expires_at"] > now
+
+    def put(self, key: Any, record: dict, ttl: Optional[timedelta] = None) -> dict:
+        """Yozuvni saqlash (mavjudini almashtiradi); expires_at va created_at qo'shiladi"""
+        now = datetime.now()
+        record = {**record, "key": key, "expires_at": now + (ttl or self.ttl), "created_at": now}
+        with self._lock:
+            self.table[key] = record
+            heapq.heappush(self._heap, (record["expires_at"].timestamp(), key))
+            self._sweep(now)
+        return record
+
+    def get(self, key: Any) -> Optional[dict]:
+        """Yozuv (yo'q yoki muddati o'tgan bo'lsa None)"""
+        record = self.table.get(key)
+        if record is None or self._alive(record, datetime.now()):
+            return record
+        self.table.pop(key, None)
+        return None
+
+    def find(self, field: str, value: Any) -> List[Tuple[Any, dict]]:
+        """field == value bo'lgan, muddati o'tmagan (kalit, yozuv) juftlari (jadval indeksi orqali)"""
+        now = datetime.now()
+        return [
+            (record["key"], record)
+            for record in self.table.find(field, value)
+            if self._alive(record, now)
+        ]
+
+    def find_one(self, field: str, value: Any) -> Optional[Tuple[Any, dict]]:
+        rows = self.find(field, value)
+        return rows[0] if rows else None
+
+    def items(self) -> Iterator[Tuple[Any, dict]]:
+        """Muddati o'tmagan yozuvlar"""
+        now = datetime.now()
+        return ((key, record) for key, record in list(self.table.items()) if self._alive(record, now))
+
+    def pop(self, key: Any) -> Optional[dict]:
+        """Yozuvni o'chirish (heap dagi juft keyin tozalashda tashlab ketiladi)"""
+        return self.table.pop(key, None)
+
+    def _sweep(self, now: datetime) -> None:
+        """Muddati o'tganlarni va chegaradan ortiqchasini heap boshidan o'chirish"""
+        now_ts = now.timestamp()
+        heap = self._heap
+        while heap:
+            expires_ts, key = heap[0]
+            over_limit = len(self.table) > self.max_entries
+            if not over_limit and expires_ts > now_ts:
+                break
+            heapq.heappop(heap)
+            record = self.table.get(key)
+            if record is None:
+                continue
+            actual_ts = record["expires_at"].timestamp()
+            if actual_ts > expires_ts:
+                # Yozuv keyin yangilangan (balki boshqa worker da) - haqiqiy muddati bilan qaytadan
+                heapq.heappush(heap, (actual_ts, key))
+                continue
+            del self.table[key]
+        if len(heap) > 2 * len(self.table) + 64:
+            # Yangilangan/o'chirilgan yozuvlarning eski juftlari ko'payib ketdi
+            self._heap = [(record["expires_at"].timestamp(), key) for key, record in self.table.items()]
+            heapq.heapify(self._heap)